@@ -26,10 +26,32 @@ bl_info = {
     "category" : "3D View",
 }
 
-if "bpy" in locals():
+try:
+    import bpy
+except ImportError:
+    # Outside of Blender only the headless tools are usable (python -m bholodeck.relay)
+    bpy = None
+
+if bpy is None:
+    pass
+elif "viewport_vr_preview" in locals():
     import importlib
     importlib.reload(viewport_vr_preview)
     importlib.reload(bholodeck_pref)
+    importlib.reload(posecodec)
+    importlib.reload(interest)
+    importlib.reload(objectsync)
+    importlib.reload(operations)
+    importlib.reload(posebuffer)
+    importlib.reload(scheduler)
+    importlib.reload(assets)
+    importlib.reload(compression)
+    importlib.reload(metrics)
+    importlib.reload(clocksync)
+    importlib.reload(recorder)
+    importlib.reload(relaybus)
+    importlib.reload(shmtransport)
+    importlib.reload(relay)
     importlib.reload(netsystem)
     importlib.reload(vrmenunodes)
     importlib.reload(vrobjectactionnodes)
@@ -52,8 +74,6 @@ else:
     from . import vraudio
     from . import xrsystem
 
-import bpy
-
 def register():
     """register"""
 
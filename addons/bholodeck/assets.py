@@ -0,0 +1,231 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Content addressed asset transfer. The relay serves the files of its asset directory by their
+# sha256, the clients keep them in a cache named by the hash, so a file held already is never
+# fetched again and an interrupted transfer continues from the bytes received.
+#
+# This module must not import bpy.
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+from . import netsystem_pb2
+
+# Bytes of an AssetChunk
+ASSET_CHUNK_SIZE = 1024 * 1024
+
+# Seconds between two scans of the asset directory (by a thread of the relay), a scan only
+# hashes the changed files
+ASSET_SCAN_INTERVAL = 2.0
+
+# Index of the asset names in the cache directory
+CACHE_INDEX_FILE = 'index.json'
+
+# Hex digest of a sha256, the name of a cached file
+SHA256_PATTERN = re.compile('[0-9a-f]{64}')
+
+def file_sha256(filepath):
+    sha256 = hashlib.sha256()
+
+    with open(filepath, 'rb') as f:
+        while True:
+            data = f.read(ASSET_CHUNK_SIZE)
+            if len(data) == 0:
+                break
+            sha256.update(data)
+
+    return sha256.hexdigest()
+
+class Asset:
+    def __init__(self, name, filepath, size, mtime, sha256):
+        self.name = name
+        self.filepath = filepath
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = sha256
+
+class AssetStore:
+    """Files of a directory (with subdirectories) served by their sha256, the name is the relative path."""
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+
+        # name -> Asset, sha256 -> Asset
+        self.asset_dict = {}
+        self.hash_dict = {}
+        self.lock = threading.Lock()
+
+    def scan(self):
+        """Update the assets, the unchanged files (same size and mtime) are not hashed again."""
+        self.lock.acquire()
+        try:
+            asset_dict = {}
+            for dirpath, _, filename_list in os.walk(self.directory):
+                for filename in filename_list:
+                    filepath = os.path.join(dirpath, filename)
+                    name = os.path.relpath(filepath, self.directory).replace(os.sep, '/')
+
+                    try:
+                        stat = os.stat(filepath)
+                        asset = self.asset_dict.get(name)
+                        if asset is None or asset.size != stat.st_size or asset.mtime != stat.st_mtime:
+                            asset = Asset(name, filepath, stat.st_size, stat.st_mtime, file_sha256(filepath))
+                    except OSError:
+                        # Removed while scanning
+                        continue
+
+                    asset_dict[name] = asset
+
+            self.asset_dict = asset_dict
+            self.hash_dict = {asset.sha256: asset for asset in asset_dict.values()}
+        finally:
+            self.lock.release()
+
+    def find(self, sha256):
+        return self.hash_dict.get(sha256)
+
+    def asset_info_list(self):
+        return [netsystem_pb2.AssetInfo(name=asset.name, sha256=asset.sha256, size=asset.size)
+            for asset in sorted(self.asset_dict.values(), key=lambda asset: asset.name)]
+
+    def read_chunks(self, asset, offset=0, chunk_size=ASSET_CHUNK_SIZE):
+        """AssetChunks of the asset from offset to the end."""
+        with open(asset.filepath, 'rb') as f:
+            f.seek(offset)
+
+            while True:
+                data = f.read(chunk_size)
+                if len(data) == 0:
+                    break
+
+                yield netsystem_pb2.AssetChunk(offset=offset, data=data)
+                offset += len(data)
+
+class AssetCache:
+    """Fetched assets of a client, <directory>/<sha256><extension of the name> (Blender finds the
+    library of an append by the .blend in the path), and the index of their names.
+
+    A transfer is written to a .part file renamed when the hash matches, an interrupted
+    transfer continues at the size of the part file.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+        # name -> sha256 of the latest version of the asset
+        self.name_dict = {}
+        self.lock = threading.Lock()
+
+        try:
+            with open(os.path.join(self.directory, CACHE_INDEX_FILE), 'r') as f:
+                self.name_dict = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def path(self, sha256, name):
+        # The hash comes from the server, it must not be able to name a file outside of the cache
+        if not isinstance(sha256, str) or SHA256_PATTERN.fullmatch(sha256) is None:
+            raise ValueError('asset %s: invalid sha256 %r' % (name, sha256))
+
+        return os.path.join(self.directory, sha256 + os.path.splitext(name)[1])
+
+    def has(self, sha256, name):
+        return os.path.isfile(self.path(sha256, name))
+
+    def find(self, name):
+        """Path of the cached asset, None when it was not fetched."""
+        sha256 = self.name_dict.get(name)
+        try:
+            if sha256 is None or not self.has(sha256, name):
+                return None
+        except ValueError:
+            return None
+
+        return self.path(sha256, name)
+
+    def missing(self, asset_info_list):
+        """AssetInfos of the assets that are not in the cache, the names of the others are indexed."""
+        missing_list = []
+        for asset_info in asset_info_list:
+            if SHA256_PATTERN.fullmatch(asset_info.sha256) is None:
+                print('Asset %s ignored: invalid sha256' % asset_info.name)
+                continue
+
+            if self.has(asset_info.sha256, asset_info.name):
+                self._index(asset_info.name, asset_info.sha256)
+            else:
+                missing_list.append(asset_info)
+
+        return missing_list
+
+    def fetch(self, asset_info, fetch_chunks):
+        """Fetch an asset with fetch_chunks(sha256, offset), an iterator of AssetChunks.
+
+        Returns the path of the asset. Errors of the transfer are raised, the received bytes
+        are kept for the next attempt. A file with a wrong hash is removed (ValueError).
+        """
+        asset_path = self.path(asset_info.sha256, asset_info.name)
+        part_path = asset_path + '.part'
+
+        offset = 0
+        if os.path.isfile(part_path):
+            offset = os.path.getsize(part_path)
+        if offset > asset_info.size:
+            os.remove(part_path)
+            offset = 0
+
+        if offset < asset_info.size:
+            with open(part_path, 'ab') as f:
+                for chunk in fetch_chunks(asset_info.sha256, offset):
+                    if chunk.offset != offset:
+                        raise ValueError('asset %s: chunk at %d, expected %d' % (asset_info.name, chunk.offset, offset))
+
+                    f.write(chunk.data)
+                    offset += len(chunk.data)
+
+            if offset < asset_info.size:
+                raise IOError('asset %s: transfer ended at %d of %d bytes' % (asset_info.name, offset, asset_info.size))
+        else:
+            open(part_path, 'ab').close()
+
+        if file_sha256(part_path) != asset_info.sha256:
+            os.remove(part_path)
+            raise ValueError('asset %s: sha256 mismatch' % asset_info.name)
+
+        os.replace(part_path, asset_path)
+        self._index(asset_info.name, asset_info.sha256)
+
+        return asset_path
+
+    def _index(self, name, sha256):
+        self.lock.acquire()
+        try:
+            if self.name_dict.get(name) == sha256:
+                return
+
+            self.name_dict[name] = sha256
+
+            index_path = os.path.join(self.directory, CACHE_INDEX_FILE)
+            with open(index_path + '.tmp', 'w') as f:
+                json.dump(self.name_dict, f, indent=1)
+            os.replace(index_path + '.tmp', index_path)
+        finally:
+            self.lock.release()
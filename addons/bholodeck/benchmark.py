@@ -0,0 +1,259 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Micro-benchmarks of the netsystem hot paths: building and serializing ExDataRequest,
+# parsing ExDataResponse, the relay fan-out of ExData and the audio payload copies.
+#
+#   python -m bholodeck.benchmark --output baseline.json
+#   python -m bholodeck.benchmark --output new.json --compare baseline.json
+#
+# The results are written as JSON so that runs can be compared over time. This module must
+# not import bpy.
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import grpc
+import google.protobuf
+
+from . import netsystem_pb2
+from . import posecodec
+from . import relay
+
+POSITION_COUNTS = (4, 8, 16, 32, 64)
+CLIENT_COUNTS = (2, 10, 50, 100, 200)
+AUDIO_SIZES = (320, 3200, 32000)
+
+def measure(fn, min_time=0.2, repeat=5):
+    """Run fn in batches of at least min_time seconds, return the best and the median time per call in seconds."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    time_list = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        time_list.append((time.perf_counter() - start) / number)
+
+    time_list.sort()
+
+    return time_list[0], time_list[len(time_list) // 2]
+
+def sample_poses(count):
+    """count (tracker, location, quaternion) poses, trackers numbered beyond the four avatar trackers."""
+    pose_list = []
+    for i in range(count):
+        angle = i * 0.1
+        pose_list.append((i, (math.cos(angle), math.sin(angle), 1.5), (math.cos(angle * 0.5), 0.0, 0.0, math.sin(angle * 0.5))))
+
+    return pose_list
+
+def build_position_request(pose_list):
+    request = netsystem_pb2.ExDataRequest()
+    request.username = 'benchmark'
+
+    for tracker, location, quaternion in pose_list:
+        position = request.position_list.add()
+        position.object_name = 'benchmark_%d' % tracker
+        position.object_type = 'TRACKER'
+        position.object_location.extend(location)
+        position.object_rotation_quaternion.extend(quaternion)
+
+    return request.SerializeToString()
+
+def build_pose_data_request(pose_list):
+    request = netsystem_pb2.ExDataRequest()
+    request.username = 'benchmark'
+    request.pose_data = posecodec.encode_poses(pose_list)
+
+    return request.SerializeToString()
+
+def bench_serialize(result_list, options):
+    for count in POSITION_COUNTS:
+        pose_list = sample_poses(count)
+
+        result_list.append(run_case('serialize_request_position_list', {'positions': count},
+            lambda: build_position_request(pose_list), options, len(build_position_request(pose_list))))
+
+        result_list.append(run_case('serialize_request_pose_data', {'positions': count},
+            lambda: build_pose_data_request(pose_list), options, len(build_pose_data_request(pose_list))))
+
+def bench_parse(result_list, options):
+    for count in POSITION_COUNTS:
+        pose_data = posecodec.encode_poses(sample_poses(4))
+
+        # count peers, each with a pose block of the four avatar trackers
+        response = netsystem_pb2.ExDataResponse()
+        for user_id in range(1, count + 1):
+            response.user_info_list.add(user_id=user_id, username='user%d' % user_id)
+            response.pose_block_list.add(user_id=user_id, pose_data=pose_data)
+        data = response.SerializeToString()
+
+        def parse():
+            message = netsystem_pb2.ExDataResponse()
+            message.ParseFromString(data)
+            for pose_block in message.pose_block_list:
+                posecodec.decode_poses(pose_block.pose_data)
+
+        result_list.append(run_case('parse_response_pose_blocks', {'peers': count}, parse, options, len(data)))
+
+def create_relay(client_count):
+    relay_instance = relay.Relay('benchmark', 'benchmark')
+    servicer = relay.VRManagement(relay_instance)
+
+    for i in range(client_count):
+        request = netsystem_pb2.RegisterUserRequest(username='user%04d' % i, login='benchmark', password='benchmark', room='benchmark')
+        servicer.RegisterUser(request, None)
+
+    return servicer
+
+def bench_fan_out(result_list, options):
+    for count in CLIENT_COUNTS:
+        servicer = create_relay(count)
+
+        request_list = [netsystem_pb2.ExDataRequest(username='user%04d' % i, pose_data=posecodec.encode_poses(sample_poses(4)))
+            for i in range(count)]
+
+        # One relay tick: every client pushes its poses and pulls the poses of the others
+        def tick():
+            for request in request_list:
+                servicer.ExData(request, None)
+
+        result_list.append(run_case('fan_out_ex_data_tick', {'clients': count}, tick, options, per_call=count))
+
+def bench_audio(result_list, options):
+    for size in AUDIO_SIZES:
+        audio_data = os.urandom(size)
+
+        request = netsystem_pb2.SendAudioRequest(username='benchmark', audio_data=audio_data)
+        result_list.append(run_case('audio_request_serialize', {'bytes': size}, request.SerializeToString, options, size))
+
+        response = netsystem_pb2.ExDataResponse()
+        response.audio_data_list.extend([audio_data] * 8)
+        data = response.SerializeToString()
+
+        def parse():
+            message = netsystem_pb2.ExDataResponse()
+            message.ParseFromString(data)
+            return [bytes(audio) for audio in message.audio_data_list]
+
+        result_list.append(run_case('audio_response_parse_8_peers', {'bytes': size}, parse, options, len(data)))
+
+        for count in (10, 50):
+            servicer = create_relay(count)
+            send_request = netsystem_pb2.SendAudioRequest(username='user0000', audio_data=audio_data)
+            pull_request = netsystem_pb2.ExDataRequest(username='user0001')
+
+            def send_and_pull():
+                servicer.SendAudio(send_request, None)
+                servicer.ExData(pull_request, None)
+
+            result_list.append(run_case('audio_fan_out', {'bytes': size, 'clients': count}, send_and_pull, options))
+
+def run_case(name, params, fn, options, payload_bytes=None, per_call=1):
+    best, median = measure(fn, options.min_time, options.repeat)
+
+    result = {
+        'name': name,
+        'params': params,
+        'best_us': best * 1e6,
+        'median_us': median * 1e6,
+    }
+    if per_call > 1:
+        result['best_us_per_item'] = best * 1e6 / per_call
+    if payload_bytes is not None:
+        result['payload_bytes'] = payload_bytes
+
+    print('%-32s %-28s %12.2f us %12.2f us' % (name, json.dumps(params), result['best_us'], result['median_us']))
+
+    return result
+
+def case_key(result):
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+def print_comparison(result_list, baseline):
+    baseline_dict = {case_key(result): result for result in baseline['results']}
+
+    print()
+    print('%-32s %-28s %10s' % ('Comparison', 'params', 'ratio'))
+    for result in result_list:
+        old_result = baseline_dict.get(case_key(result))
+        if old_result is None:
+            continue
+
+        print('%-32s %-28s %9.2fx' % (result['name'], json.dumps(result['params']), result['best_us'] / max(old_result['best_us'], 1e-9)))
+
+SUITES = {
+    'serialize': bench_serialize,
+    'parse': bench_parse,
+    'fan_out': bench_fan_out,
+    'audio': bench_audio,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bholodeck.benchmark', description='Micro-benchmarks of the BHolodeck netsystem')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run, print the time ratios')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES.keys()), help='run only this suite (repeatable)')
+    parser.add_argument('--min-time', type=float, default=0.2, help='minimal seconds of one measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='measurements per case, the best and the median are reported')
+    options = parser.parse_args(argv)
+
+    print('%-32s %-28s %15s %15s' % ('Case', 'params', 'best', 'median'))
+
+    result_list = []
+    for name in (options.suite or SUITES.keys()):
+        SUITES[name](result_list, options)
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'grpc': grpc.__version__,
+        'protobuf': google.protobuf.__version__,
+        'min_time': options.min_time,
+        'repeat': options.repeat,
+        'results': result_list,
+    }
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if options.compare:
+        with open(options.compare, 'r') as f:
+            print_comparison(result_list, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -26,7 +26,7 @@ import typing
 
 import bpy
 from bpy.types import AddonPreferences, Operator, WindowManager, Scene, PropertyGroup
-from bpy.props import StringProperty, EnumProperty, PointerProperty, BoolProperty, IntProperty
+from bpy.props import StringProperty, EnumProperty, PointerProperty, BoolProperty, IntProperty, FloatProperty
 import rna_prop_ui
 
 import uuid
@@ -49,6 +49,17 @@ server_type_items = [
     ("CLIENT", "Client", ""),
 ]
 
+compression_items = [
+    ("NONE", "None", "Send all messages uncompressed"),
+    ("GZIP", "Gzip", "Compress large scripts and audio with gzip when it saves bytes"),
+    ("DEFLATE", "Deflate", "Compress large scripts and audio with deflate when it saves bytes"),
+]
+
+server_backend_items = [
+    ("THREAD", "Thread Pool", "grpc.server with a pool of worker threads, every call and open stream holds a thread"),
+    ("ASYNCIO", "AsyncIO", "grpc.aio server, all calls are served by one event loop"),
+]
+
 ##################################################
 from collections import namedtuple
 import subprocess, sys, importlib
@@ -197,11 +208,82 @@ class BHolodeckPreferences(AddonPreferences):
         name="Type"
     )
 
+    server_backend : EnumProperty(
+        items=server_backend_items,
+        name="Server Backend",
+        default="ASYNCIO"
+    )
+
+    compression: EnumProperty(
+        items=compression_items,
+        name='Compression',
+        description='Compression of the script and audio messages, pose messages are never compressed',
+        default='GZIP'
+    )
+
+    compression_threshold: IntProperty(
+        name='Compression Threshold',
+        description='Scripts and audio smaller than this many bytes are sent uncompressed',
+        default=1024,
+        min=0
+    )
+
+    metrics_port: IntProperty(
+        name='Metrics Port',
+        description='Port of the local Prometheus metrics endpoint of the server, 0 disables it',
+        default=0,
+        min=0,
+        max=65535
+    )
+
+    interest_radius: FloatProperty(
+        name='Interest Radius',
+        description='Peers within this distance or in the view cone get the poses at full rate, 0 sends all poses at full rate',
+        default=10.0,
+        min=0.0,
+        subtype='DISTANCE'
+    )
+
+    interest_far_rate: FloatProperty(
+        name='Far Rate',
+        description='Pose rate in Hz of the peers outside of the interest radius and the view cone',
+        default=5.0,
+        min=0.1,
+        max=90.0
+    )
+
+    asset_dir: StringProperty(
+        name='Asset Directory',
+        description='Directory of the assets (avatar library, textures, scenes) the clients fetch on connect, empty serves no assets',
+        default='',
+        subtype='DIR_PATH'
+    )
+
+    asset_cache_dir: StringProperty(
+        name='Asset Cache',
+        description='Directory of the assets fetched from the server, empty uses bholodeck_assets in the Blender user datafiles',
+        default='',
+        subtype='DIR_PATH'
+    )
+
+    record_path: StringProperty(
+        name='Session Recording',
+        description='File the received (server) or sent (client) requests are appended to, played back with python -m bholodeck.replay, empty records nothing',
+        default='',
+        subtype='FILE_PATH'
+    )
+
     username: StringProperty(
         name='Username',
         default=str(uuid.uuid4())
     )    
 
+    room: StringProperty(
+        name='Room',
+        description='Session room to join, users only see each other inside the same room',
+        default='default'
+    )
+
     login: StringProperty(
         name='Login',
         default='test'
@@ -213,6 +295,69 @@ class BHolodeckPreferences(AddonPreferences):
         subtype='PASSWORD'
     )   
 
+    use_stream: BoolProperty(
+        name='Streaming',
+        description='Exchange data over the bidirectional StreamExData stream instead of polling ExData',
+        default=True
+    )
+
+    use_object_sync: BoolProperty(
+        name='Object Sync',
+        description='Replicate the transform and the visibility of the objects tagged in the NetSystem panel',
+        default=False
+    )
+
+    tick_rate: IntProperty(
+        name='Tick Rate',
+        description='Target rate (Hz) at which the client sends its data, lowered automatically when the server can not keep up',
+        default=30,
+        min=1,
+        max=240
+    )
+
+    pose_position_epsilon: FloatProperty(
+        name='Position Epsilon',
+        description='Trackers that moved less than this distance are not sent',
+        default=0.001,
+        min=0.0,
+        precision=4,
+        unit='LENGTH'
+    )
+
+    pose_angle_epsilon: FloatProperty(
+        name='Angle Epsilon',
+        description='Trackers that rotated less than this angle (degrees) are not sent',
+        default=0.5,
+        min=0.0
+    )
+
+    pose_keyframe_interval: FloatProperty(
+        name='Keyframe Interval',
+        description='Interval (seconds) after which all trackers are sent again',
+        default=1.0,
+        min=0.0
+    )
+
+    use_interpolation: BoolProperty(
+        name='Interpolation',
+        description='Interpolate remote avatars between received poses and extrapolate on packet gaps',
+        default=True
+    )
+
+    interpolation_delay: FloatProperty(
+        name='Interpolation Delay',
+        description='Remote avatars are displayed this many seconds after their capture (after their arrival without clock synchronization)',
+        default=0.1,
+        min=0.0
+    )
+
+    extrapolation_limit: FloatProperty(
+        name='Extrapolation Limit',
+        description='Maximal time (seconds) remote motion is extrapolated when no pose arrives',
+        default=0.25,
+        min=0.0
+    )
+
     dependencies_installed: BoolProperty(
         default=False
     )    
@@ -248,12 +393,59 @@ class BHolodeckPreferences(AddonPreferences):
         port_box = port_split.row(align=True)        
         port_box.prop(self, 'port', text='') 
 
+        compression_split = box.split(**factor(0.25), align=True)
+        compression_split.label(text='Compression:')
+        compression_box = compression_split.row(align=True)
+        compression_box.prop(self, 'compression', text='')
+        compression_sub = compression_box.row(align=True)
+        compression_sub.enabled = self.compression != 'NONE'
+        compression_sub.prop(self, 'compression_threshold', text='Threshold')
+
+        if self.is_server():
+            backend_split = box.split(**factor(0.25), align=True)
+            backend_split.label(text='Backend:')
+            backend_box = backend_split.row(align=True)
+            backend_box.prop(self, 'server_backend', text='')
+
+            metrics_split = box.split(**factor(0.25), align=True)
+            metrics_split.label(text='Metrics Port:')
+            metrics_box = metrics_split.row(align=True)
+            metrics_box.prop(self, 'metrics_port', text='')
+
+            interest_split = box.split(**factor(0.25), align=True)
+            interest_split.label(text='Interest Radius:')
+            interest_box = interest_split.row(align=True)
+            interest_box.prop(self, 'interest_radius', text='')
+            interest_sub = interest_box.row(align=True)
+            interest_sub.enabled = self.interest_radius > 0
+            interest_sub.prop(self, 'interest_far_rate', text='Far Rate')
+
+            asset_split = box.split(**factor(0.25), align=True)
+            asset_split.label(text='Asset Directory:')
+            asset_box = asset_split.row(align=True)
+            asset_box.prop(self, 'asset_dir', text='')
+
         if self.is_client():
             username_split = box.split(**factor(0.25), align=True)
             username_split.label(text='Username:')
             username_box = username_split.row(align=True)        
             username_box.prop(self, 'username', text='')
 
+            room_split = box.split(**factor(0.25), align=True)
+            room_split.label(text='Room:')
+            room_box = room_split.row(align=True)
+            room_box.prop(self, 'room', text='')
+
+            asset_cache_split = box.split(**factor(0.25), align=True)
+            asset_cache_split.label(text='Asset Cache:')
+            asset_cache_box = asset_cache_split.row(align=True)
+            asset_cache_box.prop(self, 'asset_cache_dir', text='')
+
+        record_split = box.split(**factor(0.25), align=True)
+        record_split.label(text='Session Recording:')
+        record_box = record_split.row(align=True)
+        record_box.prop(self, 'record_path', text='')
+
         box = layout.box()
 
         if self.is_client():
@@ -267,6 +459,43 @@ class BHolodeckPreferences(AddonPreferences):
             password_box = password_split.row(align=True)        
             password_box.prop(self, 'password', text='')
 
+            box = layout.box()
+
+            stream_split = box.split(**factor(0.25), align=True)
+            stream_split.label(text='Streaming:')
+            stream_box = stream_split.row(align=True)
+            stream_box.prop(self, 'use_stream', text='')
+
+            object_sync_split = box.split(**factor(0.25), align=True)
+            object_sync_split.label(text='Object Sync:')
+            object_sync_box = object_sync_split.row(align=True)
+            object_sync_box.prop(self, 'use_object_sync', text='')
+
+            tick_rate_split = box.split(**factor(0.25), align=True)
+            tick_rate_split.label(text='Tick Rate:')
+            tick_rate_box = tick_rate_split.row(align=True)
+            tick_rate_box.prop(self, 'tick_rate', text='')
+
+            pose_split = box.split(**factor(0.25), align=True)
+            pose_split.label(text='Pose Epsilon:')
+            pose_box = pose_split.row(align=True)
+            pose_box.prop(self, 'pose_position_epsilon', text='Position')
+            pose_box.prop(self, 'pose_angle_epsilon', text='Angle')
+
+            keyframe_split = box.split(**factor(0.25), align=True)
+            keyframe_split.label(text='Keyframe Interval:')
+            keyframe_box = keyframe_split.row(align=True)
+            keyframe_box.prop(self, 'pose_keyframe_interval', text='')
+
+            interpolation_split = box.split(**factor(0.25), align=True)
+            interpolation_split.label(text='Interpolation:')
+            interpolation_box = interpolation_split.row(align=True)
+            interpolation_box.prop(self, 'use_interpolation', text='')
+            interpolation_sub = interpolation_box.row(align=True)
+            interpolation_sub.enabled = self.use_interpolation
+            interpolation_sub.prop(self, 'interpolation_delay', text='Delay')
+            interpolation_sub.prop(self, 'extrapolation_limit', text='Extrapolation')
+
     def is_server(self):
         return self.server_type == 'SERVER'
 
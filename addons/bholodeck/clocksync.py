@@ -0,0 +1,116 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Clock synchronization with the relay and the one-way latencies of the peers. The capture
+# times of the poses, scripts and audio are microseconds of the server clock (0 when the
+# sender is not synchronized), so that a receiver can tell how old a message is.
+#
+# This module must not import bpy.
+
+import collections
+import time
+
+from . import metrics
+
+# SyncClock samples kept, the one with the shortest round trip gives the offset
+CLOCK_SAMPLE_COUNT = 8
+
+# Samples taken after registering, and the seconds between the later samples
+CLOCK_SYNC_BURST = 4
+CLOCK_SYNC_INTERVAL = 10.0
+
+PEER_LATENCY_BUCKETS = (0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 1.0, 2.0)
+
+def clock_us():
+    """Wall clock in microseconds, the time base of the capture times."""
+    return time.time_ns() // 1000
+
+class ClockSync:
+    """NTP-style estimate of the offset of the local clock to the server clock.
+
+    A sample is the send time t0 of the request and the receive time t3 of the response
+    (local clock) with the receive and send times t1, t2 of the server:
+    offset = ((t1 - t0) + (t2 - t3)) / 2, round trip = (t3 - t0) - (t2 - t1). Queueing in one
+    direction skews the offset and lengthens the round trip, so the sample with the shortest
+    round trip of the last CLOCK_SAMPLE_COUNT is used.
+    """
+    def __init__(self):
+        # (round trip, offset) in microseconds
+        self.sample_list = collections.deque(maxlen=CLOCK_SAMPLE_COUNT)
+
+        self.offset = 0
+        self.round_trip = None
+
+    def reset(self):
+        self.sample_list.clear()
+        self.offset = 0
+        self.round_trip = None
+
+    def synced(self):
+        return self.round_trip is not None
+
+    def add_sample(self, t0, t1, t2, t3):
+        round_trip = max((t3 - t0) - (t2 - t1), 0)
+        offset = ((t1 - t0) + (t2 - t3)) // 2
+
+        self.sample_list.append((round_trip, offset))
+        self.round_trip, self.offset = min(self.sample_list)
+
+    def server_time(self, local_time=None):
+        """Server clock in microseconds of the local time (now by default), 0 when not synchronized."""
+        if self.synced() == False:
+            return 0
+
+        if local_time is None:
+            local_time = clock_us()
+
+        return local_time + self.offset
+
+    def age(self, capture_time):
+        """Seconds since the capture time, None without a capture time or synchronization."""
+        if capture_time == 0 or self.synced() == False:
+            return None
+
+        return (self.server_time() - capture_time) / 1e6
+
+class PeerLatency:
+    """Capture to display (pose) and capture to receive (script, audio) latencies per peer."""
+    def __init__(self):
+        self.registry = metrics.MetricsRegistry()
+        self.latency = self.registry.histogram('bholodeck_peer_latency_seconds', 'One-way latency of the messages of a peer', ('peer', 'kind'), PEER_LATENCY_BUCKETS)
+
+    def observe(self, peer, kind, latency):
+        # Residual clock error can make a latency slightly negative
+        self.latency.observe(max(latency, 0.0), (peer, kind))
+
+    def quantile(self, peer, kind, q):
+        return self.latency.quantile(q, (peer, kind))
+
+    def peers(self):
+        return sorted(set(peer for peer, _ in self.latency.values().keys()))
+
+    def remove(self, peer):
+        for kind in ('pose', 'script', 'audio'):
+            self.latency.remove((peer, kind))
+
+    def clear(self):
+        for label_values in list(self.latency.values().keys()):
+            self.latency.remove(label_values)
+
+    def render(self):
+        return self.registry.render()
@@ -0,0 +1,136 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Selective gRPC message compression. Scripts and audio are compressed when they are larger
+# than a threshold and when sampled zlib runs show that compression saves enough bytes for
+# that payload class; pose frames are small and never compressed.
+#
+# gRPC Python does not expose the zlib level of a message, so the measured benefit decides
+# per payload class between the configured algorithm and no compression.
+#
+# This module must not import bpy.
+
+import zlib
+
+import grpc
+
+PAYLOAD_POSE = 'POSE'
+PAYLOAD_SCRIPT = 'SCRIPT'
+PAYLOAD_AUDIO = 'AUDIO'
+
+ALGORITHMS = {
+    'NONE': grpc.Compression.NoCompression,
+    'GZIP': grpc.Compression.Gzip,
+    'DEFLATE': grpc.Compression.Deflate,
+}
+
+# Bytes of a payload compressed to measure the ratio
+SAMPLE_SIZE = 16384
+
+# The first payloads of a class are all measured, then only every SAMPLE_INTERVAL-th
+SAMPLE_WARMUP = 4
+SAMPLE_INTERVAL = 32
+
+# Weight of a new measurement in the moving average of the ratio
+RATIO_WEIGHT = 0.25
+
+class PayloadClassPolicy:
+    def __init__(self, threshold, min_saving):
+        self.threshold = threshold
+        self.min_saving = min_saving
+
+        # compressed size / original size, moving average of the samples
+        self.ratio = None
+        self.payload_count = 0
+
+    def measure(self, payload):
+        sample = payload[:SAMPLE_SIZE]
+        if isinstance(sample, str):
+            sample = sample.encode('utf-8')
+
+        ratio = len(zlib.compress(sample, 6)) / max(len(sample), 1)
+
+        if self.ratio is None:
+            self.ratio = ratio
+        else:
+            self.ratio += (ratio - self.ratio) * RATIO_WEIGHT
+
+    def should_compress(self, size, payload):
+        if size < self.threshold:
+            return False
+
+        if self.payload_count < SAMPLE_WARMUP or self.payload_count % SAMPLE_INTERVAL == 0:
+            self.measure(payload)
+        self.payload_count += 1
+
+        return self.ratio <= 1.0 - self.min_saving
+
+class CompressionPolicy:
+    """Chooses the grpc.Compression of a call or of a streamed message by its payload."""
+    def __init__(self, algorithm='GZIP', threshold=1024, min_saving=0.1):
+        self.algorithm = ALGORITHMS[algorithm]
+
+        self.class_policy_dict = {
+            PAYLOAD_SCRIPT: PayloadClassPolicy(threshold, min_saving),
+            PAYLOAD_AUDIO: PayloadClassPolicy(threshold, min_saving),
+        }
+
+    def enabled(self):
+        return self.algorithm != grpc.Compression.NoCompression
+
+    def should_compress(self, payload_class, payload_list):
+        class_policy = self.class_policy_dict.get(payload_class)
+        if class_policy is None or len(payload_list) == 0:
+            return False
+
+        size = sum(len(payload) for payload in payload_list)
+        largest = max(payload_list, key=len)
+
+        return class_policy.should_compress(size, largest)
+
+    def compression(self, payload_class, payload):
+        if self.enabled() and self.should_compress(payload_class, [payload]):
+            return self.algorithm
+
+        return grpc.Compression.NoCompression
+
+    def request_compression(self, request):
+        """Compression of an ExDataRequest, only worth it when it carries scripts or audio."""
+        if self.enabled() == False:
+            return grpc.Compression.NoCompression
+
+        if self.should_compress(PAYLOAD_SCRIPT, [script_event.python_script for script_event in request.script_event_list]):
+            return self.algorithm
+
+        if len(request.audio_data) > 0 and self.should_compress(PAYLOAD_AUDIO, [request.audio_data]):
+            return self.algorithm
+
+        return grpc.Compression.NoCompression
+
+    def compress_response(self, response):
+        """True when an ExDataResponse carries scripts or audio worth compressing."""
+        if self.enabled() == False:
+            return False
+
+        if self.should_compress(PAYLOAD_SCRIPT, response.python_script_list):
+            return True
+
+        if self.should_compress(PAYLOAD_SCRIPT, [script_event.python_script for script_event in response.script_event_list]):
+            return True
+
+        return self.should_compress(PAYLOAD_AUDIO, response.audio_data_list)
@@ -0,0 +1,60 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Interest management of the relay. A user receives the poses of the peers near to it or in
+# its view cone at full rate, the poses of the other peers are decimated to far_rate.
+#
+# This module must not import bpy, poses are (location, quaternion) tuples of the HMD.
+
+import math
+
+def hmd_forward(quaternion):
+    """View direction of an HMD, the -Z axis rotated by the (w, x, y, z) quaternion."""
+    w, x, y, z = quaternion
+
+    return (-2.0 * (x * z + w * y), -2.0 * (y * z - w * x), -(1.0 - 2.0 * (x * x + y * y)))
+
+class InterestFilter:
+    def __init__(self, radius=10.0, view_angle=60.0, view_distance=50.0, far_rate=5.0):
+        self.radius = radius
+        # Half angle of the view cone in degrees, 0 disables the cone
+        self.view_angle = view_angle
+        self.view_distance = view_distance
+
+        self.view_cos = math.cos(math.radians(view_angle))
+        self.far_interval = 1.0 / max(far_rate, 0.001)
+
+    def full_rate(self, viewer_pose, peer_pose):
+        """True when the viewer is interested in every pose of the peer."""
+        if viewer_pose is None or peer_pose is None:
+            return True
+
+        viewer_location, viewer_quaternion = viewer_pose
+        peer_location, _ = peer_pose
+
+        distance = math.dist(viewer_location, peer_location)
+        if distance <= self.radius:
+            return True
+
+        if self.view_angle <= 0.0 or distance > self.view_distance:
+            return False
+
+        forward = hmd_forward(viewer_quaternion)
+        cos_angle = sum((p - v) * f for p, v, f in zip(peer_location, viewer_location, forward)) / distance
+
+        return cos_angle >= self.view_cos
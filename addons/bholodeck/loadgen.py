@@ -0,0 +1,353 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Synthetic load generator of the VRManagement service. Spawns virtual clients that register
+# and then call ExData, SendAudio and SendPythonScript at fixed rates with synthetic tracker
+# trajectories, and reports throughput, latency percentiles, bandwidth and drops:
+#
+#   python -m bholodeck.loadgen --server localhost:7007 --clients 50 --duration 30 --json load.json
+#
+# This module must not import bpy, it only needs grpcio and the generated stubs.
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import time
+
+import grpc
+
+from . import netsystem_pb2
+from . import netsystem_pb2_grpc
+from . import posecodec
+
+RPC_NAMES = ('RegisterUser', 'ExData', 'SendAudio', 'SendPythonScript', 'UnregisterUser')
+
+def delivered_count(send_time_list, registered_time_list, own_count_list):
+    """Messages the receivers could get: those sent by the others after the receiver registered."""
+    send_time_list = sorted(send_time_list)
+
+    count = 0
+    for registered_time, own_count in zip(registered_time_list, own_count_list):
+        count += len(send_time_list) - bisect.bisect_left(send_time_list, registered_time) - own_count
+
+    return count
+
+def percentile(sorted_list, p):
+    if len(sorted_list) == 0:
+        return 0.0
+
+    index = min(len(sorted_list) - 1, int(round(p / 100.0 * (len(sorted_list) - 1))))
+    return sorted_list[index]
+
+def yaw_quaternion(yaw):
+    return (math.cos(yaw * 0.5), 0.0, 0.0, math.sin(yaw * 0.5))
+
+def trajectory(index, t):
+    """Tracker poses of virtual client index at time t: walking on a circle and looking around."""
+    angle = 0.5 * t + index * 0.7
+    radius = 2.0 + (index % 5) * 0.5
+
+    x = radius * math.cos(angle)
+    y = radius * math.sin(angle)
+    yaw = angle + math.pi * 0.5
+
+    head_yaw = yaw + 0.3 * math.sin(1.3 * t + index)
+    swing = 0.25 * math.sin(2.0 * t + index)
+
+    side_x = 0.25 * math.cos(yaw)
+    side_y = 0.25 * math.sin(yaw)
+
+    return [
+        (posecodec.TRACKER_HMD, (x, y, 1.7 + 0.02 * math.sin(6.0 * t)), yaw_quaternion(head_yaw)),
+        (posecodec.TRACKER_BODY, (x, y, 1.2), yaw_quaternion(yaw)),
+        (posecodec.TRACKER_CONTROLLER0, (x - side_x + swing * math.cos(yaw + math.pi * 0.5), y - side_y, 1.1), yaw_quaternion(yaw + swing)),
+        (posecodec.TRACKER_CONTROLLER1, (x + side_x - swing * math.cos(yaw + math.pi * 0.5), y + side_y, 1.1), yaw_quaternion(yaw - swing)),
+    ]
+
+class LoadStats:
+    """Counters of all virtual clients, updated from the event loop only.
+
+    The calls are counted from measure_start, after the ramp up, the registration and the
+    final unregistration are always counted. The deliveries are counted for the whole run.
+    """
+    def __init__(self, measure_start=0.0):
+        self.measure_start = measure_start
+
+        self.latency_dict = {name: [] for name in RPC_NAMES}
+        self.error_dict = {name: 0 for name in RPC_NAMES}
+
+        self.late_tick_count = 0
+
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+        self.audio_sent = 0
+        self.audio_received = 0
+        self.script_sent = 0
+        self.script_received = 0
+        self.pose_block_received = 0
+
+        self.registered_count = 0
+
+        # Times of the chunks and scripts sent and the clients, for the expected deliveries
+        self.audio_send_time_list = []
+        self.script_send_time_list = []
+        self.client_list = []
+
+    def measured(self, name, start_time):
+        return name in ('RegisterUser', 'UnregisterUser') or start_time >= self.measure_start
+
+    def add_latency(self, name, latency):
+        self.latency_dict[name].append(latency)
+
+    def add_error(self, name):
+        self.error_dict[name] += 1
+
+    def report(self, duration, options):
+        latency_report = {}
+        for name in RPC_NAMES:
+            latency_list = sorted(self.latency_dict[name])
+            latency_report[name] = {
+                'count': len(latency_list),
+                'errors': self.error_dict[name],
+                'mean_ms': 1000.0 * sum(latency_list) / len(latency_list) if len(latency_list) > 0 else 0.0,
+                'p50_ms': 1000.0 * percentile(latency_list, 50),
+                'p95_ms': 1000.0 * percentile(latency_list, 95),
+                'p99_ms': 1000.0 * percentile(latency_list, 99),
+            }
+
+        duration = max(duration, 0.001)
+        users = max(self.registered_count, 1)
+
+        # A receiver gets the chunks and scripts sent after it registered. The relay queues at most
+        # AUDIO_QUEUE_LENGTH chunks per sender for each receiver, the oldest are dropped.
+        registered_list = [client for client in self.client_list if client.registered == True]
+        registered_time_list = [client.registered_time for client in registered_list]
+        audio_expected = delivered_count(self.audio_send_time_list, registered_time_list, [client.audio_sent for client in registered_list])
+        script_expected = delivered_count(self.script_send_time_list, registered_time_list, [client.script_sent for client in registered_list])
+
+        call_count = sum(len(self.latency_dict[name]) for name in ('ExData', 'SendAudio', 'SendPythonScript'))
+
+        return {
+            'server': options.server,
+            'clients': options.clients,
+            'registered': self.registered_count,
+            'duration_s': duration,
+            'rates_hz': {'ExData': options.rate, 'SendAudio': options.audio_rate, 'SendPythonScript': options.script_rate},
+            'throughput': {
+                'rpc_per_s': call_count / duration,
+                'ExData_per_s': len(self.latency_dict['ExData']) / duration,
+                'SendAudio_per_s': len(self.latency_dict['SendAudio']) / duration,
+                'SendPythonScript_per_s': len(self.latency_dict['SendPythonScript']) / duration,
+                'pose_blocks_received_per_s': self.pose_block_received / duration,
+            },
+            'latency': latency_report,
+            'bytes_per_user_per_s': {
+                'sent': self.bytes_sent / users / duration,
+                'received': self.bytes_received / users / duration,
+            },
+            'drops': {
+                'rpc_errors': sum(self.error_dict.values()),
+                'late_ticks': self.late_tick_count,
+                'audio_sent': self.audio_sent,
+                'audio_expected': audio_expected,
+                'audio_received': self.audio_received,
+                'audio_dropped': max(0, audio_expected - self.audio_received),
+                'script_sent': self.script_sent,
+                'script_expected': script_expected,
+                'script_received': self.script_received,
+            },
+        }
+
+class VirtualClient:
+    def __init__(self, index, options, stats):
+        self.index = index
+        self.options = options
+        self.stats = stats
+
+        self.username = '%s%04d' % (options.prefix, index)
+        self.stub = None
+        self.registered = False
+        self.registered_time = 0.0
+
+        self.audio_sent = 0
+        self.script_sent = 0
+
+    async def call(self, name, method, request):
+        measured = self.stats.measured(name, time.monotonic())
+
+        start = time.perf_counter()
+        try:
+            response = await method(request, timeout=self.options.timeout)
+        except grpc.aio.AioRpcError:
+            if measured:
+                self.stats.add_error(name)
+            return None
+
+        if measured:
+            self.stats.add_latency(name, time.perf_counter() - start)
+            self.stats.bytes_sent += request.ByteSize()
+            self.stats.bytes_received += response.ByteSize()
+
+        return response
+
+    async def paced(self, rate, stop_time, tick):
+        """Call tick rate times per second until stop_time, late ticks are skipped and counted."""
+        if rate <= 0.0:
+            return
+
+        period = 1.0 / rate
+        next_tick = time.monotonic()
+
+        while next_tick < stop_time:
+            await tick()
+
+            next_tick += period
+            now = time.monotonic()
+
+            if now > next_tick + period and now >= self.stats.measure_start:
+                self.stats.late_tick_count += int((now - next_tick) / period)
+                next_tick = now
+            elif now < next_tick:
+                await asyncio.sleep(next_tick - now)
+
+    async def ex_data_tick(self):
+        request = netsystem_pb2.ExDataRequest()
+        request.username = self.username
+        request.pose_data = posecodec.encode_poses(trajectory(self.index, time.monotonic()))
+
+        measured = self.stats.measured('ExData', time.monotonic())
+
+        response = await self.call('ExData', self.stub.ExData, request)
+        if response is None:
+            return
+
+        if measured:
+            self.stats.pose_block_received += len(response.pose_block_list)
+        self.stats.audio_received += len(response.audio_data_list)
+        self.stats.script_received += len(response.python_script_list)
+
+    async def audio_tick(self):
+        request = netsystem_pb2.SendAudioRequest()
+        request.username = self.username
+        request.audio_data = os.urandom(self.options.audio_size)
+
+        send_time = time.monotonic()
+        if await self.call('SendAudio', self.stub.SendAudio, request) is not None:
+            self.stats.audio_sent += 1
+            self.stats.audio_send_time_list.append(send_time)
+            self.audio_sent += 1
+
+    async def script_tick(self):
+        request = netsystem_pb2.SendPythonScriptRequest()
+        request.username = self.username
+        request.python_script = 'pass # loadgen %s' % self.username
+
+        send_time = time.monotonic()
+        if await self.call('SendPythonScript', self.stub.SendPythonScript, request) is not None:
+            self.stats.script_sent += 1
+            self.stats.script_send_time_list.append(send_time)
+            self.script_sent += 1
+
+    async def run(self, start_time, stop_time):
+        await asyncio.sleep(max(0.0, start_time - time.monotonic()))
+
+        async with grpc.aio.insecure_channel(self.options.server) as channel:
+            self.stub = netsystem_pb2_grpc.VRManagementStub(channel)
+
+            request = netsystem_pb2.RegisterUserRequest()
+            request.username = self.username
+            request.login = self.options.login
+            request.password = self.options.password
+            request.room = self.options.room
+
+            registered_time = time.monotonic()
+            if await self.call('RegisterUser', self.stub.RegisterUser, request) is None:
+                return
+
+            self.registered = True
+            self.registered_time = registered_time
+            self.stats.registered_count += 1
+
+            await asyncio.gather(
+                self.paced(self.options.rate, stop_time, self.ex_data_tick),
+                self.paced(self.options.audio_rate, stop_time, self.audio_tick),
+                self.paced(self.options.script_rate, stop_time, self.script_tick))
+
+            request = netsystem_pb2.UnregisterUserRequest()
+            request.username = self.username
+            await self.call('UnregisterUser', self.stub.UnregisterUser, request)
+
+async def run_load(options):
+    now = time.monotonic()
+    ramp = options.ramp / max(options.clients, 1)
+    stop_time = now + options.ramp + options.duration
+
+    # The traffic of the ramp up is not measured, the rates are of the calls issued in duration
+    stats = LoadStats(now + options.ramp)
+
+    stats.client_list = [VirtualClient(i, options, stats) for i in range(options.clients)]
+    await asyncio.gather(*[client.run(now + i * ramp, stop_time) for i, client in enumerate(stats.client_list)])
+
+    return stats.report(options.duration, options)
+
+def print_report(report):
+    print('Clients: %d registered of %d, %.1f s' % (report['registered'], report['clients'], report['duration_s']))
+    print('Throughput: %.1f rpc/s, %.1f ExData/s, %.1f pose blocks received/s' % (
+        report['throughput']['rpc_per_s'], report['throughput']['ExData_per_s'], report['throughput']['pose_blocks_received_per_s']))
+    print('Bandwidth per user: %.1f B/s sent, %.1f B/s received' % (report['bytes_per_user_per_s']['sent'], report['bytes_per_user_per_s']['received']))
+
+    print('%-18s %8s %7s %9s %9s %9s' % ('Latency', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, latency in report['latency'].items():
+        print('%-18s %8d %7d %9.2f %9.2f %9.2f' % (name, latency['count'], latency['errors'], latency['p50_ms'], latency['p95_ms'], latency['p99_ms']))
+
+    drops = report['drops']
+    print('Drops: %d rpc errors, %d late ticks, audio %d of %d delivered, scripts %d of %d delivered' % (
+        drops['rpc_errors'], drops['late_ticks'], drops['audio_received'], drops['audio_expected'], drops['script_received'], drops['script_expected']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bholodeck.loadgen', description='Synthetic load of the BHolodeck relay')
+    parser.add_argument('--server', default='localhost:7007', help='host:port of the relay')
+    parser.add_argument('--login', default='test')
+    parser.add_argument('--password', default='test')
+    parser.add_argument('--room', default='loadgen', help='room of the virtual clients, keep it apart from real sessions')
+    parser.add_argument('--prefix', default='loadgen', help='username prefix of the virtual clients')
+    parser.add_argument('--clients', type=int, default=10, help='number of virtual clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds after the ramp up')
+    parser.add_argument('--ramp', type=float, default=1.0, help='seconds over which the clients register')
+    parser.add_argument('--rate', type=float, default=30.0, help='ExData calls per client per second')
+    parser.add_argument('--audio-rate', type=float, default=0.0, help='SendAudio calls per client per second')
+    parser.add_argument('--audio-size', type=int, default=3200, help='bytes of one audio chunk')
+    parser.add_argument('--script-rate', type=float, default=0.0, help='SendPythonScript calls per client per second')
+    parser.add_argument('--timeout', type=float, default=5.0, help='deadline of one call in seconds')
+    parser.add_argument('--json', help='write the report to this file')
+    options = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(options))
+
+    print_report(report)
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == '__main__':
+    main()
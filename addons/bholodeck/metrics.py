@@ -0,0 +1,467 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Counters, gauges and histograms of the relay, exported in the Prometheus text format on
+# a local HTTP endpoint and summarized in the NetSystem panel.
+#
+# This module must not import bpy.
+
+import http.server
+import inspect
+import threading
+import time
+
+import grpc
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Minimal interval over which MetricsSummary computes the rates
+SUMMARY_INTERVAL = 1.0
+
+def format_labels(label_names, label_values, extra=''):
+    pair_list = ['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(label_names, label_values)]
+    if len(extra) > 0:
+        pair_list.append(extra)
+
+    if len(pair_list) == 0:
+        return ''
+
+    return '{' + ','.join(pair_list) + '}'
+
+class Metric:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+
+        self.value_dict = {}
+        self.lock = threading.Lock()
+
+    def remove(self, label_values):
+        self.lock.acquire()
+        self.value_dict.pop(tuple(label_values), None)
+        self.lock.release()
+
+    def values(self):
+        self.lock.acquire()
+        value_dict = dict(self.value_dict)
+        self.lock.release()
+
+        return value_dict
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, label_values=()):
+        self.lock.acquire()
+        self.value_dict[label_values] = self.value_dict.get(label_values, 0) + amount
+        self.lock.release()
+
+    def get(self, label_values=()):
+        return self.value_dict.get(label_values, 0)
+
+    def total(self):
+        return sum(self.values().values())
+
+    def render(self):
+        return ['%s%s %s' % (self.name, format_labels(self.label_names, label_values), value) for label_values, value in sorted(self.values().items())]
+
+class Gauge(Metric):
+    """Gauge set explicitly or, with a callback returning {label_values: value}, collected on every render."""
+    type = 'gauge'
+
+    def __init__(self, name, help, label_names=(), callback=None):
+        super().__init__(name, help, label_names)
+        self.callback = callback
+
+    def set(self, value, label_values=()):
+        self.lock.acquire()
+        self.value_dict[label_values] = value
+        self.lock.release()
+
+    def values(self):
+        if self.callback is not None:
+            return self.callback()
+
+        return super().values()
+
+    def render(self):
+        return ['%s%s %s' % (self.name, format_labels(self.label_names, label_values), value) for label_values, value in sorted(self.values().items())]
+
+class HistogramValue:
+    def __init__(self, bucket_count):
+        self.bucket_counts = [0] * bucket_count
+        self.sum = 0.0
+        self.count = 0
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, label_values=()):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+
+        self.lock.acquire()
+        histogram_value = self.value_dict.get(label_values)
+        if histogram_value is None:
+            histogram_value = HistogramValue(len(self.buckets) + 1)
+            self.value_dict[label_values] = histogram_value
+
+        histogram_value.bucket_counts[index] += 1
+        histogram_value.sum += value
+        histogram_value.count += 1
+        self.lock.release()
+
+    def quantile(self, q, label_values=()):
+        """Upper bound of the bucket containing the q quantile, None without observations."""
+        histogram_value = self.value_dict.get(label_values)
+        if histogram_value is None or histogram_value.count == 0:
+            return None
+
+        rank = q * histogram_value.count
+        cumulative = 0
+        for i, bucket_count in enumerate(histogram_value.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+
+        return float('inf')
+
+    def render(self):
+        line_list = []
+
+        for label_values, histogram_value in sorted(self.values().items()):
+            self.lock.acquire()
+            bucket_counts = list(histogram_value.bucket_counts)
+            value_sum = histogram_value.sum
+            count = histogram_value.count
+            self.lock.release()
+
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                line_list.append('%s_bucket%s %d' % (self.name, format_labels(self.label_names, label_values, 'le="%s"' % le), cumulative))
+
+            line_list.append('%s_sum%s %s' % (self.name, format_labels(self.label_names, label_values), value_sum))
+            line_list.append('%s_count%s %d' % (self.name, format_labels(self.label_names, label_values), count))
+
+        return line_list
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metric_list = []
+
+    def add(self, metric):
+        self.metric_list.append(metric)
+        return metric
+
+    def counter(self, name, help, label_names=()):
+        return self.add(Counter(name, help, label_names))
+
+    def gauge(self, name, help, label_names=(), callback=None):
+        return self.add(Gauge(name, help, label_names, callback))
+
+    def histogram(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        return self.add(Histogram(name, help, label_names, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        line_list = []
+
+        for metric in self.metric_list:
+            line_list.append('# HELP %s %s' % (metric.name, metric.help))
+            line_list.append('# TYPE %s %s' % (metric.name, metric.type))
+            line_list.extend(metric.render())
+
+        return '\n'.join(line_list) + '\n'
+
+class RelayMetrics:
+    """Metrics of one Relay, the queue depth gauges are collected from its clients on render."""
+    def __init__(self, relay=None):
+        self.relay = relay
+        self.registry = MetricsRegistry()
+
+        self.rpc_latency = self.registry.histogram('bholodeck_rpc_latency_seconds', 'Duration of the VRManagement calls', ('method',))
+        self.rpc_request_bytes = self.registry.histogram('bholodeck_rpc_request_bytes', 'Serialized size of the requests', ('method',), SIZE_BUCKETS)
+        self.rpc_response_bytes = self.registry.histogram('bholodeck_rpc_response_bytes', 'Serialized size of the responses', ('method',), SIZE_BUCKETS)
+        self.rpc_errors = self.registry.counter('bholodeck_rpc_errors_total', 'VRManagement calls that raised', ('method',))
+
+        self.received_bytes = self.registry.counter('bholodeck_received_bytes_total', 'Bytes of the ExData frames received from all clients')
+        self.sent_bytes = self.registry.counter('bholodeck_sent_bytes_total', 'Bytes of the ExData frames sent to all clients')
+        self.client_received_bytes = self.registry.counter('bholodeck_client_received_bytes_total', 'Bytes of the ExData frames received from a client', ('client',))
+        self.client_sent_bytes = self.registry.counter('bholodeck_client_sent_bytes_total', 'Bytes of the ExData frames sent to a client', ('client',))
+
+        self.dropped_frames = self.registry.counter('bholodeck_dropped_frames_total', 'Pose and audio frames superseded before they were delivered', ('kind',))
+        self.decimated_poses = self.registry.counter('bholodeck_decimated_poses_total', 'Peer poses held back by the interest management')
+        self.uplink_latency = self.registry.histogram('bholodeck_uplink_latency_seconds', 'Capture to relay latency of the poses, scripts and audio of the clients', ('kind',))
+
+        self.registry.gauge('bholodeck_queue_depth', 'Items waiting in the queues of a client', ('client', 'queue'), self._queue_depths)
+        self.registry.gauge('bholodeck_clients', 'Clients connected to this relay worker', (), self._client_count)
+        self.registry.gauge('bholodeck_rooms', 'Rooms with local or remote members', (), self._room_count)
+
+    def client_received(self, username, size):
+        self.received_bytes.inc(size)
+        self.client_received_bytes.inc(size, (username,))
+
+    def client_sent(self, username, size):
+        self.sent_bytes.inc(size)
+        self.client_sent_bytes.inc(size, (username,))
+
+    def remove_client(self, username):
+        self.client_received_bytes.remove((username,))
+        self.client_sent_bytes.remove((username,))
+
+    def _queue_depths(self):
+        depth_dict = {}
+        if self.relay is None:
+            return depth_dict
+
+        for netclient in list(self.relay.netclient_dict.values()):
+            netclient.changes_lock.acquire()
+            script_depth = len(netclient.python_script_list)
+            audio_depth = sum(len(other_netclient.audio_data_list) for other_netclient in netclient.other_netclient_dict.values())
+            netclient.changes_lock.release()
+
+            depth_dict[(netclient.username, 'python_script')] = script_depth
+            depth_dict[(netclient.username, 'audio')] = audio_depth
+
+        return depth_dict
+
+    def _client_count(self):
+        return {(): len(self.relay.netclient_dict) if self.relay is not None else 0}
+
+    def _room_count(self):
+        return {(): len(self.relay.netroom_dict) if self.relay is not None else 0}
+
+    def render(self):
+        return self.registry.render()
+
+class MetricsSummary:
+    """Rates and percentiles of RelayMetrics for the Blender panel, recomputed at most every SUMMARY_INTERVAL."""
+    def __init__(self, relay_metrics):
+        self.relay_metrics = relay_metrics
+
+        self.last_time = None
+        self.last_received = 0
+        self.last_sent = 0
+
+        self.received_rate = 0.0
+        self.sent_rate = 0.0
+
+    def update(self):
+        now = time.monotonic()
+        if self.last_time is not None and now - self.last_time < SUMMARY_INTERVAL:
+            return
+
+        received = self.relay_metrics.received_bytes.get()
+        sent = self.relay_metrics.sent_bytes.get()
+
+        if self.last_time is not None:
+            self.received_rate = (received - self.last_received) / (now - self.last_time)
+            self.sent_rate = (sent - self.last_sent) / (now - self.last_time)
+
+        self.last_time = now
+        self.last_received = received
+        self.last_sent = sent
+
+    def latency_p95(self, method):
+        return self.relay_metrics.rpc_latency.quantile(0.95, (method,))
+
+    def dropped(self, kind):
+        return self.relay_metrics.dropped_frames.get((kind,))
+
+    def max_queue_depth(self):
+        depth_dict = self.relay_metrics._queue_depths()
+        return max(depth_dict.values()) if len(depth_dict) > 0 else 0
+
+def method_name(handler_call_details):
+    return handler_call_details.method.rsplit('/', 1)[-1]
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records the latency and the unary message sizes of every call of the thread pool server."""
+    def __init__(self, relay_metrics):
+        self.metrics = relay_metrics
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        method = (method_name(handler_call_details),)
+        metrics = self.metrics
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            def unary_unary(request, context):
+                start = time.perf_counter()
+                try:
+                    response = behavior(request, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+                metrics.rpc_request_bytes.observe(request.ByteSize(), method)
+                metrics.rpc_response_bytes.observe(response.ByteSize(), method)
+
+                return response
+
+            return grpc.unary_unary_rpc_method_handler(unary_unary, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        if handler.stream_stream is not None:
+            behavior = handler.stream_stream
+
+            def stream_stream(request_iterator, context):
+                start = time.perf_counter()
+                try:
+                    yield from behavior(request_iterator, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+            return grpc.stream_stream_rpc_method_handler(stream_stream, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        if handler.unary_stream is not None:
+            behavior = handler.unary_stream
+
+            def unary_stream(request, context):
+                start = time.perf_counter()
+                try:
+                    yield from behavior(request, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+            return grpc.unary_stream_rpc_method_handler(unary_stream, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        return handler
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """MetricsInterceptor of the grpc.aio server."""
+    def __init__(self, relay_metrics):
+        self.metrics = relay_metrics
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+
+        method = (method_name(handler_call_details),)
+        metrics = self.metrics
+
+        if handler.unary_unary is not None:
+            behavior = handler.unary_unary
+
+            async def unary_unary(request, context):
+                start = time.perf_counter()
+                try:
+                    response = await behavior(request, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+                metrics.rpc_request_bytes.observe(request.ByteSize(), method)
+                metrics.rpc_response_bytes.observe(response.ByteSize(), method)
+
+                return response
+
+            return grpc.unary_unary_rpc_method_handler(unary_unary, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        if handler.stream_stream is not None and inspect.iscoroutinefunction(handler.stream_stream):
+            behavior = handler.stream_stream
+
+            # The stream messages are counted per client by the servicer (read/write API)
+            async def stream_stream(request_iterator, context):
+                start = time.perf_counter()
+                try:
+                    return await behavior(request_iterator, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+            return grpc.stream_stream_rpc_method_handler(stream_stream, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        if handler.unary_stream is not None and inspect.iscoroutinefunction(handler.unary_stream):
+            behavior = handler.unary_stream
+
+            async def unary_stream(request, context):
+                start = time.perf_counter()
+                try:
+                    return await behavior(request, context)
+                except Exception:
+                    metrics.rpc_errors.inc(1, method)
+                    raise
+                finally:
+                    metrics.rpc_latency.observe(time.perf_counter() - start, method)
+
+            return grpc.unary_stream_rpc_method_handler(unary_stream, request_deserializer=handler.request_deserializer, response_serializer=handler.response_serializer)
+
+        return handler
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.server.relay_metrics.render().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """Serves /metrics in the Prometheus text format, bound to localhost by default."""
+    def __init__(self, relay_metrics, port, host='127.0.0.1'):
+        self.http_server = http.server.ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        self.http_server.daemon_threads = True
+        self.http_server.relay_metrics = relay_metrics
+
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
@@ -18,6 +18,7 @@
 
 import bpy
 import socket
+import os
 import sys
 import threading
 import queue
@@ -39,13 +40,79 @@ import grpc
 from . import bholodeck_pref
 from . import netsystem_pb2
 from . import netsystem_pb2_grpc
-
+from . import assets
+from . import clocksync
+from . import compression
+from . import metrics
+from . import objectsync
+from . import operations
+from . import posecodec
+from . import posebuffer
+from . import recorder
+from . import scheduler
+from . import shmtransport
+from . import relay
+
+import json
 import uuid
 
 import mathutils
 import time
 import traceback
 
+# Interval of the modal timer applying received data when poses are not interpolated
+SYNC_DATA_TIMER_INTERVAL = 0.1
+
+# Client send rate (Hz) used until the preferences are read
+DEFAULT_TICK_RATE = 30
+
+# Errors after which the client reconnects and resumes its session instead of stopping
+RECONNECT_STATUS_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.CANCELLED, grpc.StatusCode.UNKNOWN, grpc.StatusCode.INTERNAL)
+
+# Deadline of a RegisterUser resuming the session
+RESUME_TIMEOUT = 2.0
+
+# Transparent retries of the unary calls and fast reconnection of the channel, the keepalive
+# pings detect a dead Wi-Fi link within seconds instead of waiting for TCP timeouts
+CHANNEL_OPTIONS = [
+    ('grpc.enable_retries', 1),
+    ('grpc.service_config', json.dumps({
+        'methodConfig': [{
+            'name': [{'service': 'proto_netsystem.VRManagement', 'method': method} for method in ('RegisterUser', 'UnregisterUser', 'SendPythonScript', 'SendAudio', 'ExData', 'SyncClock')],
+            'retryPolicy': {
+                'maxAttempts': 3,
+                'initialBackoff': '0.05s',
+                'maxBackoff': '0.5s',
+                'backoffMultiplier': 2,
+                'retryableStatusCodes': ['UNAVAILABLE'],
+            },
+        }],
+    })),
+    ('grpc.initial_reconnect_backoff_ms', 100),
+    ('grpc.min_reconnect_backoff_ms', 100),
+    ('grpc.max_reconnect_backoff_ms', 2000),
+    ('grpc.keepalive_time_ms', 5000),
+    ('grpc.keepalive_timeout_ms', 3000),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.max_receive_message_length', relay.MAX_MESSAGE_LENGTH),
+    ('grpc.max_send_message_length', relay.MAX_MESSAGE_LENGTH),
+]
+
+# Lanes with their own StreamExData next to the poses of the sync data thread. They are streams
+# of the registering channel: a federated relay (--workers) knows a client only on the worker
+# its connection was accepted by
+BULK_LANES = (netsystem_pb2.LANE_SCRIPTS, netsystem_pb2.LANE_AUDIO)
+
+# How long the request iterator of a lane waits for outgoing audio before it checks that the stream is still open
+LANE_WAIT_TIMEOUT = 0.1
+
+# Asset cache in Blender's user datafiles when the preference is empty
+DEFAULT_ASSET_CACHE_DIR = 'bholodeck_assets'
+
+# Names the property paths of the received operations are resolved in (operations.OPERATION_ROOT_NAMES)
+OPERATION_NAMESPACE = {'bpy': bpy}
+
 ############################### BPY #####################################################
 def pretty_time(seconds):
     if seconds > 1.5: return "{:.2f} s".format(seconds)
@@ -56,6 +123,7 @@ def print_exception(ex):
 
 class VIEW_PG_NetSystem(bpy.types.PropertyGroup):
     execution_time : bpy.props.FloatProperty(name = "Execution Time")
+    tick_rate : bpy.props.FloatProperty(name = "Tick Rate")
 
 class VIEW_PT_NetSystemPanel(bpy.types.Panel):
     bl_label = "NetSystem"
@@ -78,6 +146,8 @@ class VIEW_PT_NetSystemPanel(bpy.types.Panel):
             #row.enabled = False
             row.prop(pref, 'username', text='')
             row = layout.row()
+            row.prop(pref, 'room', text='Room')
+            row = layout.row()
 
             if context.scene.netsystem.enabled == False:
                 row.operator("netsystem.start", text = "Connect")
@@ -87,6 +157,29 @@ class VIEW_PT_NetSystemPanel(bpy.types.Panel):
                 row = layout.row()
                 #row.prop(context.scene.view_pg_vrmenu, "execution_time")
                 row.label(text = pretty_time(context.scene.view_pg_netsystem.execution_time), icon = "TIME")
+                row.label(text = "{:.1f} Hz".format(context.scene.view_pg_netsystem.tick_rate))
+
+                netsystem = context.scene.netsystem
+                if netsystem.pose_board is not None:
+                    row = layout.row()
+                    row.label(text = "Local (shared memory)", icon = "LINKED")
+
+                if netsystem.clock_sync.synced():
+                    row = layout.row()
+                    row.label(text = "Clock {:+.1f} ms RTT {:.1f} ms".format(netsystem.clock_sync.offset / 1000.0, netsystem.clock_sync.round_trip / 1000.0))
+
+                    for peer in netsystem.peer_latency.peers():
+                        latency_p50 = netsystem.peer_latency.quantile(peer, 'pose', 0.5)
+                        latency_p95 = netsystem.peer_latency.quantile(peer, 'pose', 0.95)
+                        if latency_p50 is not None:
+                            row = layout.row()
+                            row.label(text = peer)
+                            row.label(text = "p50 {} p95 {}".format(pretty_time(latency_p50), pretty_time(latency_p95)))
+
+            if pref.use_object_sync:
+                row = layout.row(align=True)
+                row.operator("netsystem.object_sync_tag", text = "Sync Selected").tag = True
+                row.operator("netsystem.object_sync_tag", text = "Unsync Selected").tag = False
             #row.operator("netsystem.exec")
 
         if pref.is_server():
@@ -103,6 +196,22 @@ class VIEW_PT_NetSystemPanel(bpy.types.Panel):
                 row = layout.row()
                 row.template_list("BHOLODECK_UL_UsernamesGroup", "", context.scene, "view_pg_username", context.scene, "view_pg_username_index")         
 
+                metrics_summary = context.scene.netsystem.metrics_summary
+                if metrics_summary is not None:
+                    metrics_summary.update()
+
+                    row = layout.row()
+                    row.label(text = "In {:.1f} kB/s".format(metrics_summary.received_rate / 1024.0), icon = "IMPORT")
+                    row.label(text = "Out {:.1f} kB/s".format(metrics_summary.sent_rate / 1024.0), icon = "EXPORT")
+
+                    latency = metrics_summary.latency_p95('ExData')
+                    row = layout.row()
+                    row.label(text = "ExData p95 " + (pretty_time(latency) if latency is not None else "-"), icon = "TIME")
+                    row.label(text = "Queue {}".format(metrics_summary.max_queue_depth()))
+
+                    row = layout.row()
+                    row.label(text = "Dropped pose {} audio {}".format(metrics_summary.dropped('pose'), metrics_summary.dropped('audio')))
+
 class NetSystemStart(bpy.types.Operator):
     bl_idname = "netsystem.start"
     bl_label = "Start"
@@ -123,212 +232,38 @@ class NetSystemStop(bpy.types.Operator):
 
         return {'FINISHED'}
 
+class NetSystemObjectSyncTag(bpy.types.Operator):
+    """Tag or untag the selected objects for the replication of their transform and visibility"""
+    bl_idname = "netsystem.object_sync_tag"
+    bl_label = "Object Sync"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    tag : bpy.props.BoolProperty(name="Tag", default=True)
+
+    def execute(self,context):
+        for obj in context.selected_objects:
+            if self.tag:
+                obj[objectsync.SYNC_PROPERTY] = True
+            elif objectsync.SYNC_PROPERTY in obj:
+                del obj[objectsync.SYNC_PROPERTY]
+
+        context.scene.netsystem.update_object_sync_tags(context)
+
+        return {'FINISHED'}
+
 class BHOLODECK_PG_UsernamesGroup(bpy.types.PropertyGroup):
     username : bpy.props.StringProperty(name="Username")
+    room : bpy.props.StringProperty(name="Room")
     #code : bpy.props.StringProperty(name="Session Code")
 
 class BHOLODECK_UL_UsernamesGroup(bpy.types.UIList):
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
         layout.label(text=item.username)
+        layout.label(text=item.room)
         #layout.label(text=item.code)  
 
 ############################### GRPC #####################################################
 
-class VRManagement(netsystem_pb2_grpc.VRManagementServicer):
-    def RegisterUser(self, request, context):
-
-        pref = bholodeck_pref.preferences() 
-        if pref.login != request.login or pref.password != request.password:
-            raise Exception('wrong credentials') 
-
-        if len(request.username) < 3:
-            raise Exception('username is too short')
-
-        for client in bpy.context.scene.netsystem.netclient_list:
-            if request.username == client.username:
-                raise Exception('username %s exist - unregister first' % client.username)        
-
-        bpy.context.scene.netsystem.netclient_list_lock.acquire()
-
-        user = bpy.context.scene.view_pg_username.add()
-        user.username = request.username
-
-        netclient = NetClient()
-        netclient.username = request.username
-
-        response = netsystem_pb2.RegisterUserResponse()
-        response.username = netclient.username
-
-        users_count = len(bpy.context.scene.netsystem.netclient_list)
-
-        netclient.landmark_location = [0,0,0]
-        netclient.landmark_angle = 0.0
-
-        if users_count == 0:
-            netclient.landmark_location = [1,0,1]
-            netclient.landmark_angle = 90.0
-
-        if users_count == 1:
-            netclient.landmark_location = [-1,0,1]
-            netclient.landmark_angle = -90.0
-
-        if users_count == 2:
-            netclient.landmark_location = [0,1,1]
-            netclient.landmark_angle = 180.0
-
-        if users_count == 3:
-            netclient.landmark_location = [0,-1,1]
-            netclient.landmark_angle = 0.0
-
-        response.landmark_location.extend(netclient.landmark_location)
-        response.landmark_angle = 0 #netclient.landmark_angle * 3.14 / 180.0
-
-        bpy.context.scene.netsystem.netclient_list.append(netclient)
-
-        bpy.context.scene.netsystem.netclient_list_lock.release()
-
-        return response
-
-    def UnregisterUser(self, request, context):
-
-        bpy.context.scene.netsystem.netclient_list_lock.acquire()
-
-        for i in range(len(bpy.context.scene.view_pg_username)):
-            if request.username == bpy.context.scene.view_pg_username[i].username:
-                bpy.context.scene.view_pg_username.remove(i)
-                break
-
-        for client in bpy.context.scene.netsystem.netclient_list:
-            if request.username == client.username:
-                bpy.context.scene.netsystem.netclient_list.remove(client)
-                break
-
-        bpy.context.scene.netsystem.netclient_list_lock.release()
-
-        return netsystem_pb2.Empty()
-
-    def SendPythonScript(self, request, context):
-        try: 
-            #bpy.context.scene.netsystem.check_client(request.username)
-
-            for client in bpy.context.scene.netsystem.netclient_list:
-                if request.username != client.username and len(request.python_script) > 0:
-                    client.changes_lock.acquire()
-                    client.python_script_list.append(request.python_script)
-                    client.changes_lock.release()
-        except Exception as e:
-            print_exception(e)
-
-        return netsystem_pb2.Empty()
-
-    def SendAudio(self, request, context):
-        try: 
-            #bpy.context.scene.netsystem.check_client(request.username)
-
-            for client in bpy.context.scene.netsystem.netclient_list:
-                if request.username != client.username and len(request.audio_data) > 0:
-                    client.changes_lock.acquire()
-
-                    if request.username not in client.other_netclient_dict:
-                        client.other_netclient_dict[request.username] = NetClient()
-                    
-                    if len(client.other_netclient_dict[request.username].audio_data_list) == 0:
-                        client.other_netclient_dict[request.username].audio_data_list.append(request.audio_data)
-
-                    client.changes_lock.release()
-
-        except Exception as e:
-            print_exception(e)
-
-        return netsystem_pb2.Empty()
-
-    def ExData(self, request, context):
-        try:
-            response = netsystem_pb2.ExDataResponse()
-
-            for client in bpy.context.scene.netsystem.netclient_list:
-                if request.username != client.username and len(request.position_list) > 0:
-                    client.changes_lock.acquire()
-
-                    if request.username not in client.other_netclient_dict:
-                        client.other_netclient_dict[request.username] = NetClient()
-                    
-                    if len(client.other_netclient_dict[request.username].position_list) == 0:
-                        client.other_netclient_dict[request.username].position_list.append(request.position_list)
-
-                    client.changes_lock.release()
-
-            for client in bpy.context.scene.netsystem.netclient_list:
-                if request.username == client.username:
-                    position_list = []
-                    python_script_list = []
-                    audio_data_list = []
-
-                    client.changes_lock.acquire()
-                    if len(client.python_script_list) > 0:
-                        python_script_list.append(client.python_script_list.pop(0))
-                    
-                    for other_netclient in client.other_netclient_dict.values():
-
-                        if len(other_netclient.position_list) > 0:
-                            pl = other_netclient.position_list.pop(0)
-                            for position in pl:
-                                position_list.append(position)
-
-                        if len(other_netclient.audio_data_list) > 0:
-                            audio_data_list.append(other_netclient.audio_data_list.pop(0))
-
-                    client.changes_lock.release()
-
-                    if len(position_list) > 0:
-                        response.position_list.extend(position_list)
-
-                    if len(python_script_list) > 0:
-                        response.python_script_list.extend(python_script_list)
-
-                    if len(audio_data_list) > 0:
-                        response.audio_data_list.extend(audio_data_list)
-
-                    break
-
-            for client in bpy.context.scene.netsystem.netclient_list:
-                if request.username != client.username and len(request.audio_data) > 0:
-                    client.changes_lock.acquire()
-
-                    if request.username not in client.other_netclient_dict:
-                        client.other_netclient_dict[request.username] = NetClient()
-                    
-                    if len(client.other_netclient_dict[request.username].audio_data_list) == 0:
-                        client.other_netclient_dict[request.username].audio_data_list.append(request.audio_data)
-
-                    client.changes_lock.release()                
-
-            
-            return response
-
-        except Exception as e:
-            print_exception(e)
-
-        return netsystem_pb2.ExDataResponse()
-            
-############################### GRPC #####################################################
-class NetClient:
-    def __init__(self):
-        self.username = ''
-
-        self.position_list = []
-        #self.positions_lock = threading.Lock()
-        self.audio_data_list = []
-        #self.audio_data_lock = threading.Lock()
-        self.python_script_list = []
-        #self.python_script_lock = threading.Lock()
-
-        self.landmark_location = [0,0,0]
-        self.landmark_angle = 0
-
-        self.other_netclient_dict = {}
-        self.changes_lock = threading.Lock()
-
 # def sync_data_timer():
 #     window = bpy.context.window_manager.windows[0]
 #     ops_ctx = {'window': window, 'screen': window.screen}
@@ -342,12 +277,12 @@ class NETSYSTEM_OT_sync_data_timer(bpy.types.Operator):
     bl_label = "Net Timer"
 
     def execute(self, context):
-        self._timer = context.window_manager.event_timer_add(0.1, window=context.window)
+        self._timer = context.window_manager.event_timer_add(context.scene.netsystem.sync_data_timer_interval(), window=context.window)
         context.window_manager.modal_handler_add(self)
         return {'RUNNING_MODAL'}
 
     def invoke(self, context, event):
-        self._timer = context.window_manager.event_timer_add(0.1, window=context.window)
+        self._timer = context.window_manager.event_timer_add(context.scene.netsystem.sync_data_timer_interval(), window=context.window)
         context.window_manager.modal_handler_add(self)
         return {'RUNNING_MODAL'}    
 
@@ -369,18 +304,106 @@ class NETSYSTEM_OT_sync_data_timer(bpy.types.Operator):
 def _sync_data_thread():
     bpy.context.scene.netsystem._sync_data_thread(bpy.context)
 
+def _sync_lane_thread(lane):
+    bpy.context.scene.netsystem._sync_lane_thread(bpy.context, lane)
+
+def _sync_asset_thread():
+    bpy.context.scene.netsystem._sync_asset_thread(bpy.context)
+
+def _sync_clock_thread():
+    bpy.context.scene.netsystem._sync_clock_thread()
+
+def _sync_shm_thread():
+    bpy.context.scene.netsystem._sync_shm_thread(bpy.context)
+
+def _object_sync_depsgraph_update(scene, depsgraph):
+    scene.netsystem.object_sync_depsgraph_update(depsgraph)
+
 class NetSystem:
 
     def __init__(self):
         self.enabled = False
 
-        self.netclient_list = []
-        self.netclient_list_lock = threading.Lock()
+        self.current_netclient = relay.NetClient()
 
-        self.current_netclient = NetClient()
+        # user_id -> username of the remote users, filled from ExDataResponse.user_info_list
+        self.username_dict = {}
 
         self.execution_time = 0
 
+        self.data_stream = None
+
+        # StreamExData is used until the server does not know it or refuses the stream
+        self.use_stream = False
+        # True when the server serves the lanes, the poses, scripts and audio then have their own streams
+        self.use_lanes = False
+        # Lane -> stream and thread of the script and audio lanes
+        self.lane_stream_dict = {}
+        self.lane_thread_list = []
+
+        self.relay_server = None
+        self.metrics_summary = None
+
+        self.compression_policy = compression.CompressionPolicy('NONE')
+
+        # Secret of the session on the server, used to reattach after a lost connection
+        self.resume_token = ''
+        self.reconnect_count = 0
+
+        # Scripts that failed to send while disconnected, sent again after resuming (servers without ScriptEvents)
+        self.pending_python_script_list = []
+        self.pending_python_script_lock = threading.Lock()
+
+        # True when the server accepts ScriptEvents, the scripts are then sent in batches with the data requests
+        self.script_events = False
+        # (seq, python_script or Operation, state_key, capture time) of the scripts sent until the server acks them
+        self.outbound_script_list = []
+        # seq of the last script queued, the last one sent and the last one acked by the server
+        self.outbound_script_seq = 0
+        self.outbound_script_sent_seq = 0
+        # seq of the last script received and the last one acked to the server
+        self.inbound_script_seq = 0
+        self.inbound_script_acked_seq = 0
+        self.script_lock = threading.Lock()
+        # Wakes the request iterator of the script lane
+        self.script_event = threading.Event()
+
+        # Replication of the tagged objects, None when the Object Sync preference is off
+        self.object_replicator = None
+
+        # Assets of the server fetched over their own connection into the AssetCache
+        self.asset_cache = None
+        self.asset_stub = None
+        self.asset_call = None
+        self.asset_thread = None
+        # AssetInfos announced by the server that are not in the cache yet
+        self.pending_asset_list = []
+        self.asset_lock = threading.Lock()
+        self.asset_event = threading.Event()
+
+        # Offset to the server clock, the capture times of the sent data are server clock microseconds
+        self.clock_sync = clocksync.ClockSync()
+        self.clock_thread = None
+        # Latencies of the data of the peers, and username -> capture time of the newest pose not displayed yet
+        self.peer_latency = clocksync.PeerLatency()
+        self.pose_capture_dict = {}
+
+        # SessionRecorder of the sent requests, None records nothing
+        self.recorder = None
+
+        # Shared memory of the relay when it runs on this host: the poses of the room and the audio for this client
+        self.pose_board = None
+        self.audio_ring = None
+        self.shm_room_id = 0
+        self.shm_lock = threading.Lock()
+        self.shm_thread = None
+        # user_id -> (pose_data, capture time) read from the board before the username of the user was known
+        self.shm_pending_pose_dict = {}
+
+        self.pose_filter = posecodec.PoseFilter()
+        self.pose_interpolator = None
+        self.tick_scheduler = scheduler.TickScheduler(DEFAULT_TICK_RATE)
+
         # self.username = ''
         # self.position_list = queue.Queue(1)
         # self.python_script = queue.Queue()
@@ -404,14 +427,51 @@ class NetSystem:
             pref = bholodeck_pref.preferences() 
 
             if pref.is_server():
-                self.server.stop(0)
+                self.relay_server.stop()
+                self.relay_server = None
+                self.metrics_summary = None
 
             if pref.is_client():
                 self.sync_data_thread_exit = True
+                if self.data_stream is not None:
+                    self.data_stream.cancel()
+                for lane_stream in list(self.lane_stream_dict.values()):
+                    lane_stream.cancel()
                 self.sync_data_thread.join()
+                for lane_thread in self.lane_thread_list:
+                    lane_thread.join()
+                self.data_stream = None
+                self.lane_stream_dict = {}
+                self.lane_thread_list = []
+
+                if self.asset_call is not None:
+                    self.asset_call.cancel()
+                if self.asset_thread is not None:
+                    self.asset_thread.join()
+                    self.asset_thread = None
+                if self.clock_thread is not None:
+                    self.clock_thread.join()
+                    self.clock_thread = None
+                if self.shm_thread is not None:
+                    self.shm_thread.join()
+                    self.shm_thread = None
+
+                # The relay sends the audio over gRPC again
+                self._detach_shared_memory()
+
+                if self.object_replicator is not None:
+                    if _object_sync_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+                        bpy.app.handlers.depsgraph_update_post.remove(_object_sync_depsgraph_update)
+                    self.object_replicator = None
 
                 if len(self.current_netclient.username) > 0:
-                    self.vr_management_stub.UnregisterUser(netsystem_pb2.UnregisterUserRequest(username=self.current_netclient.username))
+                    unregister_user_request = netsystem_pb2.UnregisterUserRequest(username=self.current_netclient.username)
+                    self._record(recorder.RECORD_UNREGISTER, unregister_user_request)
+                    self.vr_management_stub.UnregisterUser(unregister_user_request)
+
+                if self.recorder is not None:
+                    self.recorder.close()
+                    self.recorder = None
 
                 #bpy.ops.screen.animation_play()
                 #bpy.app.handlers.frame_change_pre.remove(draw_callback_3d)
@@ -421,13 +481,23 @@ class NetSystem:
                 #bpy.types.SpaceView3D.draw_handler_remove(self._handle_3d, 'WINDOW')
                 
 
-            self.netclient_list = []
             #self.username = ''
             #self.enabled = False
 
         except Exception as e:
             print_exception(e) 
 
+    def _on_user_registered(self, netclient):
+        user = bpy.context.scene.view_pg_username.add()
+        user.username = netclient.username
+        user.room = netclient.room.name
+
+    def _on_user_unregistered(self, netclient):
+        for i in range(len(bpy.context.scene.view_pg_username)):
+            if netclient.username == bpy.context.scene.view_pg_username[i].username:
+                bpy.context.scene.view_pg_username.remove(i)
+                break
+
     def _wait_on_exit(self):
         print('Start _wait_on_exitself')
 
@@ -446,173 +516,831 @@ class NetSystem:
                 
     #         self.new_positions = False
 
-    def set_position(self, context, position):
-        self.context.scene.xrsystem.set_position(context, position.object_name, position.object_location, position.object_rotation_quaternion)
+    def sync_data_timer_interval(self):
+        # Interpolated poses are applied on every event loop iteration, like XRSystem poses
+        if self.pose_interpolator is not None:
+            return 0
+
+        return SYNC_DATA_TIMER_INTERVAL
+
+    def set_position(self, context, object_name, object_location, object_rotation_quaternion):
+        self.context.scene.xrsystem.set_position(context, object_name, object_location, object_rotation_quaternion)
 
     def sync_data_timer(self, context):
         try:
             context.scene.view_pg_netsystem.execution_time = self.execution_time
+            context.scene.view_pg_netsystem.tick_rate = self.tick_scheduler.rate()
 
-            position_list = []
+            position_dict = {}
             python_script_list = []
 
             self.current_netclient.changes_lock.acquire()
-            if len(self.current_netclient.position_list) > 0:
-                position_list = self.current_netclient.position_list.pop(0)
+            if len(self.current_netclient.position_dict) > 0:
+                position_dict = self.current_netclient.position_dict
+                self.current_netclient.position_dict = {}
+
+            pose_capture_dict = self.pose_capture_dict
+            self.pose_capture_dict = {}
 
-            if len(self.current_netclient.python_script_list) > 0:
-                python_script_list = self.current_netclient.python_script_list.pop(0)
+            # All received batches are executed in order
+            for python_script_batch in self.current_netclient.python_script_list:
+                python_script_list.extend(python_script_batch)
+            self.current_netclient.python_script_list = []
 
             self.current_netclient.changes_lock.release()
 
-            for position in position_list:
-                self.set_position(context, position)
+            if self.pose_interpolator is not None:
+                position_dict = self.pose_interpolator.sample()
+
+            for object_name, (object_location, object_rotation_quaternion) in position_dict.items():
+                self.set_position(context, object_name, object_location, object_rotation_quaternion)
+
+            # Motion to display latency, the interpolated poses are shown interpolation_delay after
+            # their capture, the poses that arrive later are extrapolated when they arrive
+            for username, capture_time in pose_capture_dict.items():
+                latency = self.clock_sync.age(capture_time)
+                if latency is not None:
+                    if self.pose_interpolator is not None:
+                        latency = max(latency, self.pose_interpolator.interpolation_delay)
+                    self.peer_latency.observe(username, 'pose', latency)
+
+            if self.object_replicator is not None:
+                self._sync_objects(context)
 
             for python_script in python_script_list:
-                exec(python_script)
+                if isinstance(python_script, str):
+                    exec(python_script)
+                else:
+                    self.apply_operation(python_script)
                       
         except Exception as e:
             print_exception(e)  
         
-    def _sync_data_thread(self, context):
-        print('Start sync_data_thread')
+    # ObjectSync
+    def object_sync_depsgraph_update(self, depsgraph):
+        if self.object_replicator is None:
+            return
+
+        for update in depsgraph.updates:
+            if isinstance(update.id, bpy.types.Object):
+                self.object_replicator.mark_dirty(update.id.original.name)
+            elif isinstance(update.id, bpy.types.Scene):
+                # hide_set only tags the view layer, the hidden object is not in the updates
+                self.object_replicator.mark_all_dirty()
+
+    def update_object_sync_tags(self, context):
+        if self.object_replicator is None:
+            return
+
+        for obj in context.selected_objects:
+            if objectsync.SYNC_PROPERTY in obj:
+                self.object_replicator.baseline([obj.name], self._read_object_state)
+            else:
+                self.object_replicator.untag(obj.name)
+
+    def _read_object_state(self, object_name):
+        obj = bpy.data.objects.get(object_name)
+        if obj is None:
+            return None
+
+        object_location, object_rotation_quaternion, object_scale = obj.matrix_basis.decompose()
+
+        return {
+            objectsync.OBJECT_LOCATION: tuple(object_location),
+            objectsync.OBJECT_ROTATION: tuple(object_rotation_quaternion),
+            objectsync.OBJECT_SCALE: tuple(object_scale),
+            objectsync.OBJECT_VISIBILITY: obj.hide_get(),
+        }
+
+    def _write_object_state(self, object_name, field_dict):
+        obj = bpy.data.objects.get(object_name)
+        if obj is None:
+            return
+
+        if objectsync.OBJECT_VISIBILITY in field_dict:
+            obj.hide_set(field_dict[objectsync.OBJECT_VISIBILITY])
+
+        if any(field in field_dict for field in (objectsync.OBJECT_LOCATION, objectsync.OBJECT_ROTATION, objectsync.OBJECT_SCALE)):
+            object_location, object_rotation_quaternion, object_scale = obj.matrix_basis.decompose()
+
+            object_location = field_dict.get(objectsync.OBJECT_LOCATION, object_location)
+            object_rotation_quaternion = field_dict.get(objectsync.OBJECT_ROTATION, object_rotation_quaternion)
+            object_scale = field_dict.get(objectsync.OBJECT_SCALE, object_scale)
+
+            # matrix_basis keeps the rotation mode of the object
+            obj.matrix_basis = mathutils.Matrix.LocRotScale(object_location, mathutils.Quaternion(object_rotation_quaternion), object_scale)
+
+    def _sync_objects(self, context):
+        """Apply the received object deltas and queue the changes of the tagged objects, on the main thread."""
+        object_replicator = self.object_replicator
+
+        if object_replicator.full_sync:
+            object_name_list = [obj.name for obj in bpy.data.objects if objectsync.SYNC_PROPERTY in obj]
+            object_replicator.baseline(object_name_list, self._read_object_state)
+
+        object_replicator.apply(self._write_object_state)
+
+        if object_replicator.collect(self._read_object_state) > 0:
+            self.script_event.set()
+
+    def _add_object_deltas(self, send_data_request):
+        if self.object_replicator is not None:
+            send_data_request.object_delta_list.extend(self.object_replicator.take_deltas())
+
+    def _pop_audio_data(self, context, timeout=None):
+        """(last recorded audio chunk or None, its capture time), waits up to timeout seconds for it."""
+        vraudio = context.scene.vraudio
+
+        if timeout is not None:
+            vraudio.audio_event.wait(timeout)
+
+        if vraudio.enabled == False:
+            return None, 0
+
+        vraudio.changes_lock.acquire()
+        audio_data = vraudio.audio_data
+        audio_time = vraudio.audio_time
+        vraudio.audio_data = None
+        vraudio.audio_event.clear()
+        vraudio.changes_lock.release()
+
+        return audio_data, self.clock_sync.server_time(audio_time)
+
+    def _resend_scripts(self):
+        """Scripts and the ack not acked by the server are sent again by the next request (e.g. of a new stream)."""
+        self.script_lock.acquire()
+        if len(self.outbound_script_list) > 0:
+            self.outbound_script_sent_seq = self.outbound_script_list[0][0] - 1
+        else:
+            self.outbound_script_sent_seq = self.outbound_script_seq
+        self.inbound_script_acked_seq = 0
+        self.script_lock.release()
+
+    def _add_script_events(self, send_data_request):
+        """Add the scripts not sent yet and the ack of the received scripts to the request."""
+        if self.script_events == False:
+            return
+
+        self.script_lock.acquire()
+        for seq, python_script, state_key, capture_time in self.outbound_script_list:
+            if seq > self.outbound_script_sent_seq:
+                operations.set_script_event_payload(send_data_request.script_event_list.add(seq=seq, state_key=state_key, capture_time=capture_time), python_script)
+        self.outbound_script_sent_seq = self.outbound_script_seq
+
+        if self.inbound_script_seq != self.inbound_script_acked_seq:
+            send_data_request.script_ack = self.inbound_script_seq
+            self.inbound_script_acked_seq = self.inbound_script_seq
+        self.script_lock.release()
+
+    def _process_script_events(self, recv_data_response):
+        python_script_list = []
+
+        self.script_lock.acquire()
+        if recv_data_response.script_ack > 0:
+            self.outbound_script_list = [script for script in self.outbound_script_list if script[0] > recv_data_response.script_ack]
+
+        latency_list = []
+        for script_event in recv_data_response.script_event_list:
+            # The history of a snapshot is not numbered
+            if script_event.seq == 0:
+                python_script_list.append(operations.script_event_payload(script_event))
+                continue
+
+            # Events resent after a lost ack were already executed
+            if script_event.seq <= self.inbound_script_seq:
+                continue
+
+            self.inbound_script_seq = script_event.seq
+            python_script_list.append(operations.script_event_payload(script_event))
+            latency_list.append((script_event.user_id, script_event.capture_time))
+        self.script_lock.release()
+
+        for user_id, capture_time in latency_list:
+            self._observe_latency(user_id, 'script', capture_time)
+
+        if len(recv_data_response.script_event_list) > 0:
+            # Acked by the next request, even when all were duplicates
+            self.script_lock.acquire()
+            self.inbound_script_acked_seq = 0
+            self.script_lock.release()
+            self.script_event.set()
+
+        return python_script_list
+
+    def _create_data_request(self, context, audio=True):
+        send_data_request = netsystem_pb2.ExDataRequest()
+        send_data_request.username = self.current_netclient.username
+        #context = self.context
+        xrsystem = context.scene.xrsystem
 
         try:
-            while self.sync_data_thread_exit == False:
-                #time.sleep(0.01)
-                execution_start = time.perf_counter()
-                
-                # Set Positions
-                #if len(self.current_netclient.username) > 0:
-                send_data_request = netsystem_pb2.ExDataRequest()
-                send_data_request.username = self.current_netclient.username
-                #context = self.context
-                xrsystem = context.scene.xrsystem
+            if xrsystem.enabled == True: # and self.new_positions == False:
+                pose_list = []
+
+                #HMD
+                object_location, object_rotation_quaternion = xrsystem.get_hmd_position(context)
+                pose_list.append((posecodec.TRACKER_HMD, object_location, object_rotation_quaternion))
+
+                #BODY
+                object_location, object_rotation_quaternion = xrsystem.get_body_position(context)
+                pose_list.append((posecodec.TRACKER_BODY, object_location, object_rotation_quaternion))
+
+                #C0
+                if context.scene.view_pg_xrsystem.controller_type == "ACER":
+                    object_location, object_rotation_quaternion = xrsystem.get_controller1_position(context)
+                else:
+                    object_location, object_rotation_quaternion = xrsystem.get_controller0_position(context)
+                pose_list.append((posecodec.TRACKER_CONTROLLER0, object_location, object_rotation_quaternion))
+
+                if context.scene.vrmenunodes.enabled == True:
+                    c0_name = posecodec.tracker_object_name(self.current_netclient.username, posecodec.TRACKER_CONTROLLER0)
+                    context.scene.vrmenunodes.set_parent(context, bpy.data.objects[c0_name])
+                                                            
+                #C1
+                if context.scene.view_pg_xrsystem.controller_type == "ACER":
+                    object_location, object_rotation_quaternion = xrsystem.get_controller0_position(context)
+                else:                        
+                    object_location, object_rotation_quaternion = xrsystem.get_controller1_position(context)
+                pose_list.append((posecodec.TRACKER_CONTROLLER1, object_location, object_rotation_quaternion))
+
+                pose_list = self.pose_filter.filter(pose_list)
+                if len(pose_list) > 0:
+                    send_data_request.pose_data = posecodec.encode_poses(pose_list)
+                    send_data_request.pose_capture_time = self.clock_sync.server_time()
+
+                # Send Audio (over the audio lane when the server has lanes)
+                if audio == True:
+                    audio_data, audio_capture_time = self._pop_audio_data(context)
+                    if audio_data is not None:
+                        send_data_request.audio_data = audio_data
+                        send_data_request.audio_capture_time = audio_capture_time
 
-                try:
-                    if xrsystem.enabled == True: # and self.new_positions == False:
-                        #self.position_list = []
-                                        
-                        #HMD
-                        object_location, object_rotation_quaternion = xrsystem.get_hmd_position(context)
-
-                        hmd_position = send_data_request.position_list.add()                
-                        hmd_position.object_name = self.current_netclient.username + "_HMD";
-                        hmd_position.object_type = "HMD"
-                        #hmd_position.object_location = struct.pack("%3f", *object_location)
-                        hmd_position.object_location.extend(object_location)
-                        hmd_position.object_rotation_quaternion.extend(object_rotation_quaternion)
-
-                        # if bpy.data.objects[hmd_position.object_name].rotation_mode != 'QUATERNION':
-                        #     bpy.data.objects[hmd_position.object_name].rotation_mode = 'QUATERNION'
-
-                        #self.set_position(context, ops_ctx, hmd_position)                            
-
-                        #BODY
-                        object_location, object_rotation_quaternion = xrsystem.get_body_position(context)
-
-                        body_position = send_data_request.position_list.add()                
-                        body_position.object_name = self.current_netclient.username + "_BODY";
-                        body_position.object_type = "BODY"
-                        #body_position.object_location = struct.pack("%3f", *object_location)
-                        body_position.object_location.extend(object_location)
-                        body_position.object_rotation_quaternion.extend(object_rotation_quaternion)                                                    
-
-                        #C0
-                        if context.scene.view_pg_xrsystem.controller_type == "ACER":
-                            object_location, object_rotation_quaternion = xrsystem.get_controller1_position(context)
-                        else:
-                            object_location, object_rotation_quaternion = xrsystem.get_controller0_position(context)
-
-                        c0_position = send_data_request.position_list.add()
-                        c0_position.object_name = self.current_netclient.username + "_CONTROLLER0"
-                        c0_position.object_type = "CONTROLLER0"
-                        c0_position.object_location.extend(object_location)
-                        c0_position.object_rotation_quaternion.extend(object_rotation_quaternion)
-
-                        # need_set_parent = False
-                        # if not c0_position.object_name in bpy.data.objects:
-                        #     need_set_parent = True
-
-                        #self.set_position(context, ops_ctx, c0_position)
-
-                        if context.scene.vrmenunodes.enabled == True:
-                            context.scene.vrmenunodes.set_parent(context, bpy.data.objects[c0_position.object_name])
-                                                                    
-                        #C1
-                        if context.scene.view_pg_xrsystem.controller_type == "ACER":
-                            object_location, object_rotation_quaternion = xrsystem.get_controller0_position(context)
-                        else:                        
-                            object_location, object_rotation_quaternion = xrsystem.get_controller1_position(context)
-
-                        c1_position = send_data_request.position_list.add()
-                        c1_position.object_name = self.current_netclient.username + "_CONTROLLER1"
-                        c1_position.object_type = "CONTROLLER1"
-                        c1_position.object_location.extend(object_location)
-                        c1_position.object_rotation_quaternion.extend(object_rotation_quaternion)
-
-                        # if bpy.data.objects[c1_position.object_name].rotation_mode != 'QUATERNION':
-                        #     bpy.data.objects[c1_position.object_name].rotation_mode = 'QUATERNION'
-
-                        #self.set_position(context, ops_ctx, c1_position)
-
-                        # Send Audio
-                        if context.scene.vraudio.enabled == True:
-                            context.scene.vraudio.changes_lock.acquire()
-                            if not context.scene.vraudio.audio_data == None:
-                                send_data_request.audio_data = context.scene.vraudio.audio_data
-                                context.scene.vraudio.audio_data = None
-                            context.scene.vraudio.changes_lock.release()
+        except Exception as e:
+            print_exception(e)
 
-                except Exception as e:
-                    print_exception(e)                                                                                        
+        return send_data_request
 
-                if len(self.current_netclient.username) > 0:
-                    # Exchange data
-                    recv_data_response = self.vr_management_stub.ExData(send_data_request)
+    def _process_data_response(self, context, recv_data_response):
+        # Recv Positions
+        try:
+            for user_info in recv_data_response.user_info_list:
+                self.username_dict[user_info.user_id] = user_info.username
 
-                    # Recv Positions
-                    try:
-                            # if xrsystem.enabled == True: # and self.new_positions == False:
-                            #for position in recv_data_response.position_list:
-                                #self.set_position(context, ops_ctx, position)
-                            if len(recv_data_response.position_list) > 0:
-                                self.current_netclient.changes_lock.acquire()
-                                if len(self.current_netclient.position_list) == 0:
-                                    self.current_netclient.position_list.append(recv_data_response.position_list)
-                                self.current_netclient.changes_lock.release()
-
-                        # if xrsystem.enabled == True and self.new_positions == False:
-                        #     self.new_positions = True
-                        #pass
-
-                    except Exception as e:
-                        print_exception(e) 
-
-                    # Recv Python Script
-                    try:
-                        if len(recv_data_response.python_script_list) > 0:
-                            #exec(recv_data_response.python_script)
-                            self.current_netclient.changes_lock.acquire()
-                            self.current_netclient.python_script_list.append(recv_data_response.python_script_list)
-                            self.current_netclient.changes_lock.release()
+            self._process_pose_blocks([(pose_block.user_id, pose_block.pose_data, pose_block.capture_time) for pose_block in recv_data_response.pose_block_list])
 
-                    except Exception as e:
-                        print_exception(e) 
+        except Exception as e:
+            print_exception(e) 
 
-                    # Recv Audio
-                    try:
-                        for audio_data in recv_data_response.audio_data_list:
-                            context.scene.vraudio.play_sound(audio_data)
-                    except Exception as e:
-                        print_exception(e) 
+        # Recv Python Script
+        try:
+            python_script_list = list(recv_data_response.python_script_list) + self._process_script_events(recv_data_response)
+
+            if self.object_replicator is not None:
+                self.object_replicator.receive(recv_data_response.object_delta_list)
 
-                execution_end = time.perf_counter()
-                self.execution_time = execution_end - execution_start
+            if len(python_script_list) > 0:
+                #exec(recv_data_response.python_script)
+                self.current_netclient.changes_lock.acquire()
+                self.current_netclient.python_script_list.append(python_script_list)
+                self.current_netclient.changes_lock.release()
 
         except Exception as e:
             print_exception(e) 
 
+        # Recv Audio
+        try:
+            for audio_data in recv_data_response.audio_data_list:
+                context.scene.vraudio.play_sound(audio_data)
+
+            for user_id, capture_time in zip(recv_data_response.audio_user_id_list, recv_data_response.audio_capture_time_list):
+                self._observe_latency(user_id, 'audio', capture_time)
+        except Exception as e:
+            print_exception(e) 
+
+    def _process_pose_blocks(self, pose_block_list):
+        """Apply the (user_id, pose_data, capture_time) blocks, returns the ones of the users whose username is not known yet."""
+        recv_time = time.monotonic()
+
+        position_dict = {}
+        pose_capture_dict = {}
+        unknown_list = []
+        for user_id, pose_data, capture_time in pose_block_list:
+            username = self.username_dict.get(user_id)
+            if username is None:
+                unknown_list.append((user_id, pose_data, capture_time))
+                continue
+
+            if capture_time > 0:
+                pose_capture_dict[username] = max(pose_capture_dict.get(username, 0), capture_time)
+
+            # The jitter buffer is stamped with the capture time on the local clock, so that the
+            # delays of the relay and the network are smoothed out too. Without a capture time or
+            # synchronization the receive time is used.
+            timestamp = recv_time
+            age = self.clock_sync.age(capture_time)
+            if age is not None:
+                timestamp = recv_time - age
+
+            for tracker, object_location, object_rotation_quaternion in posecodec.decode_poses(pose_data):
+                object_name = posecodec.tracker_object_name(username, tracker)
+
+                if self.pose_interpolator is not None:
+                    self.pose_interpolator.add(object_name, object_location, object_rotation_quaternion, timestamp)
+                else:
+                    position_dict[object_name] = (object_location, object_rotation_quaternion)
+
+        if len(position_dict) > 0 or len(pose_capture_dict) > 0:
+            self.current_netclient.changes_lock.acquire()
+            self.current_netclient.position_dict.update(position_dict)
+            for username, capture_time in pose_capture_dict.items():
+                self.pose_capture_dict[username] = max(self.pose_capture_dict.get(username, 0), capture_time)
+            self.current_netclient.changes_lock.release()
+
+        return unknown_list
+
+    def _observe_latency(self, user_id, kind, capture_time):
+        latency = self.clock_sync.age(capture_time)
+        username = self.username_dict.get(user_id)
+
+        if latency is not None and username is not None:
+            self.peer_latency.observe(username, kind, latency)
+
+    def _sync_data_unary(self, context):
+        while self.sync_data_thread_exit == False:
+            self.tick_scheduler.wait()
+            execution_start = time.perf_counter()
+
+            send_data_request = self._create_data_request(context)
+
+            # Nothing is in flight between two calls, a failed call is repeated with the same scripts
+            self._resend_scripts()
+            self._add_script_events(send_data_request)
+            self._add_object_deltas(send_data_request)
+
+            if len(self.current_netclient.username) > 0:
+                # Exchange data
+                self._record(recorder.RECORD_EXDATA, send_data_request)
+                recv_data_response = self.vr_management_stub.ExData(send_data_request, compression=self.compression_policy.request_compression(send_data_request))
+                self._process_data_response(context, recv_data_response)
+
+            execution_end = time.perf_counter()
+            self.execution_time = execution_end - execution_start
+            self.tick_scheduler.done(self.execution_time)
+
+    def _data_request_iterator(self, context):
+        use_lanes = self.use_lanes
+        if use_lanes == False:
+            self._resend_scripts()
+
+        while self.sync_data_thread_exit == False:
+            self.tick_scheduler.wait()
+
+            send_data_request = self._create_data_request(context, use_lanes == False)
+            if use_lanes:
+                send_data_request.lane = netsystem_pb2.LANE_POSES
+            else:
+                self._add_script_events(send_data_request)
+                self._add_object_deltas(send_data_request)
+
+            # The stream pulls the next request only when it is able to send it, the time
+            # spent outside of the generator is the backpressure of the stream
+            self._record(recorder.RECORD_EXDATA, send_data_request)
+
+            yield_start = time.perf_counter()
+            yield send_data_request
+            self.tick_scheduler.done(time.perf_counter() - yield_start)
+
+    def _sync_data_stream(self, context):
+        # gRPC Python compresses either all or none of the messages of a request stream and
+        # most of the frames are small poses, so the requests are sent uncompressed
+        self.data_stream = self.vr_management_stub.StreamExData(self._data_request_iterator(context))
+
+        # Execution time is the interval between two pushed updates
+        execution_start = time.perf_counter()
+        for recv_data_response in self.data_stream:
+            self._process_data_response(context, recv_data_response)
+
+            execution_end = time.perf_counter()
+            self.execution_time = execution_end - execution_start
+            execution_start = execution_end
+
+    def _lane_request_iterator(self, context, lane, stream_done):
+        send_data_request = netsystem_pb2.ExDataRequest(username=self.current_netclient.username, lane=lane)
+        if lane == netsystem_pb2.LANE_SCRIPTS:
+            self._resend_scripts()
+            self._add_script_events(send_data_request)
+            self._add_object_deltas(send_data_request)
+        self._record(recorder.RECORD_EXDATA, send_data_request)
+        yield send_data_request
+
+        while self.sync_data_thread_exit == False and stream_done.is_set() == False:
+            if lane == netsystem_pb2.LANE_AUDIO:
+                audio_data, audio_capture_time = self._pop_audio_data(context, LANE_WAIT_TIMEOUT)
+                if audio_data is not None:
+                    send_data_request = netsystem_pb2.ExDataRequest(username=self.current_netclient.username, audio_data=audio_data, audio_capture_time=audio_capture_time)
+                    self._record(recorder.RECORD_EXDATA, send_data_request)
+                    yield send_data_request
+            else:
+                # The scripts queued since the last request are sent in one batch
+                self.script_event.wait(LANE_WAIT_TIMEOUT)
+                self.script_event.clear()
+
+                send_data_request = netsystem_pb2.ExDataRequest(username=self.current_netclient.username)
+                self._add_script_events(send_data_request)
+                self._add_object_deltas(send_data_request)
+                if len(send_data_request.script_event_list) > 0 or send_data_request.script_ack > 0 or len(send_data_request.object_delta_list) > 0:
+                    self._record(recorder.RECORD_EXDATA, send_data_request)
+                    yield send_data_request
+
+    def _sync_data_lane(self, context, lane):
+        stream_done = threading.Event()
+
+        data_stream = self.vr_management_stub.StreamExData(self._lane_request_iterator(context, lane, stream_done))
+        self.lane_stream_dict[lane] = data_stream
+
+        try:
+            for recv_data_response in data_stream:
+                self._process_data_response(context, recv_data_response)
+        finally:
+            stream_done.set()
+
+    def _sync_lane_thread(self, context, lane):
+        """Keeps the stream of a script or audio lane open, the sync data thread resumes the session."""
+        backoff = scheduler.Backoff()
+
+        while self.sync_data_thread_exit == False:
+            if self.use_stream == False or self.use_lanes == False or len(self.current_netclient.username) == 0:
+                self._wait_reconnect(LANE_WAIT_TIMEOUT)
+                continue
+
+            stream_start = time.monotonic()
+            reconnect_count = self.reconnect_count
+
+            try:
+                self._sync_data_lane(context, lane)
+            except grpc.RpcError as e:
+                if self.sync_data_thread_exit == True:
+                    break
+
+                if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    self._use_unary('The server refused the stream of a lane')
+                    continue
+
+                if e.code() == grpc.StatusCode.NOT_FOUND:
+                    # The session is gone, the lane is opened again once the sync data thread registered
+                    while self.sync_data_thread_exit == False and self.reconnect_count == reconnect_count:
+                        self._wait_reconnect(LANE_WAIT_TIMEOUT)
+                    continue
+
+                if e.code() not in RECONNECT_STATUS_CODES:
+                    print_exception(e)
+                    break
+            except Exception as e:
+                print_exception(e)
+                break
+
+            if time.monotonic() - stream_start > backoff.maximum:
+                backoff.reset()
+            self._wait_reconnect(backoff.next_delay())
+
+    def _register(self, resume_token='', timeout=None):
+        pref = bholodeck_pref.preferences()
+
+        request = netsystem_pb2.RegisterUserRequest(username=pref.username, login=pref.login, password=pref.password, room=pref.room,
+            resume_token=resume_token, script_events=True, host_id=shmtransport.host_id())
+        response = self.vr_management_stub.RegisterUser(request, timeout=timeout)
+        self._record(recorder.RECORD_REGISTER, request)
+
+        self.current_netclient.username = response.username #response.username
+        self.current_netclient.user_id = response.user_id
+        self.current_netclient.landmark_location = response.landmark_location
+        self.current_netclient.landmark_angle = response.landmark_angle
+
+        self.resume_token = response.resume_token
+        self.use_lanes = response.lanes
+        self.script_events = response.script_events
+
+        self._queue_assets(response.asset_list)
+        self._attach_shared_memory(response)
+
+        if response.resumed == False:
+            # The server numbers the scripts of a new session from 1 again
+            self.script_lock.acquire()
+            self.inbound_script_seq = 0
+            self.inbound_script_acked_seq = 0
+            self.script_lock.release()
+
+        return response
+
+    def _load_snapshot(self, timeout=None):
+        """Poses, object state and the compacted script history of the room, for a new session."""
+        try:
+            snapshot = self.vr_management_stub.GetSessionSnapshot(netsystem_pb2.SessionSnapshotRequest(username=self.current_netclient.username), timeout=timeout)
+        except grpc.RpcError as e:
+            # Older servers have no snapshot, the state arrives with the live updates only
+            if e.code() != grpc.StatusCode.UNIMPLEMENTED:
+                print('Snapshot failed: %s' % e.code().name)
+            return
+
+        self._process_data_response(self.context, snapshot)
+
+    def _attach_shared_memory(self, response):
+        """Read the poses and the audio from the shared memory the relay offered, gRPC is used when it is not available."""
+        self.shm_lock.acquire()
+        try:
+            if self.pose_board is not None and self.pose_board.name == response.shm_pose_board and self.audio_ring.name == response.shm_audio_ring:
+                # Resumed, the poses are read again for a new session
+                self.shm_room_id = response.shm_room_id
+                self.pose_board.read_seq_dict = {}
+                self.pose_board.read_generation = None
+                return
+        finally:
+            self.shm_lock.release()
+
+        self._detach_shared_memory()
+
+        if len(response.shm_pose_board) == 0:
+            return
+
+        try:
+            pose_board = shmtransport.PoseBoard.attach(response.shm_pose_board)
+        except (OSError, ValueError) as e:
+            print('Shared memory is not available: %s' % e)
+            return
+
+        try:
+            audio_ring = shmtransport.SlotRing.attach(response.shm_audio_ring)
+        except (OSError, ValueError) as e:
+            print('Shared memory is not available: %s' % e)
+            pose_board.close()
+            return
+
+        # The relay switches to the shared memory once the ring is marked
+        audio_ring.set_consumer_attached(True)
+
+        self.shm_lock.acquire()
+        self.pose_board = pose_board
+        self.audio_ring = audio_ring
+        self.shm_room_id = response.shm_room_id
+        self.shm_pending_pose_dict = {}
+        self.shm_lock.release()
+
+        print('Using the shared memory of the relay')
+
+    def _detach_shared_memory(self):
+        self.shm_lock.acquire()
+        try:
+            if self.audio_ring is not None:
+                self.audio_ring.set_consumer_attached(False)
+                self.audio_ring.close()
+                self.audio_ring = None
+
+            if self.pose_board is not None:
+                self.pose_board.close()
+                self.pose_board = None
+        finally:
+            self.shm_lock.release()
+
+    def _sync_shm_thread(self, context):
+        """Polls the pose board and the audio ring of a client on the host of the relay."""
+        while self.sync_data_thread_exit == False:
+            pose_block_list = []
+            audio_list = []
+
+            self.shm_lock.acquire()
+            attached = self.pose_board is not None
+            if attached:
+                pose_block_list = self.pose_board.read_changes(self.shm_room_id, self.current_netclient.user_id)
+                audio_list = self.audio_ring.read()
+            self.shm_lock.release()
+
+            if attached == False:
+                self._wait_reconnect(LANE_WAIT_TIMEOUT)
+                continue
+
+            try:
+                # The username of a new peer arrives with the next response of the relay
+                for user_id, pose_data, capture_time in pose_block_list:
+                    self.shm_pending_pose_dict[user_id] = (pose_data, capture_time)
+
+                if len(self.shm_pending_pose_dict) > 0:
+                    pose_block_list = [(user_id, pose_data, capture_time) for user_id, (pose_data, capture_time) in self.shm_pending_pose_dict.items()]
+                    self.shm_pending_pose_dict = {user_id: (pose_data, capture_time) for user_id, pose_data, capture_time in self._process_pose_blocks(pose_block_list)}
+
+                for payload in audio_list:
+                    user_id, capture_time, audio_data = shmtransport.unpack_audio(payload)
+                    context.scene.vraudio.play_sound(audio_data)
+                    self._observe_latency(user_id, 'audio', capture_time)
+
+            except Exception as e:
+                print_exception(e)
+
+            time.sleep(shmtransport.SHM_POLL_INTERVAL)
+
+    def _record(self, kind, message):
+        if self.recorder is not None:
+            self.recorder.record(kind, message)
+
+    def _sync_clock(self, count=1, timeout=RESUME_TIMEOUT):
+        """Take count SyncClock samples, returns False when the server has no SyncClock."""
+        for i in range(count):
+            try:
+                client_send_time = clocksync.clock_us()
+                response = self.vr_management_stub.SyncClock(netsystem_pb2.SyncClockRequest(username=self.current_netclient.username,
+                    client_send_time=client_send_time), timeout=timeout)
+                client_receive_time = clocksync.clock_us()
+            except grpc.RpcError as e:
+                # Older servers have no clock, the data is then sent without capture times
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    return False
+
+                print('Clock sync failed: %s' % e.code().name)
+                break
+
+            self.clock_sync.add_sample(response.client_send_time, response.server_receive_time, response.server_send_time, client_receive_time)
+
+        return True
+
+    def _sync_clock_thread(self):
+        """Refreshes the clock offset every CLOCK_SYNC_INTERVAL seconds, the local clock drifts."""
+        while self.sync_data_thread_exit == False:
+            self._wait_reconnect(clocksync.CLOCK_SYNC_INTERVAL)
+
+            if self.sync_data_thread_exit == False and len(self.current_netclient.username) > 0:
+                if self._sync_clock() == False:
+                    break
+
+    def _resume(self):
+        """Register again after a lost connection, reattaching to the session while the server keeps it."""
+        try:
+            response = self._register(self.resume_token, RESUME_TIMEOUT)
+        except grpc.RpcError as e:
+            print('Resume failed: %s' % e.code().name)
+            return False
+
+        if response.resumed == False:
+            # A new session (server restarted or the session expired), the peers are announced again
+            self.username_dict = {}
+            if self.pose_interpolator is not None:
+                self.pose_interpolator.clear()
+            self.peer_latency.clear()
+            self._load_snapshot(RESUME_TIMEOUT)
+
+        # The server may be another machine now
+        self.clock_sync.reset()
+        self._sync_clock(clocksync.CLOCK_SYNC_BURST)
+
+        print('Session %s' % ('resumed' if response.resumed else 'registered again'))
+
+        self.pose_filter.reset()
+        self.reconnect_count += 1
+
+        self.pending_python_script_lock.acquire()
+        pending_python_script_list = self.pending_python_script_list
+        self.pending_python_script_list = []
+        self.pending_python_script_lock.release()
+
+        for python_script, state_key in pending_python_script_list:
+            self.send_python_script(python_script, state_key)
+
+        return True
+
+    def _queue_assets(self, asset_info_list):
+        """The assets of the server that are not in the cache are fetched by the asset thread."""
+        if self.asset_cache is None:
+            return
+
+        missing_list = self.asset_cache.missing(asset_info_list)
+
+        self.asset_lock.acquire()
+        self.pending_asset_list = missing_list
+        self.asset_lock.release()
+
+        if len(missing_list) > 0:
+            self.asset_event.set()
+
+    def _fetch_asset_chunks(self, sha256, offset):
+        self.asset_call = self.asset_stub.FetchAsset(netsystem_pb2.FetchAssetRequest(username=self.current_netclient.username, sha256=sha256, offset=offset))
+
+        return self.asset_call
+
+    def _sync_asset_thread(self, context):
+        """Fetches the pending assets one after another, an interrupted transfer continues where it stopped."""
+        backoff = scheduler.Backoff()
+
+        while self.sync_data_thread_exit == False:
+            if self.asset_event.wait(LANE_WAIT_TIMEOUT) == False:
+                continue
+            self.asset_event.clear()
+
+            self.asset_lock.acquire()
+            asset_info_list = list(self.pending_asset_list)
+            self.asset_lock.release()
+
+            fetched_list = []
+            for asset_info in asset_info_list:
+                if self.sync_data_thread_exit == True:
+                    break
+
+                try:
+                    self.asset_cache.fetch(asset_info, self._fetch_asset_chunks)
+                    fetched_list.append(asset_info.sha256)
+                    print('Asset %s fetched (%d bytes)' % (asset_info.name, asset_info.size))
+
+                except grpc.RpcError as e:
+                    print('Asset %s not fetched: %s' % (asset_info.name, e.code().name))
+                except (IOError, ValueError) as e:
+                    print('Asset %s not fetched: %s' % (asset_info.name, e))
+
+            self.asset_call = None
+
+            self.asset_lock.acquire()
+            self.pending_asset_list = [asset_info for asset_info in self.pending_asset_list if asset_info.sha256 not in fetched_list]
+            pending = len(self.pending_asset_list) > 0
+            self.asset_lock.release()
+
+            if pending:
+                self._wait_reconnect(backoff.next_delay())
+                self.asset_event.set()
+            else:
+                backoff.reset()
+
+    def asset_path(self, name, default_path):
+        """Path of an asset fetched from the server, default_path (the file of the add-on) when it was not fetched."""
+        if self.asset_cache is not None:
+            asset_path = self.asset_cache.find(name)
+            if asset_path is not None:
+                return asset_path
+
+        return default_path
+
+    def _use_unary(self, reason):
+        """Poll with the unary ExData instead of the streams, which are cancelled."""
+        if self.use_stream == False:
+            return
+
+        print('%s, using ExData' % reason)
+        self.use_stream = False
+
+        if self.data_stream is not None:
+            self.data_stream.cancel()
+        for lane_stream in list(self.lane_stream_dict.values()):
+            lane_stream.cancel()
+
+    def _wait_reconnect(self, delay):
+        end = time.monotonic() + delay
+        while self.sync_data_thread_exit == False and time.monotonic() < end:
+            time.sleep(min(0.05, delay))
+
+    def _sync_data_thread(self, context):
+        print('Start sync_data_thread')
+
+        backoff = scheduler.Backoff()
+        connected = len(self.current_netclient.username) > 0
+
+        while self.sync_data_thread_exit == False:
+            if connected == False:
+                self._wait_reconnect(backoff.next_delay())
+                if self.sync_data_thread_exit == False:
+                    connected = self._resume()
+                    if connected:
+                        backoff.reset()
+                continue
+
+            try:
+                if self.use_stream:
+                    try:
+                        self._sync_data_stream(context)
+                    except grpc.RpcError as e:
+                        # Server without StreamExData, or a thread pool server out of streams
+                        if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                            self._use_unary('StreamExData is not supported by the server')
+                        elif e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                            self._use_unary('The server refused the stream')
+                        # Cancelled by the fall back of a lane
+                        elif self.use_stream == True:
+                            raise
+                        continue
+                else:
+                    self._sync_data_unary(context)
+
+            except grpc.RpcError as e:
+                if self.sync_data_thread_exit == True:
+                    break
+
+                # NOT_FOUND: the server dropped the session (timeout, restart), it is registered again
+                if e.code() not in RECONNECT_STATUS_CODES and e.code() != grpc.StatusCode.NOT_FOUND:
+                    print_exception(e)
+                    break
+
+                print('Connection lost (%s), reconnecting' % e.code().name)
+            except Exception as e:
+                print_exception(e)
+                break
+
+            # The stream ended or the server is not reachable
+            connected = False
+
         print('Finish sync_data_thread')
 
     def init(self, context):
@@ -626,37 +1354,103 @@ class NetSystem:
             pref = bholodeck_pref.preferences() 
 
             if pref.is_server():
-                self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
-
-                netsystem_pb2_grpc.add_VRManagementServicer_to_server(VRManagement(), self.server)
-
-                self.server.add_insecure_port('[::]:%d' % (pref.port))
-                self.server.start()
+                config = relay.RelayConfig()
+                config.port = pref.port
+                config.login = pref.login
+                config.password = pref.password
+                config.backend = pref.server_backend
+                config.metrics_port = pref.metrics_port
+                config.compression = pref.compression
+                config.compression_threshold = pref.compression_threshold
+                config.interest_radius = pref.interest_radius
+                config.interest_far_rate = pref.interest_far_rate
+                config.asset_dir = bpy.path.abspath(pref.asset_dir)
+                config.record_path = bpy.path.abspath(pref.record_path)
+
+                self.relay_server = relay.RelayServer(config)
+                self.relay_server.relay.on_register = self._on_user_registered
+                self.relay_server.relay.on_unregister = self._on_user_unregistered
+                self.relay_server.start()
+
+                self.metrics_summary = metrics.MetricsSummary(self.relay_server.relay.metrics)
 
             if pref.is_client():
-                self.channel = grpc.insecure_channel('%s:%d' % (pref.server, pref.port))
+                self.channel = grpc.insecure_channel('%s:%d' % (pref.server, pref.port), options=CHANNEL_OPTIONS)
 
                 self.vr_management_stub = netsystem_pb2_grpc.VRManagementStub(self.channel)
 
+                self.compression_policy = compression.CompressionPolicy(pref.compression, pref.compression_threshold)
+
+                self.asset_stub = self.vr_management_stub
+
+                if len(pref.asset_cache_dir) > 0:
+                    self.asset_cache = assets.AssetCache(bpy.path.abspath(pref.asset_cache_dir))
+                else:
+                    self.asset_cache = assets.AssetCache(os.path.join(bpy.utils.user_resource('DATAFILES'), DEFAULT_ASSET_CACHE_DIR))
+
+                self.resume_token = ''
+
+                if len(pref.record_path) > 0:
+                    self.recorder = recorder.SessionRecorder(bpy.path.abspath(pref.record_path))
+                else:
+                    self.recorder = None
+
+                if pref.use_object_sync:
+                    self.object_replicator = objectsync.ObjectReplicator()
+                    bpy.app.handlers.depsgraph_update_post.append(_object_sync_depsgraph_update)
+                else:
+                    self.object_replicator = None
+
+                # self.position_list = []
+                # self.new_positions = False
+
+                self.username_dict = {}
+                self.current_netclient.position_dict = {}
+                self.pose_capture_dict = {}
+                self.clock_sync.reset()
+                self.peer_latency.clear()
+
+                self.pose_filter = posecodec.PoseFilter(pref.pose_position_epsilon, pref.pose_angle_epsilon, pref.pose_keyframe_interval)
+
+                if pref.use_interpolation:
+                    self.pose_interpolator = posebuffer.PoseInterpolator(pref.interpolation_delay, pref.extrapolation_limit)
+                else:
+                    self.pose_interpolator = None
+
                 try:
-                    response = self.vr_management_stub.RegisterUser(netsystem_pb2.RegisterUserRequest(username=pref.username, login=pref.login, password=pref.password))
-                
-                    self.current_netclient.username = response.username #response.username
-                    self.current_netclient.landmark_location = response.landmark_location
-                    self.current_netclient.landmark_angle = response.landmark_angle
+                    self._register()
+                    self._sync_clock(clocksync.CLOCK_SYNC_BURST)
+                    self._load_snapshot(RESUME_TIMEOUT)
 
                 except Exception as e:
+                    # The sync thread keeps trying to register
                     self.current_netclient.username = ''
                     print_exception(e) 
                     pass
 
-                # self.position_list = []
-                # self.new_positions = False
+                self.tick_scheduler = scheduler.TickScheduler(pref.tick_rate)
+                self.use_stream = pref.use_stream
 
                 self.sync_data_thread_exit = False
                 self.sync_data_thread = threading.Thread(target=_sync_data_thread)
                 self.sync_data_thread.start()
 
+                self.asset_thread = threading.Thread(target=_sync_asset_thread)
+                self.asset_thread.start()
+
+                self.clock_thread = threading.Thread(target=_sync_clock_thread)
+                self.clock_thread.start()
+
+                self.shm_thread = threading.Thread(target=_sync_shm_thread)
+                self.shm_thread.start()
+
+                self.lane_thread_list = []
+                if pref.use_stream:
+                    for lane in BULK_LANES:
+                        lane_thread = threading.Thread(target=_sync_lane_thread, args=(lane,))
+                        lane_thread.start()
+                        self.lane_thread_list.append(lane_thread)
+
                 # bpy.app.handlers.frame_change_pre.append(draw_callback_3d)
                 # bpy.ops.screen.animation_play()
 
@@ -690,20 +1484,74 @@ class NetSystem:
             self.vr_management_stub.SendPositions(netsystem_pb2.SendPositionsRequest(username=self.current_netclient.username, position_list=position_list))
     
     # PythonScriptManagement 
-    def send_python_script(self, python_script):
+    def send_python_script(self, python_script, state_key=''):
+        """Scripts with a state_key replace the previous script with the same key in the history sent to late joiners."""
         if self.enabled == False:
             return
 
-        if len(self.current_netclient.username) > 0:
-            self.vr_management_stub.SendPythonScript(netsystem_pb2.SendPythonScriptRequest(username=self.current_netclient.username, python_script=python_script))
+        if self.script_events == True:
+            # Scripts that only set values are sent as operations, the peers do not compile them
+            operation_list = operations.script_operations(python_script)
+            if operation_list is not None:
+                self._queue_script_events([(operation, operations.operation_state_key(operation)) for operation in operation_list])
+            else:
+                self._queue_script_events([(python_script, state_key)])
+
+        elif len(self.current_netclient.username) > 0:
+            send_python_script_request = netsystem_pb2.SendPythonScriptRequest(username=self.current_netclient.username, python_script=python_script, state_key=state_key,
+                capture_time=self.clock_sync.server_time())
+            self._record(recorder.RECORD_SCRIPT, send_python_script_request)
+
+            try:
+                self.vr_management_stub.SendPythonScript(send_python_script_request,
+                    compression=self.compression_policy.compression(compression.PAYLOAD_SCRIPT, python_script))
+            except grpc.RpcError as e:
+                # Not lost with the connection, sent again once the session is resumed
+                self.pending_python_script_lock.acquire()
+                self.pending_python_script_list.append((python_script, state_key))
+                self.pending_python_script_lock.release()
     
+    def send_operation(self, operation, state_key=None):
+        """Send an Operation (see operations.py), by default it supersedes the previous one setting the same state."""
+        if self.enabled == False:
+            return
+
+        if state_key is None:
+            state_key = operations.operation_state_key(operation)
+
+        if self.script_events == True:
+            self._queue_script_events([(operation, state_key)])
+        else:
+            self.send_python_script(operations.operation_script(operation), state_key)
+
+    def apply_operation(self, operation):
+        if operation.kind == netsystem_pb2.Operation.SET_PROPERTY:
+            operations.set_property(OPERATION_NAMESPACE, operation.path, operations.operation_value(operation))
+        else:
+            self._write_object_state(operation.object_delta.object_name, objectsync.delta_fields(operation.object_delta))
+
+    def _queue_script_events(self, payload_list):
+        """Sent with the next request of the data stream (or the script lane) and resent until acked."""
+        capture_time = self.clock_sync.server_time()
+
+        self.script_lock.acquire()
+        for python_script, state_key in payload_list:
+            self.outbound_script_seq += 1
+            self.outbound_script_list.append((self.outbound_script_seq, python_script, state_key, capture_time))
+        self.script_lock.release()
+        self.script_event.set()
+
     # AudioManagement
     def send_audio(self, audio_data):
         if self.enabled == False:
             return
 
         if len(self.current_netclient.username) > 0:
-            self.vr_management_stub.SendAudio(netsystem_pb2.SendAudioRequest(username=self.current_netclient.username, audio_data=audio_data))
+            send_audio_request = netsystem_pb2.SendAudioRequest(username=self.current_netclient.username, audio_data=audio_data, capture_time=self.clock_sync.server_time())
+            self._record(recorder.RECORD_AUDIO, send_audio_request)
+
+            self.vr_management_stub.SendAudio(send_audio_request,
+                compression=self.compression_policy.compression(compression.PAYLOAD_AUDIO, audio_data))
 
     # def send(self, message):
     #     # bytes = message.encode("utf8")
@@ -740,6 +1588,7 @@ def register():
 
     bpy.utils.register_class(NetSystemStart)    
     bpy.utils.register_class(NetSystemStop)
+    bpy.utils.register_class(NetSystemObjectSyncTag)
     bpy.utils.register_class(VIEW_PT_NetSystemPanel)
 
     bpy.utils.register_class(NETSYSTEM_OT_sync_data_timer)      
@@ -763,6 +1612,7 @@ def unregister():
     """unregister."""
 
     bpy.utils.unregister_class(VIEW_PT_NetSystemPanel)
+    bpy.utils.unregister_class(NetSystemObjectSyncTag)
     bpy.utils.unregister_class(NetSystemStop)
     bpy.utils.unregister_class(NetSystemStart)
 
@@ -24,31 +24,71 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fnetsystem.proto\x12\x0fproto_netsystem\"H\n\x13RegisterUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05login\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\"[\n\x14RegisterUserResponse\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x19\n\x11landmark_location\x18\x02 \x03(\x01\x12\x16\n\x0elandmark_angle\x18\x03 \x01(\x01\")\n\x15UnregisterUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"\x07\n\x05\x45mpty\"q\n\x08Position\x12\x13\n\x0bobject_name\x18\x01 \x01(\t\x12\x13\n\x0bobject_type\x18\x02 \x01(\t\x12\x17\n\x0fobject_location\x18\x03 \x03(\x01\x12\"\n\x1aobject_rotation_quaternion\x18\x04 \x03(\x01\"B\n\x17SendPythonScriptRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpython_script\x18\x02 \x01(\t\"8\n\x10SendAudioRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x12\n\naudio_data\x18\x02 \x01(\x0c\"g\n\rExDataRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x30\n\rposition_list\x18\x02 \x03(\x0b\x32\x19.proto_netsystem.Position\x12\x12\n\naudio_data\x18\x03 \x01(\x0c\"w\n\x0e\x45xDataResponse\x12\x30\n\rposition_list\x18\x01 \x03(\x0b\x32\x19.proto_netsystem.Position\x12\x1a\n\x12python_script_list\x18\x02 \x03(\t\x12\x17\n\x0f\x61udio_data_list\x18\x03 \x03(\x0c\x32\xb0\x03\n\x0cVRManagement\x12]\n\x0cRegisterUser\x12$.proto_netsystem.RegisterUserRequest\x1a%.proto_netsystem.RegisterUserResponse\"\x00\x12R\n\x0eUnregisterUser\x12&.proto_netsystem.UnregisterUserRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12V\n\x10SendPythonScript\x12(.proto_netsystem.SendPythonScriptRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12H\n\tSendAudio\x12!.proto_netsystem.SendAudioRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12K\n\x06\x45xData\x12\x1e.proto_netsystem.ExDataRequest\x1a\x1f.proto_netsystem.ExDataResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fnetsystem.proto\x12\x0fproto_netsystem\"\x94\x01\n\x13RegisterUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\r\n\x05login\x18\x02 \x01(\t\x12\x10\n\x08password\x18\x03 \x01(\t\x12\x0c\n\x04room\x18\x04 \x01(\t\x12\x14\n\x0cresume_token\x18\x05 \x01(\t\x12\x15\n\rscript_events\x18\x06 \x01(\x08\x12\x0f\n\x07host_id\x18\x07 \x01(\t\"\xbc\x02\n\x14RegisterUserResponse\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x19\n\x11landmark_location\x18\x02 \x03(\x01\x12\x16\n\x0elandmark_angle\x18\x03 \x01(\x01\x12\x0c\n\x04room\x18\x04 \x01(\t\x12\x0f\n\x07user_id\x18\x05 \x01(\r\x12\x14\n\x0cresume_token\x18\x06 \x01(\t\x12\x0f\n\x07resumed\x18\x07 \x01(\x08\x12\r\n\x05lanes\x18\x08 \x01(\x08\x12\x15\n\rscript_events\x18\t \x01(\x08\x12.\n\nasset_list\x18\n \x03(\x0b\x32\x1a.proto_netsystem.AssetInfo\x12\x16\n\x0eshm_pose_board\x18\x0b \x01(\t\x12\x13\n\x0bshm_room_id\x18\x0c \x01(\r\x12\x16\n\x0eshm_audio_ring\x18\r \x01(\t\")\n\x15UnregisterUserRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"*\n\x16SessionSnapshotRequest\x12\x10\n\x08username\x18\x01 \x01(\t\">\n\x10SyncClockRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x18\n\x10\x63lient_send_time\x18\x02 \x01(\x04\"d\n\x11SyncClockResponse\x12\x18\n\x10\x63lient_send_time\x18\x01 \x01(\x04\x12\x1b\n\x13server_receive_time\x18\x02 \x01(\x04\x12\x18\n\x10server_send_time\x18\x03 \x01(\x04\"\x07\n\x05\x45mpty\"q\n\x08Position\x12\x13\n\x0bobject_name\x18\x01 \x01(\t\x12\x13\n\x0bobject_type\x18\x02 \x01(\t\x12\x17\n\x0fobject_location\x18\x03 \x03(\x01\x12\"\n\x1aobject_rotation_quaternion\x18\x04 \x03(\x01\"-\n\x08UserInfo\x12\x0f\n\x07user_id\x18\x01 \x01(\r\x12\x10\n\x08username\x18\x02 \x01(\t\"E\n\tPoseBlock\x12\x0f\n\x07user_id\x18\x01 \x01(\r\x12\x11\n\tpose_data\x18\x02 \x01(\x0c\x12\x14\n\x0c\x63\x61pture_time\x18\x03 \x01(\x04\"\x9a\x01\n\x0bScriptEvent\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12\x0f\n\x07user_id\x18\x02 \x01(\r\x12\x15\n\rpython_script\x18\x03 \x01(\t\x12\x11\n\tstate_key\x18\x04 \x01(\t\x12-\n\toperation\x18\x05 \x01(\x0b\x32\x1a.proto_netsystem.Operation\x12\x14\n\x0c\x63\x61pture_time\x18\x06 \x01(\x04\"\x1c\n\x0b\x46loatVector\x12\r\n\x05value\x18\x01 \x03(\x02\"\xd6\x02\n\tOperation\x12-\n\x04kind\x18\x01 \x01(\x0e\x32\x1f.proto_netsystem.Operation.Kind\x12\x0c\n\x04path\x18\x02 \x01(\t\x12\x15\n\x0b\x66loat_value\x18\x03 \x01(\x01H\x00\x12\x13\n\tint_value\x18\x04 \x01(\x12H\x00\x12\x14\n\nbool_value\x18\x05 \x01(\x08H\x00\x12\x16\n\x0cstring_value\x18\x06 \x01(\tH\x00\x12\x34\n\x0cvector_value\x18\x07 \x01(\x0b\x32\x1c.proto_netsystem.FloatVectorH\x00\x12\x32\n\x0cobject_delta\x18\x08 \x01(\x0b\x32\x1c.proto_netsystem.ObjectDelta\"?\n\x04Kind\x12\x10\n\x0cSET_PROPERTY\x10\x00\x12\x11\n\rSET_TRANSFORM\x10\x01\x12\x12\n\x0eSET_VISIBILITY\x10\x02\x42\x07\n\x05value\"k\n\x17SendPythonScriptRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x15\n\rpython_script\x18\x02 \x01(\t\x12\x11\n\tstate_key\x18\x03 \x01(\t\x12\x14\n\x0c\x63\x61pture_time\x18\x04 \x01(\x04\"N\n\x10SendAudioRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x12\n\naudio_data\x18\x02 \x01(\x0c\x12\x14\n\x0c\x63\x61pture_time\x18\x03 \x01(\x04\"\x8d\x01\n\x0bObjectDelta\x12\x13\n\x0bobject_name\x18\x01 \x01(\t\x12\x0f\n\x07user_id\x18\x02 \x01(\r\x12\x0c\n\x04mask\x18\x03 \x01(\r\x12\x10\n\x08location\x18\x04 \x03(\x02\x12\x1b\n\x13rotation_quaternion\x18\x05 \x03(\x02\x12\r\n\x05scale\x18\x06 \x03(\x02\x12\x0c\n\x04hide\x18\x07 \x01(\x08\"\xe0\x02\n\rExDataRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x34\n\rposition_list\x18\x02 \x03(\x0b\x32\x19.proto_netsystem.PositionB\x02\x18\x01\x12\x12\n\naudio_data\x18\x03 \x01(\x0c\x12\x11\n\tpose_data\x18\x04 \x01(\x0c\x12#\n\x04lane\x18\x05 \x01(\x0e\x32\x15.proto_netsystem.Lane\x12\x37\n\x11script_event_list\x18\x06 \x03(\x0b\x32\x1c.proto_netsystem.ScriptEvent\x12\x12\n\nscript_ack\x18\x07 \x01(\x04\x12\x37\n\x11object_delta_list\x18\x08 \x03(\x0b\x32\x1c.proto_netsystem.ObjectDelta\x12\x19\n\x11pose_capture_time\x18\t \x01(\x04\x12\x1a\n\x12\x61udio_capture_time\x18\n \x01(\x04\"\xa6\x03\n\x0e\x45xDataResponse\x12\x34\n\rposition_list\x18\x01 \x03(\x0b\x32\x19.proto_netsystem.PositionB\x02\x18\x01\x12\x1a\n\x12python_script_list\x18\x02 \x03(\t\x12\x17\n\x0f\x61udio_data_list\x18\x03 \x03(\x0c\x12\x33\n\x0fpose_block_list\x18\x04 \x03(\x0b\x32\x1a.proto_netsystem.PoseBlock\x12\x31\n\x0euser_info_list\x18\x05 \x03(\x0b\x32\x19.proto_netsystem.UserInfo\x12\x37\n\x11script_event_list\x18\x06 \x03(\x0b\x32\x1c.proto_netsystem.ScriptEvent\x12\x12\n\nscript_ack\x18\x07 \x01(\x04\x12\x37\n\x11object_delta_list\x18\x08 \x03(\x0b\x32\x1c.proto_netsystem.ObjectDelta\x12\x1a\n\x12\x61udio_user_id_list\x18\t \x03(\r\x12\x1f\n\x17\x61udio_capture_time_list\x18\n \x03(\x04\"\xb2\x03\n\nBusMessage\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12.\n\x04kind\x18\x02 \x01(\x0e\x32 .proto_netsystem.BusMessage.Kind\x12\x0c\n\x04room\x18\x03 \x01(\t\x12\x10\n\x08username\x18\x04 \x01(\t\x12\x0f\n\x07user_id\x18\x05 \x01(\r\x12\x15\n\rlandmark_slot\x18\x06 \x01(\r\x12\x11\n\tpose_data\x18\x07 \x01(\x0c\x12\x15\n\rpython_script\x18\x08 \x01(\t\x12\x12\n\naudio_data\x18\t \x01(\x0c\x12\x37\n\x11object_delta_list\x18\n \x03(\x0b\x32\x1c.proto_netsystem.ObjectDelta\x12\x11\n\tstate_key\x18\x0b \x01(\t\x12-\n\toperation\x18\x0c \x01(\x0b\x32\x1a.proto_netsystem.Operation\x12\x14\n\x0c\x63\x61pture_time\x18\r \x01(\x04\"J\n\x04Kind\x12\x08\n\x04JOIN\x10\x00\x12\t\n\x05LEAVE\x10\x01\x12\t\n\x05POSES\x10\x02\x12\n\n\x06SCRIPT\x10\x03\x12\t\n\x05\x41UDIO\x10\x04\x12\x0b\n\x07OBJECTS\x10\x05\"7\n\tAssetInfo\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\x0e\n\x06sha256\x18\x02 \x01(\t\x12\x0c\n\x04size\x18\x03 \x01(\x04\"%\n\x11ListAssetsRequest\x12\x10\n\x08username\x18\x01 \x01(\t\"D\n\x12ListAssetsResponse\x12.\n\nasset_list\x18\x01 \x03(\x0b\x32\x1a.proto_netsystem.AssetInfo\"E\n\x11\x46\x65tchAssetRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x0e\n\x06sha256\x18\x02 \x01(\t\x12\x0e\n\x06offset\x18\x03 \x01(\x04\"*\n\nAssetChunk\x12\x0e\n\x06offset\x18\x01 \x01(\x04\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c*F\n\x04Lane\x12\x0c\n\x08LANE_ALL\x10\x00\x12\x0e\n\nLANE_POSES\x10\x01\x12\x10\n\x0cLANE_SCRIPTS\x10\x02\x12\x0e\n\nLANE_AUDIO\x10\x03\x32\xeb\x06\n\x0cVRManagement\x12]\n\x0cRegisterUser\x12$.proto_netsystem.RegisterUserRequest\x1a%.proto_netsystem.RegisterUserResponse\"\x00\x12R\n\x0eUnregisterUser\x12&.proto_netsystem.UnregisterUserRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12T\n\tSyncClock\x12!.proto_netsystem.SyncClockRequest\x1a\".proto_netsystem.SyncClockResponse\"\x00\x12`\n\x12GetSessionSnapshot\x12\'.proto_netsystem.SessionSnapshotRequest\x1a\x1f.proto_netsystem.ExDataResponse\"\x00\x12V\n\x10SendPythonScript\x12(.proto_netsystem.SendPythonScriptRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12H\n\tSendAudio\x12!.proto_netsystem.SendAudioRequest\x1a\x16.proto_netsystem.Empty\"\x00\x12K\n\x06\x45xData\x12\x1e.proto_netsystem.ExDataRequest\x1a\x1f.proto_netsystem.ExDataResponse\"\x00\x12U\n\x0cStreamExData\x12\x1e.proto_netsystem.ExDataRequest\x1a\x1f.proto_netsystem.ExDataResponse\"\x00(\x01\x30\x01\x12W\n\nListAssets\x12\".proto_netsystem.ListAssetsRequest\x1a#.proto_netsystem.ListAssetsResponse\"\x00\x12Q\n\nFetchAsset\x12\".proto_netsystem.FetchAssetRequest\x1a\x1b.proto_netsystem.AssetChunk\"\x00\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'netsystem_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_REGISTERUSERREQUEST']._serialized_start=36
-  _globals['_REGISTERUSERREQUEST']._serialized_end=108
-  _globals['_REGISTERUSERRESPONSE']._serialized_start=110
-  _globals['_REGISTERUSERRESPONSE']._serialized_end=201
-  _globals['_UNREGISTERUSERREQUEST']._serialized_start=203
-  _globals['_UNREGISTERUSERREQUEST']._serialized_end=244
-  _globals['_EMPTY']._serialized_start=246
-  _globals['_EMPTY']._serialized_end=253
-  _globals['_POSITION']._serialized_start=255
-  _globals['_POSITION']._serialized_end=368
-  _globals['_SENDPYTHONSCRIPTREQUEST']._serialized_start=370
-  _globals['_SENDPYTHONSCRIPTREQUEST']._serialized_end=436
-  _globals['_SENDAUDIOREQUEST']._serialized_start=438
-  _globals['_SENDAUDIOREQUEST']._serialized_end=494
-  _globals['_EXDATAREQUEST']._serialized_start=496
-  _globals['_EXDATAREQUEST']._serialized_end=599
-  _globals['_EXDATARESPONSE']._serialized_start=601
-  _globals['_EXDATARESPONSE']._serialized_end=720
-  _globals['_VRMANAGEMENT']._serialized_start=723
-  _globals['_VRMANAGEMENT']._serialized_end=1155
+  _globals['_EXDATAREQUEST'].fields_by_name['position_list']._loaded_options = None
+  _globals['_EXDATAREQUEST'].fields_by_name['position_list']._serialized_options = b'\030\001'
+  _globals['_EXDATARESPONSE'].fields_by_name['position_list']._loaded_options = None
+  _globals['_EXDATARESPONSE'].fields_by_name['position_list']._serialized_options = b'\030\001'
+  _globals['_LANE']._serialized_start=3364
+  _globals['_LANE']._serialized_end=3434
+  _globals['_REGISTERUSERREQUEST']._serialized_start=37
+  _globals['_REGISTERUSERREQUEST']._serialized_end=185
+  _globals['_REGISTERUSERRESPONSE']._serialized_start=188
+  _globals['_REGISTERUSERRESPONSE']._serialized_end=504
+  _globals['_UNREGISTERUSERREQUEST']._serialized_start=506
+  _globals['_UNREGISTERUSERREQUEST']._serialized_end=547
+  _globals['_SESSIONSNAPSHOTREQUEST']._serialized_start=549
+  _globals['_SESSIONSNAPSHOTREQUEST']._serialized_end=591
+  _globals['_SYNCCLOCKREQUEST']._serialized_start=593
+  _globals['_SYNCCLOCKREQUEST']._serialized_end=655
+  _globals['_SYNCCLOCKRESPONSE']._serialized_start=657
+  _globals['_SYNCCLOCKRESPONSE']._serialized_end=757
+  _globals['_EMPTY']._serialized_start=759
+  _globals['_EMPTY']._serialized_end=766
+  _globals['_POSITION']._serialized_start=768
+  _globals['_POSITION']._serialized_end=881
+  _globals['_USERINFO']._serialized_start=883
+  _globals['_USERINFO']._serialized_end=928
+  _globals['_POSEBLOCK']._serialized_start=930
+  _globals['_POSEBLOCK']._serialized_end=999
+  _globals['_SCRIPTEVENT']._serialized_start=1002
+  _globals['_SCRIPTEVENT']._serialized_end=1156
+  _globals['_FLOATVECTOR']._serialized_start=1158
+  _globals['_FLOATVECTOR']._serialized_end=1186
+  _globals['_OPERATION']._serialized_start=1189
+  _globals['_OPERATION']._serialized_end=1531
+  _globals['_OPERATION_KIND']._serialized_start=1459
+  _globals['_OPERATION_KIND']._serialized_end=1522
+  _globals['_SENDPYTHONSCRIPTREQUEST']._serialized_start=1533
+  _globals['_SENDPYTHONSCRIPTREQUEST']._serialized_end=1640
+  _globals['_SENDAUDIOREQUEST']._serialized_start=1642
+  _globals['_SENDAUDIOREQUEST']._serialized_end=1720
+  _globals['_OBJECTDELTA']._serialized_start=1723
+  _globals['_OBJECTDELTA']._serialized_end=1864
+  _globals['_EXDATAREQUEST']._serialized_start=1867
+  _globals['_EXDATAREQUEST']._serialized_end=2219
+  _globals['_EXDATARESPONSE']._serialized_start=2222
+  _globals['_EXDATARESPONSE']._serialized_end=2644
+  _globals['_BUSMESSAGE']._serialized_start=2647
+  _globals['_BUSMESSAGE']._serialized_end=3081
+  _globals['_BUSMESSAGE_KIND']._serialized_start=3007
+  _globals['_BUSMESSAGE_KIND']._serialized_end=3081
+  _globals['_ASSETINFO']._serialized_start=3083
+  _globals['_ASSETINFO']._serialized_end=3138
+  _globals['_LISTASSETSREQUEST']._serialized_start=3140
+  _globals['_LISTASSETSREQUEST']._serialized_end=3177
+  _globals['_LISTASSETSRESPONSE']._serialized_start=3179
+  _globals['_LISTASSETSRESPONSE']._serialized_end=3247
+  _globals['_FETCHASSETREQUEST']._serialized_start=3249
+  _globals['_FETCHASSETREQUEST']._serialized_end=3318
+  _globals['_ASSETCHUNK']._serialized_start=3320
+  _globals['_ASSETCHUNK']._serialized_end=3362
+  _globals['_VRMANAGEMENT']._serialized_start=3437
+  _globals['_VRMANAGEMENT']._serialized_end=4312
 # @@protoc_insertion_point(module_scope)
@@ -44,6 +44,16 @@ class VRManagementStub(object):
                 request_serializer=netsystem__pb2.UnregisterUserRequest.SerializeToString,
                 response_deserializer=netsystem__pb2.Empty.FromString,
                 _registered_method=True)
+        self.SyncClock = channel.unary_unary(
+                '/proto_netsystem.VRManagement/SyncClock',
+                request_serializer=netsystem__pb2.SyncClockRequest.SerializeToString,
+                response_deserializer=netsystem__pb2.SyncClockResponse.FromString,
+                _registered_method=True)
+        self.GetSessionSnapshot = channel.unary_unary(
+                '/proto_netsystem.VRManagement/GetSessionSnapshot',
+                request_serializer=netsystem__pb2.SessionSnapshotRequest.SerializeToString,
+                response_deserializer=netsystem__pb2.ExDataResponse.FromString,
+                _registered_method=True)
         self.SendPythonScript = channel.unary_unary(
                 '/proto_netsystem.VRManagement/SendPythonScript',
                 request_serializer=netsystem__pb2.SendPythonScriptRequest.SerializeToString,
@@ -59,6 +69,21 @@ class VRManagementStub(object):
                 request_serializer=netsystem__pb2.ExDataRequest.SerializeToString,
                 response_deserializer=netsystem__pb2.ExDataResponse.FromString,
                 _registered_method=True)
+        self.StreamExData = channel.stream_stream(
+                '/proto_netsystem.VRManagement/StreamExData',
+                request_serializer=netsystem__pb2.ExDataRequest.SerializeToString,
+                response_deserializer=netsystem__pb2.ExDataResponse.FromString,
+                _registered_method=True)
+        self.ListAssets = channel.unary_unary(
+                '/proto_netsystem.VRManagement/ListAssets',
+                request_serializer=netsystem__pb2.ListAssetsRequest.SerializeToString,
+                response_deserializer=netsystem__pb2.ListAssetsResponse.FromString,
+                _registered_method=True)
+        self.FetchAsset = channel.unary_stream(
+                '/proto_netsystem.VRManagement/FetchAsset',
+                request_serializer=netsystem__pb2.FetchAssetRequest.SerializeToString,
+                response_deserializer=netsystem__pb2.AssetChunk.FromString,
+                _registered_method=True)
 
 
 class VRManagementServicer(object):
@@ -77,6 +102,21 @@ class VRManagementServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SyncClock(self, request, context):
+        """NTP-style sample of the offset of the client clock to the server clock (see clocksync.py)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetSessionSnapshot(self, request, context):
+        """State of the room for a client that joined late: the last poses, the replicated objects
+        and the compacted script history (script_event_list with seq 0)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SendPythonScript(self, request, context):
         """PythonScriptManagement 
         """
@@ -98,6 +138,26 @@ class VRManagementServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamExData(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListAssets(self, request, context):
+        """AssetManagement
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FetchAsset(self, request, context):
+        """Chunks of the asset with the sha256 from the offset (to continue an interrupted transfer)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_VRManagementServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -111,6 +171,16 @@ def add_VRManagementServicer_to_server(servicer, server):
                     request_deserializer=netsystem__pb2.UnregisterUserRequest.FromString,
                     response_serializer=netsystem__pb2.Empty.SerializeToString,
             ),
+            'SyncClock': grpc.unary_unary_rpc_method_handler(
+                    servicer.SyncClock,
+                    request_deserializer=netsystem__pb2.SyncClockRequest.FromString,
+                    response_serializer=netsystem__pb2.SyncClockResponse.SerializeToString,
+            ),
+            'GetSessionSnapshot': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetSessionSnapshot,
+                    request_deserializer=netsystem__pb2.SessionSnapshotRequest.FromString,
+                    response_serializer=netsystem__pb2.ExDataResponse.SerializeToString,
+            ),
             'SendPythonScript': grpc.unary_unary_rpc_method_handler(
                     servicer.SendPythonScript,
                     request_deserializer=netsystem__pb2.SendPythonScriptRequest.FromString,
@@ -126,6 +196,21 @@ def add_VRManagementServicer_to_server(servicer, server):
                     request_deserializer=netsystem__pb2.ExDataRequest.FromString,
                     response_serializer=netsystem__pb2.ExDataResponse.SerializeToString,
             ),
+            'StreamExData': grpc.stream_stream_rpc_method_handler(
+                    servicer.StreamExData,
+                    request_deserializer=netsystem__pb2.ExDataRequest.FromString,
+                    response_serializer=netsystem__pb2.ExDataResponse.SerializeToString,
+            ),
+            'ListAssets': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListAssets,
+                    request_deserializer=netsystem__pb2.ListAssetsRequest.FromString,
+                    response_serializer=netsystem__pb2.ListAssetsResponse.SerializeToString,
+            ),
+            'FetchAsset': grpc.unary_stream_rpc_method_handler(
+                    servicer.FetchAsset,
+                    request_deserializer=netsystem__pb2.FetchAssetRequest.FromString,
+                    response_serializer=netsystem__pb2.AssetChunk.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'proto_netsystem.VRManagement', rpc_method_handlers)
@@ -191,6 +276,60 @@ class VRManagement(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SyncClock(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/proto_netsystem.VRManagement/SyncClock',
+            netsystem__pb2.SyncClockRequest.SerializeToString,
+            netsystem__pb2.SyncClockResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetSessionSnapshot(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/proto_netsystem.VRManagement/GetSessionSnapshot',
+            netsystem__pb2.SessionSnapshotRequest.SerializeToString,
+            netsystem__pb2.ExDataResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SendPythonScript(request,
             target,
@@ -271,3 +410,84 @@ class VRManagement(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamExData(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/proto_netsystem.VRManagement/StreamExData',
+            netsystem__pb2.ExDataRequest.SerializeToString,
+            netsystem__pb2.ExDataResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListAssets(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/proto_netsystem.VRManagement/ListAssets',
+            netsystem__pb2.ListAssetsRequest.SerializeToString,
+            netsystem__pb2.ListAssetsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FetchAsset(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/proto_netsystem.VRManagement/FetchAsset',
+            netsystem__pb2.FetchAssetRequest.SerializeToString,
+            netsystem__pb2.AssetChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
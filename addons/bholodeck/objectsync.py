@@ -0,0 +1,200 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Replication of tagged objects. The changes of the transform and the visibility found by the
+# depsgraph_update_post handler are collected per tick and sent as ObjectDeltas that carry
+# only the changed fields; the deltas of the other users are applied in bulk.
+#
+# This module must not import bpy, the object state is a {field: value} dict read and written
+# by the netsystem: locations and scales are (x, y, z), quaternions (w, x, y, z) tuples.
+
+import threading
+
+from . import netsystem_pb2
+
+# Fields of an ObjectDelta (mask bits)
+OBJECT_LOCATION = 1
+OBJECT_ROTATION = 2
+OBJECT_SCALE = 4
+OBJECT_VISIBILITY = 8
+
+OBJECT_FIELDS = (OBJECT_LOCATION, OBJECT_ROTATION, OBJECT_SCALE, OBJECT_VISIBILITY)
+
+# Custom property of the objects that are replicated
+SYNC_PROPERTY = 'bholodeck_sync'
+
+# Smaller (relative) differences are float noise of the matrix decomposition, not changes
+EPSILON = 1e-5
+
+def delta_fields(object_delta):
+    """{field: value} of the fields set in an ObjectDelta."""
+    field_dict = {}
+
+    if object_delta.mask & OBJECT_LOCATION:
+        field_dict[OBJECT_LOCATION] = tuple(object_delta.location)
+    if object_delta.mask & OBJECT_ROTATION:
+        field_dict[OBJECT_ROTATION] = tuple(object_delta.rotation_quaternion)
+    if object_delta.mask & OBJECT_SCALE:
+        field_dict[OBJECT_SCALE] = tuple(object_delta.scale)
+    if object_delta.mask & OBJECT_VISIBILITY:
+        field_dict[OBJECT_VISIBILITY] = object_delta.hide
+
+    return field_dict
+
+def set_delta_field(object_delta, field, value):
+    object_delta.mask |= field
+
+    if field == OBJECT_LOCATION:
+        object_delta.location[:] = value
+    elif field == OBJECT_ROTATION:
+        object_delta.rotation_quaternion[:] = value
+    elif field == OBJECT_SCALE:
+        object_delta.scale[:] = value
+    elif field == OBJECT_VISIBILITY:
+        object_delta.hide = value
+
+def field_changed(field, old_value, new_value):
+    if old_value is None:
+        return True
+
+    if field == OBJECT_VISIBILITY:
+        return old_value != new_value
+
+    if field == OBJECT_ROTATION:
+        # q and -q are the same rotation
+        dot = sum(a * b for a, b in zip(old_value, new_value))
+        return abs(abs(dot) - 1.0) > EPSILON
+
+    return any(abs(a - b) > EPSILON * max(1.0, abs(a)) for a, b in zip(old_value, new_value))
+
+class ObjectReplicator:
+    """Outgoing and incoming object changes of a client.
+
+    mark_dirty, baseline, collect and apply run on Blender's main thread, take_deltas and receive
+    on the network threads. The last sent or applied state of every object is kept, so an object
+    moved by a remote delta does not send the change back.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        # names of the tagged objects and of the ones changed since the last collect
+        self.tagged_set = set()
+        self.dirty_set = set()
+        # object name -> {field: value} last sent or applied
+        self.state_dict = {}
+        # object name -> ObjectDelta waiting to be sent, merged until the next request
+        self.outbound_dict = {}
+        self.inbound_list = []
+
+        # The state of the tagged objects is read as the baseline before the first collect
+        self.full_sync = True
+
+    def mark_dirty(self, object_name):
+        if object_name in self.tagged_set:
+            self.dirty_set.add(object_name)
+
+    def mark_all_dirty(self):
+        self.dirty_set |= self.tagged_set
+
+    def baseline(self, object_name_list, read_state):
+        """Tag the objects and keep their current state, it is not sent (a late joiner receives the state of the room)."""
+        self.lock.acquire()
+        for object_name in object_name_list:
+            self.tagged_set.add(object_name)
+
+            field_dict = read_state(object_name)
+            if field_dict is not None:
+                self.state_dict[object_name] = dict(field_dict)
+        self.full_sync = False
+        self.lock.release()
+
+    def untag(self, object_name):
+        self.tagged_set.discard(object_name)
+        self.dirty_set.discard(object_name)
+
+    def collect(self, read_state):
+        """Queue the changed fields of the dirty objects, read_state(name) returns the {field: value} of an object or None."""
+        dirty_set = self.dirty_set
+        self.dirty_set = set()
+
+        changed_count = 0
+
+        self.lock.acquire()
+        for object_name in dirty_set:
+            field_dict = read_state(object_name)
+            if field_dict is None:
+                continue
+
+            last_field_dict = self.state_dict.setdefault(object_name, {})
+
+            for field, value in field_dict.items():
+                if field_changed(field, last_field_dict.get(field), value) == False:
+                    continue
+
+                last_field_dict[field] = value
+
+                object_delta = self.outbound_dict.get(object_name)
+                if object_delta is None:
+                    object_delta = netsystem_pb2.ObjectDelta(object_name=object_name)
+                    self.outbound_dict[object_name] = object_delta
+                set_delta_field(object_delta, field, value)
+
+                changed_count += 1
+        self.lock.release()
+
+        return changed_count
+
+    def has_deltas(self):
+        return len(self.outbound_dict) > 0
+
+    def take_deltas(self):
+        self.lock.acquire()
+        object_delta_list = list(self.outbound_dict.values())
+        self.outbound_dict = {}
+        self.lock.release()
+
+        return object_delta_list
+
+    def receive(self, object_delta_list):
+        if len(object_delta_list) == 0:
+            return
+
+        self.lock.acquire()
+        self.inbound_list.extend(object_delta_list)
+        self.lock.release()
+
+    def apply(self, write_state):
+        """Apply the received deltas, write_state(name, {field: value}) sets the fields of an object."""
+        self.lock.acquire()
+        inbound_list = self.inbound_list
+        self.inbound_list = []
+        self.lock.release()
+
+        # The latest change of every field wins
+        object_dict = {}
+        for object_delta in inbound_list:
+            object_dict.setdefault(object_delta.object_name, {}).update(delta_fields(object_delta))
+
+        for object_name, field_dict in object_dict.items():
+            write_state(object_name, field_dict)
+
+            self.lock.acquire()
+            self.state_dict.setdefault(object_name, {}).update(field_dict)
+            self.lock.release()
+
+        return len(object_dict)
@@ -0,0 +1,229 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Typed operations (set a property, a transform or the visibility) sent on the script channel
+# instead of script text. A peer applies them by walking the cached steps of the property
+# path, there is nothing to parse or compile per message. Scripts stay for custom logic.
+#
+# This module must not import bpy, the property paths are resolved in a namespace given by
+# the netsystem (e.g. {'bpy': bpy}).
+
+import ast
+import functools
+
+from . import netsystem_pb2
+from . import objectsync
+
+# Distinct property paths whose parsed steps are kept
+PATH_CACHE_SIZE = 1024
+
+# Root names of the property paths of the operations, the keys of the namespace of the netsystem
+OPERATION_ROOT_NAMES = ('bpy',)
+
+@functools.lru_cache(maxsize=PATH_CACHE_SIZE)
+def parse_path(path):
+    """(root name, ((is_item, key), ...)) of a property path like bpy.data.objects["Cube"].location[2].
+
+    Raises ValueError when the path is not made only of attributes and constant subscripts
+    or does not start with one of OPERATION_ROOT_NAMES.
+    """
+    try:
+        node = ast.parse(path.strip(), mode='eval').body
+    except SyntaxError:
+        raise ValueError('Not a property path: %s' % path)
+
+    step_list = []
+    while not isinstance(node, ast.Name):
+        if isinstance(node, ast.Attribute):
+            step_list.append((False, node.attr))
+            node = node.value
+        elif isinstance(node, ast.Subscript):
+            try:
+                key = ast.literal_eval(node.slice)
+            except ValueError:
+                raise ValueError('Not a property path: %s' % path)
+
+            if not isinstance(key, (int, str)):
+                raise ValueError('Not a property path: %s' % path)
+
+            step_list.append((True, key))
+            node = node.value
+        else:
+            raise ValueError('Not a property path: %s' % path)
+
+    if len(step_list) == 0 or node.id not in OPERATION_ROOT_NAMES:
+        raise ValueError('Not a property path: %s' % path)
+
+    step_list.reverse()
+
+    return node.id, tuple(step_list)
+
+def set_property(namespace, path, value):
+    root_name, step_list = parse_path(path)
+
+    target = namespace[root_name]
+    for is_item, key in step_list[:-1]:
+        target = target[key] if is_item else getattr(target, key)
+
+    is_item, key = step_list[-1]
+    if is_item:
+        target[key] = value
+    else:
+        setattr(target, key, value)
+
+def set_property_operation(path, value):
+    """Operation setting the property path to a bool, int, float, str or a sequence of floats."""
+    parse_path(path)
+
+    operation = netsystem_pb2.Operation(kind=netsystem_pb2.Operation.SET_PROPERTY, path=path)
+
+    if isinstance(value, bool):
+        operation.bool_value = value
+    elif isinstance(value, int):
+        operation.int_value = value
+    elif isinstance(value, float):
+        operation.float_value = value
+    elif isinstance(value, str):
+        operation.string_value = value
+    else:
+        operation.vector_value.value.extend(value)
+
+    return operation
+
+def set_transform_operation(object_name, location=None, rotation_quaternion=None, scale=None):
+    """Operation setting the given parts of the transform, the others are kept by the peers."""
+    operation = netsystem_pb2.Operation(kind=netsystem_pb2.Operation.SET_TRANSFORM)
+    operation.object_delta.object_name = object_name
+
+    for field, value in ((objectsync.OBJECT_LOCATION, location), (objectsync.OBJECT_ROTATION, rotation_quaternion), (objectsync.OBJECT_SCALE, scale)):
+        if value is not None:
+            objectsync.set_delta_field(operation.object_delta, field, tuple(value))
+
+    return operation
+
+def set_visibility_operation(object_name, hide):
+    operation = netsystem_pb2.Operation(kind=netsystem_pb2.Operation.SET_VISIBILITY)
+    operation.object_delta.object_name = object_name
+    objectsync.set_delta_field(operation.object_delta, objectsync.OBJECT_VISIBILITY, hide)
+
+    return operation
+
+def operation_value(operation):
+    which = operation.WhichOneof('value')
+    if which is None:
+        return None
+    if which == 'vector_value':
+        return tuple(operation.vector_value.value)
+
+    return getattr(operation, which)
+
+def operation_state_key(operation):
+    """Key of the state set by the operation, a later operation with the same key supersedes it."""
+    if operation.kind == netsystem_pb2.Operation.SET_PROPERTY:
+        return operation.path
+
+    return '%s:%s' % (netsystem_pb2.Operation.Kind.Name(operation.kind), operation.object_delta.object_name)
+
+def operation_script(operation):
+    """Script doing the same as the operation, for the clients that do not know the operations."""
+    if operation.kind == netsystem_pb2.Operation.SET_PROPERTY:
+        return '%s = %r' % (operation.path, operation_value(operation))
+
+    field_dict = objectsync.delta_fields(operation.object_delta)
+    script = 'import bpy\nimport mathutils\nob = bpy.data.objects.get(%r)\nif ob is not None:\n' % operation.object_delta.object_name
+
+    if objectsync.OBJECT_VISIBILITY in field_dict:
+        script += '    ob.hide_set(%r)\n' % field_dict[objectsync.OBJECT_VISIBILITY]
+
+    if any(field in field_dict for field in (objectsync.OBJECT_LOCATION, objectsync.OBJECT_ROTATION, objectsync.OBJECT_SCALE)):
+        script += '    loc, rot, sca = ob.matrix_basis.decompose()\n'
+        script += '    ob.matrix_basis = mathutils.Matrix.LocRotScale(%s, mathutils.Quaternion(%s), %s)\n' % (
+            repr(field_dict[objectsync.OBJECT_LOCATION]) if objectsync.OBJECT_LOCATION in field_dict else 'loc',
+            repr(field_dict[objectsync.OBJECT_ROTATION]) if objectsync.OBJECT_ROTATION in field_dict else 'rot',
+            repr(field_dict[objectsync.OBJECT_SCALE]) if objectsync.OBJECT_SCALE in field_dict else 'sca')
+
+    return script
+
+def script_operations(python_script):
+    """Operations doing the same as a script made only of literal assignments to property paths
+    and hide_set calls of bpy.data.objects[name] (and import bpy), None for any other script."""
+    try:
+        module = ast.parse(python_script)
+    except SyntaxError:
+        return None
+
+    operation_list = []
+    for statement in module.body:
+        if isinstance(statement, ast.Import) and all(alias.name in OPERATION_ROOT_NAMES and alias.asname is None for alias in statement.names):
+            continue
+
+        try:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                path = ast.unparse(statement.targets[0])
+                parse_path(path)
+
+                value = ast.literal_eval(statement.value)
+                if isinstance(value, (list, tuple)):
+                    # A vector is sent as floats, int arrays stay scripts
+                    if not all(isinstance(item, float) for item in value):
+                        return None
+                elif not isinstance(value, (bool, int, float, str)):
+                    return None
+
+                operation_list.append(set_property_operation(path, value))
+                continue
+
+            if (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Call) and isinstance(statement.value.func, ast.Attribute)
+                    and statement.value.func.attr == 'hide_set' and len(statement.value.args) == 1 and len(statement.value.keywords) == 0):
+                root_name, step_list = parse_path(ast.unparse(statement.value.func.value))
+                hide = ast.literal_eval(statement.value.args[0])
+
+                if root_name == 'bpy' and step_list[:2] == ((False, 'data'), (False, 'objects')) and len(step_list) == 3 \
+                        and isinstance(step_list[2][1], str) and isinstance(hide, bool):
+                    operation_list.append(set_visibility_operation(step_list[2][1], hide))
+                    continue
+
+        except ValueError:
+            pass
+
+        return None
+
+    if len(operation_list) == 0:
+        return None
+
+    return operation_list
+
+def script_event_payload(message):
+    """The Operation or the python_script of a ScriptEvent (or a BusMessage)."""
+    if message.HasField('operation'):
+        return message.operation
+
+    return message.python_script
+
+def set_script_event_payload(script_event, payload):
+    if isinstance(payload, str):
+        script_event.python_script = payload
+    else:
+        script_event.operation.CopyFrom(payload)
+
+def payload_script(payload):
+    """Script text of a payload, operations are converted."""
+    if isinstance(payload, str):
+        return payload
+
+    return operation_script(payload)
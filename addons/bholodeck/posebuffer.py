@@ -0,0 +1,153 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Jitter buffer of the remote trackers. Samples are rendered interpolation_delay seconds
+# in the past so that there are usually two samples to interpolate between; on packet gaps
+# the motion is extrapolated for at most extrapolation_limit seconds.
+#
+# This module must not import bpy, locations are (x, y, z) and quaternions (w, x, y, z) tuples.
+
+import collections
+import math
+import threading
+import time
+
+# Samples kept per tracker
+POSE_BUFFER_SIZE = 8
+
+# Trackers that are not sent while stationary, a sample arriving after a longer gap
+# starts from a copy of the previous pose instead of interpolating over the whole gap
+POSE_HOLD_GAP = 0.1
+
+def lerp(a, b, t):
+    return tuple(x + (y - x) * t for x, y in zip(a, b))
+
+def slerp(q0, q1, t):
+    """Spherical interpolation of two unit quaternions, t > 1 extrapolates."""
+    dot = sum(a * b for a, b in zip(q0, q1))
+    if dot < 0.0:
+        q1 = tuple(-v for v in q1)
+        dot = -dot
+
+    if dot > 0.9995:
+        q = lerp(q0, q1, t)
+    else:
+        theta = math.acos(dot)
+        sin_theta = math.sin(theta)
+        s0 = math.sin((1.0 - t) * theta) / sin_theta
+        s1 = math.sin(t * theta) / sin_theta
+        q = tuple(s0 * a + s1 * b for a, b in zip(q0, q1))
+
+    norm = math.sqrt(sum(v * v for v in q))
+    if norm == 0.0:
+        return q1
+
+    return tuple(v / norm for v in q)
+
+class PoseBuffer:
+    def __init__(self):
+        # (timestamp, location, quaternion), oldest first
+        self.sample_list = collections.deque(maxlen=POSE_BUFFER_SIZE)
+
+    def add(self, timestamp, location, quaternion):
+        if len(self.sample_list) > 0:
+            last_timestamp, last_location, last_quaternion = self.sample_list[-1]
+
+            if timestamp <= last_timestamp:
+                return
+
+            if timestamp - last_timestamp > POSE_HOLD_GAP:
+                self.sample_list.append((timestamp - POSE_HOLD_GAP, last_location, last_quaternion))
+
+        self.sample_list.append((timestamp, tuple(location), tuple(quaternion)))
+
+    def sample(self, render_time, extrapolation_limit):
+        if len(self.sample_list) == 0:
+            return None
+
+        first_timestamp, first_location, first_quaternion = self.sample_list[0]
+        if render_time <= first_timestamp:
+            return first_location, first_quaternion
+
+        last_timestamp, last_location, last_quaternion = self.sample_list[-1]
+        if render_time >= last_timestamp:
+            if len(self.sample_list) < 2 or render_time - last_timestamp > extrapolation_limit:
+                return last_location, last_quaternion
+
+            # Dead reckoning from the velocity of the last two samples
+            t0, l0, q0 = self.sample_list[-2]
+            t = 1.0 + (render_time - last_timestamp) / (last_timestamp - t0)
+
+            return lerp(l0, last_location, t), slerp(q0, last_quaternion, t)
+
+        for i in range(len(self.sample_list) - 1, 0, -1):
+            t0, l0, q0 = self.sample_list[i - 1]
+            if t0 <= render_time:
+                t1, l1, q1 = self.sample_list[i]
+                t = (render_time - t0) / (t1 - t0)
+
+                return lerp(l0, l1, t), slerp(q0, q1, t)
+
+        return first_location, first_quaternion
+
+class PoseInterpolator:
+    """Pose buffers of all remote trackers, filled by the network thread and sampled at render time."""
+    def __init__(self, interpolation_delay=0.1, extrapolation_limit=0.25):
+        self.interpolation_delay = interpolation_delay
+        self.extrapolation_limit = extrapolation_limit
+
+        self.pose_buffer_dict = {}
+        self.last_pose_dict = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.lock.acquire()
+        self.pose_buffer_dict = {}
+        self.last_pose_dict = {}
+        self.lock.release()
+
+    def add(self, object_name, location, quaternion, timestamp=None):
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        self.lock.acquire()
+        if object_name not in self.pose_buffer_dict:
+            self.pose_buffer_dict[object_name] = PoseBuffer()
+        self.pose_buffer_dict[object_name].add(timestamp, location, quaternion)
+        self.lock.release()
+
+    def sample(self, now=None):
+        """Return {object_name: (location, quaternion)} of the trackers whose displayed pose changed."""
+        if now is None:
+            now = time.monotonic()
+
+        render_time = now - self.interpolation_delay
+
+        position_dict = {}
+
+        self.lock.acquire()
+        for object_name, pose_buffer in self.pose_buffer_dict.items():
+            pose = pose_buffer.sample(render_time, self.extrapolation_limit)
+            if pose is None or self.last_pose_dict.get(object_name) == pose:
+                continue
+
+            self.last_pose_dict[object_name] = pose
+            position_dict[object_name] = pose
+        self.lock.release()
+
+        return position_dict
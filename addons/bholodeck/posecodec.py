@@ -0,0 +1,203 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Compact binary encoding of the avatar trackers exchanged in ExData.
+#
+# A pose block is a concatenation of fixed size records, one per tracker:
+#   uint8     tracker index (see TRACKER_TYPES)
+#   float32*3 location
+#   uint8     index of the largest quaternion component
+#   int16*3   remaining quaternion components (smallest-three)
+#
+# This module must not import bpy, it is shared with the headless tools.
+
+import math
+import struct
+import time
+
+TRACKER_TYPES = ('HMD', 'BODY', 'CONTROLLER0', 'CONTROLLER1')
+
+TRACKER_HMD = 0
+TRACKER_BODY = 1
+TRACKER_CONTROLLER0 = 2
+TRACKER_CONTROLLER1 = 3
+
+POSE_RECORD = struct.Struct('<B3fB3h')
+
+QUATERNION_SCALE = 32767.0 * math.sqrt(2.0)
+
+def tracker_object_name(username, tracker):
+    return username + '_' + TRACKER_TYPES[tracker]
+
+def clamp_component(value):
+    # Only rounding can push a component of a unit quaternion past the int16 range
+    if value > 32767:
+        return 32767
+    if value < -32767:
+        return -32767
+
+    return value
+
+def quantize_quaternion(quaternion):
+    """(index of the largest component, the other three scaled to int16) of a (w, x, y, z) rotation.
+
+    Called for every tracker of every tick, so the component selection is unrolled.
+    """
+    w, x, y, z = quaternion
+
+    norm = math.sqrt(w * w + x * x + y * y + z * z)
+    if norm == 0.0:
+        return 0, 0, 0, 0
+
+    aw = abs(w)
+    ax = abs(x)
+    ay = abs(y)
+    az = abs(z)
+
+    # The first of equal components is the largest, as in the decoder
+    if aw >= ax and aw >= ay and aw >= az:
+        largest, sign, a, b, c = 0, w, x, y, z
+    elif ax >= ay and ax >= az:
+        largest, sign, a, b, c = 1, x, w, y, z
+    elif ay >= az:
+        largest, sign, a, b, c = 2, y, w, x, z
+    else:
+        largest, sign, a, b, c = 3, z, w, x, y
+
+    # q and -q are the same rotation, the largest component is sent positive
+    scale = QUATERNION_SCALE / norm
+    if sign < 0.0:
+        scale = -scale
+
+    return largest, clamp_component(round(a * scale)), clamp_component(round(b * scale)), clamp_component(round(c * scale))
+
+def dequantize_quaternion(largest, a, b, c):
+    a /= QUATERNION_SCALE
+    b /= QUATERNION_SCALE
+    c /= QUATERNION_SCALE
+    missing = math.sqrt(max(0.0, 1.0 - (a * a + b * b + c * c)))
+
+    if largest == 0:
+        return missing, a, b, c
+    if largest == 1:
+        return a, missing, b, c
+    if largest == 2:
+        return a, b, missing, c
+
+    return a, b, c, missing
+
+def encode_pose(tracker, location, quaternion):
+    largest, a, b, c = quantize_quaternion(quaternion)
+
+    return POSE_RECORD.pack(tracker, location[0], location[1], location[2], largest, a, b, c)
+
+def encode_poses(pose_list):
+    """Encode a list of (tracker, location, quaternion) into a single pose block."""
+    pack_into = POSE_RECORD.pack_into
+    size = POSE_RECORD.size
+
+    pose_data = bytearray(size * len(pose_list))
+    offset = 0
+    for tracker, location, quaternion in pose_list:
+        largest, a, b, c = quantize_quaternion(quaternion)
+        pack_into(pose_data, offset, tracker, location[0], location[1], location[2], largest, a, b, c)
+        offset += size
+
+    return bytes(pose_data)
+
+def split_poses(pose_data):
+    """Split a pose block into a {tracker: record} dict without decoding the values."""
+    size = POSE_RECORD.size
+
+    return {pose_data[i]: pose_data[i:i + size] for i in range(0, len(pose_data) - size + 1, size)}
+
+def decode_poses(pose_data):
+    """Decode a pose block into a list of (tracker, location, quaternion)."""
+    pose_list = []
+
+    for tracker, lx, ly, lz, largest, a, b, c in POSE_RECORD.iter_unpack(pose_data):
+        if tracker >= len(TRACKER_TYPES):
+            continue
+
+        pose_list.append((tracker, (lx, ly, lz), dequantize_quaternion(largest, a, b, c)))
+
+    return pose_list
+
+def decode_pose(record):
+    """Decode one packed record into (tracker, location, quaternion)."""
+    tracker, lx, ly, lz, largest, a, b, c = POSE_RECORD.unpack(record)
+
+    return tracker, (lx, ly, lz), dequantize_quaternion(largest, a, b, c)
+
+def quaternion_angle(q1, q2):
+    """Angle in degrees between two (w, x, y, z) rotations."""
+    n1 = math.sqrt(sum(v * v for v in q1))
+    n2 = math.sqrt(sum(v * v for v in q2))
+    if n1 == 0.0 or n2 == 0.0:
+        return 0.0 if n1 == n2 else 180.0
+
+    dot = abs(sum(a * b for a, b in zip(q1, q2))) / (n1 * n2)
+
+    return math.degrees(2.0 * math.acos(min(1.0, dot)))
+
+class PoseFilter:
+    """Drops trackers that did not move since they were last sent.
+
+    Every keyframe_interval seconds all trackers are sent again, so a receiver that
+    missed an update converges to the current pose.
+    """
+    def __init__(self, position_epsilon=0.001, angle_epsilon=0.5, keyframe_interval=1.0):
+        self.position_epsilon = position_epsilon
+        self.angle_epsilon = angle_epsilon
+        self.keyframe_interval = keyframe_interval
+
+        self.reset()
+
+    def reset(self):
+        self.last_pose_dict = {}
+        self.last_keyframe_time = None
+
+    def changed(self, tracker, location, quaternion):
+        if tracker not in self.last_pose_dict:
+            return True
+
+        last_location, last_quaternion = self.last_pose_dict[tracker]
+
+        if math.dist(location, last_location) > self.position_epsilon:
+            return True
+
+        return quaternion_angle(quaternion, last_quaternion) > self.angle_epsilon
+
+    def filter(self, pose_list, now=None):
+        if now is None:
+            now = time.monotonic()
+
+        keyframe = self.last_keyframe_time is None or now - self.last_keyframe_time >= self.keyframe_interval
+        if keyframe:
+            self.last_keyframe_time = now
+
+        changed_pose_list = []
+        for tracker, location, quaternion in pose_list:
+            location = tuple(location)
+            quaternion = tuple(quaternion)
+
+            if keyframe or self.changed(tracker, location, quaternion):
+                self.last_pose_dict[tracker] = (location, quaternion)
+                changed_pose_list.append((tracker, location, quaternion))
+
+        return changed_pose_list
@@ -0,0 +1,198 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Session recording. The relay records the requests it receives and a client the requests
+# it sends into an append-only log that python -m bholodeck.replay feeds back into a relay.
+#
+# The file starts with RECORDING_MAGIC, followed by records of a RECORD_HEADER (wall clock
+# microseconds, kind, length) and the serialized request. A recording that was not closed
+# can end with a partial record: the reader stops there and the recorder truncates it before
+# it appends to the recording again.
+#
+# This module must not import bpy.
+
+import os
+import queue
+import struct
+import threading
+import time
+
+from google.protobuf.message import DecodeError
+
+from . import clocksync
+from . import netsystem_pb2
+
+RECORDING_MAGIC = b'BHREC\x01\x00\x00'
+
+RECORD_HEADER = struct.Struct('<QBI')
+
+RECORD_REGISTER = 1
+RECORD_UNREGISTER = 2
+RECORD_EXDATA = 3
+RECORD_SCRIPT = 4
+RECORD_AUDIO = 5
+
+# kind -> request message of the record
+RECORD_MESSAGE_TYPES = {
+    RECORD_REGISTER: netsystem_pb2.RegisterUserRequest,
+    RECORD_UNREGISTER: netsystem_pb2.UnregisterUserRequest,
+    RECORD_EXDATA: netsystem_pb2.ExDataRequest,
+    RECORD_SCRIPT: netsystem_pb2.SendPythonScriptRequest,
+    RECORD_AUDIO: netsystem_pb2.SendAudioRequest,
+}
+
+RECORD_NAMES = {
+    RECORD_REGISTER: 'RegisterUser',
+    RECORD_UNREGISTER: 'UnregisterUser',
+    RECORD_EXDATA: 'ExData',
+    RECORD_SCRIPT: 'SendPythonScript',
+    RECORD_AUDIO: 'SendAudio',
+}
+
+# Seconds between two flushes of the buffered records to the file
+RECORD_FLUSH_INTERVAL = 1.0
+
+class SessionRecorder:
+    """Appends records to a file, safe to call from the gRPC threads and the event loop.
+
+    The records are queued and written by a thread of the recorder, a call never waits for the disk.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+        directory = os.path.dirname(os.path.abspath(filepath))
+        os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(filepath):
+            self.file = open(filepath, 'r+b')
+        else:
+            self.file = open(filepath, 'w+b')
+
+        # The records appended after a partial one would be read from the wrong offsets
+        end = complete_length(self.file, filepath)
+        self.file.seek(end)
+        self.file.truncate()
+        if end == 0:
+            self.file.write(RECORDING_MAGIC)
+
+        self.record_queue = queue.Queue()
+        self.closed = False
+
+        self.record_count = 0
+        self.byte_count = 0
+
+        self.write_thread = threading.Thread(target=self._write_thread, daemon=True)
+        self.write_thread.start()
+
+    def record(self, kind, message):
+        # The credentials and the session secret are not written, the replay registers with its own
+        if kind == RECORD_REGISTER:
+            message = netsystem_pb2.RegisterUserRequest(username=message.username, room=message.room, script_events=message.script_events)
+
+        data = message.SerializeToString()
+        header = RECORD_HEADER.pack(clocksync.clock_us(), kind, len(data))
+
+        if self.closed == False:
+            self.record_queue.put(header + data)
+
+    def _write_thread(self):
+        flush_time = time.monotonic()
+
+        while True:
+            try:
+                record = self.record_queue.get(timeout=RECORD_FLUSH_INTERVAL)
+            except queue.Empty:
+                record = b''
+
+            # None is queued by close
+            if record is None:
+                break
+
+            if len(record) > 0:
+                self.file.write(record)
+                self.record_count += 1
+                self.byte_count += len(record)
+
+            now = time.monotonic()
+            if now - flush_time > RECORD_FLUSH_INTERVAL:
+                self.file.flush()
+                flush_time = now
+
+        self.file.close()
+
+    def close(self):
+        """Writes the queued records and closes the file."""
+        if self.closed == True:
+            return
+
+        self.closed = True
+        self.record_queue.put(None)
+        self.write_thread.join()
+
+def complete_length(f, filepath):
+    """Offset of the end of the last complete record of an open recording, 0 when it is empty."""
+    f.seek(0)
+    magic = f.read(len(RECORDING_MAGIC))
+    if len(magic) < len(RECORDING_MAGIC) and RECORDING_MAGIC.startswith(magic):
+        return 0
+
+    if magic != RECORDING_MAGIC:
+        raise ValueError('%s is not a session recording' % filepath)
+
+    size = f.seek(0, os.SEEK_END)
+    end = len(RECORDING_MAGIC)
+
+    while end + RECORD_HEADER.size <= size:
+        f.seek(end)
+        length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))[2]
+        if end + RECORD_HEADER.size + length > size:
+            break
+
+        end += RECORD_HEADER.size + length
+
+    return end
+
+def read_records(filepath):
+    """(wall clock microseconds, kind, request) of the records of a recording, in the order they were written."""
+    with open(filepath, 'rb') as f:
+        if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+            raise ValueError('%s is not a session recording' % filepath)
+
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+
+            time_us, kind, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                break
+
+            message_type = RECORD_MESSAGE_TYPES.get(kind)
+            if message_type is None:
+                # Written by a newer version
+                continue
+
+            try:
+                message = message_type.FromString(data)
+            except DecodeError:
+                # The lengths are intact, only this record is damaged
+                print('Recording %s: skipped a damaged %s record' % (filepath, RECORD_NAMES[kind]))
+                continue
+
+            yield time_us, kind, message
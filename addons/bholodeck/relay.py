@@ -0,0 +1,1711 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Relay of the BHolodeck sessions: rooms, fan-out and the VRManagement gRPC servers.
+#
+# This module must not import bpy. Blender's server mode wraps it in NetSystem and it can
+# run headless on a machine without Blender:
+#
+#   python -m bholodeck.relay --config relay.json
+#
+# Several relay workers (processes of one node or of several nodes) can serve the same
+# rooms, they exchange the state of their local clients over a message bus (relaybus.py):
+#
+#   python -m bholodeck.relay --workers 4
+
+import argparse
+import asyncio
+import collections
+import json
+import math
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+import traceback
+import uuid
+
+from concurrent import futures
+
+import grpc
+
+from . import netsystem_pb2
+from . import netsystem_pb2_grpc
+from . import assets
+from . import clocksync
+from . import compression
+from . import interest
+from . import metrics
+from . import objectsync
+from . import operations
+from . import posecodec
+from . import recorder
+from . import relaybus
+from . import shmtransport
+
+# Room used by clients that do not ask for any
+DEFAULT_ROOM = 'default'
+
+# How long a StreamExData push loop sleeps when nothing changed for the client
+STREAM_WAIT_TIMEOUT = 0.5
+
+DEFAULT_PORT = 7007
+
+DEFAULT_BUS_ADDRESS = '127.0.0.1:7017'
+
+# Seconds after which a client that neither polls nor streams is unregistered
+DEFAULT_SESSION_TIMEOUT = 30.0
+
+# Interval of the session expiry check
+EXPIRE_INTERVAL = 1.0
+
+# Audio chunks queued per sender and receiver, the oldest are dropped when it is full
+AUDIO_QUEUE_LENGTH = 8
+
+# Scripts kept in the history of a room for the session snapshots
+DEFAULT_SCRIPT_HISTORY_LIMIT = 1024
+
+# Largest message of the relay and the clients, a response carries all pending scripts
+MAX_MESSAGE_LENGTH = 64 * 1024 * 1024
+
+LANES = (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_POSES, netsystem_pb2.LANE_SCRIPTS, netsystem_pb2.LANE_AUDIO)
+
+def print_exception(ex):
+    print(traceback.format_exc())
+
+def landmark_slot(slot):
+    """Landmark location and angle of a user slot.
+
+    The first four slots keep the original placement around the origin, every next
+    ring of four users is one unit further away and rotated by 45 degrees.
+    """
+    ring = slot // 4
+    phi = (0.0, 180.0, 90.0, 270.0)[slot % 4] + ring * 45.0
+    radius = 1.0 + ring
+
+    location = [round(radius * math.cos(math.radians(phi)), 6) + 0.0, round(radius * math.sin(math.radians(phi)), 6) + 0.0, 1]
+
+    angle = (phi + 90.0) % 360.0
+    if angle > 180.0:
+        angle -= 360.0
+
+    return location, angle
+
+class PoseSnapshot:
+    def __init__(self, user_id, username):
+        self.user_id = user_id
+        self.username = username
+
+        # room pose version of the last write and the number of writes
+        self.version = 0
+        self.write_count = 0
+        # tracker -> (version, packed pose record)
+        self.record_dict = {}
+        # (location, quaternion) of the last HMD pose, for the interest management
+        self.hmd_pose = None
+        # server clock microseconds of the capture of the last write, 0 when unknown
+        self.capture_time = 0
+        # True when the last write is on the PoseBoard, the local clients read it there
+        self.on_board = False
+
+class ObjectState:
+    def __init__(self, object_name):
+        self.object_name = object_name
+
+        # room object version of the last change
+        self.version = 0
+        # objectsync field -> (version, user_id, value), so that a user does not get its own changes back
+        self.field_dict = {}
+
+class NetRoom:
+    def __init__(self, name, room_id=0, pose_board=None):
+        self.name = name
+
+        # Id of the room on the PoseBoard, the poses are also written there when it is not None
+        self.room_id = room_id
+        self.pose_board = pose_board
+
+        self.netclient_list = []
+        self.netclient_list_lock = threading.Lock()
+
+        # Members connected to the other relay workers, guarded by Relay.netroom_dict_lock
+        self.remote_netclient_list = []
+
+        # Latest pose of every user in the room. Only writers take pose_lock, readers rely on
+        # the record tuples being replaced atomically and on the version being set last.
+        self.pose_snapshot_dict = {}
+        self.pose_version = 0
+        self.pose_lock = threading.Lock()
+
+        # Latest state of the replicated objects, locked like the poses
+        self.object_state_dict = {}
+        self.object_version = 0
+        self.object_lock = threading.Lock()
+
+        # Scripts for the late joiners, state key (or the history seq of a script without a key)
+        # -> (history seq, user_id, python_script or Operation, capture time) in the order of their last update.
+        # Guarded by netclient_list_lock, so a client gets a script either live or in the snapshot.
+        self.script_history = collections.OrderedDict()
+        self.script_history_seq = 0
+        self.script_history_limit = DEFAULT_SCRIPT_HISTORY_LIMIT
+
+    def write_poses(self, sender, pose_data, capture_time=0):
+        self.pose_lock.acquire()
+
+        # The readers do not lock, the snapshot is complete before its version is published and
+        # the version of the room is advanced last, so a reader seeing it also sees the snapshot
+        version = self.pose_version + 1
+
+        if sender.user_id not in self.pose_snapshot_dict:
+            self.pose_snapshot_dict[sender.user_id] = PoseSnapshot(sender.user_id, sender.username)
+        pose_snapshot = self.pose_snapshot_dict[sender.user_id]
+
+        for tracker, record in posecodec.split_poses(pose_data).items():
+            pose_snapshot.record_dict[tracker] = (version, record)
+
+            if tracker == posecodec.TRACKER_HMD:
+                _, location, quaternion = posecodec.decode_pose(record)
+                pose_snapshot.hmd_pose = (location, quaternion)
+        pose_snapshot.write_count += 1
+        pose_snapshot.capture_time = capture_time
+
+        if self.pose_board is not None:
+            record_list = [record for _, record in pose_snapshot.record_dict.values()]
+            pose_snapshot.on_board = self.pose_board.write(sender.user_id, self.room_id, b''.join(record_list), capture_time)
+
+        pose_snapshot.version = version
+        self.pose_version = version
+
+        self.pose_lock.release()
+
+    def read_poses(self, client, response, interest_filter=None):
+        """Add the poses that changed since the client last received them to the response.
+
+        With an interest_filter the peers the client is not interested in are sent at most
+        every far_interval seconds, their versions are not advanced in between so the skipped
+        changes are sent later. Returns the number of pose writes that were superseded before
+        the client read them and the number of peers skipped by the filter.
+        """
+        dropped_count = 0
+        decimated_count = 0
+
+        room_version = self.pose_version
+        if room_version == client.pose_room_version:
+            return dropped_count, decimated_count
+
+        use_board = client.shm_attached()
+
+        if interest_filter is not None:
+            now = time.monotonic()
+            viewer_snapshot = self.pose_snapshot_dict.get(client.user_id)
+            viewer_pose = viewer_snapshot.hmd_pose if viewer_snapshot is not None else None
+
+        for pose_snapshot in list(self.pose_snapshot_dict.values()):
+            if pose_snapshot.user_id == client.user_id:
+                continue
+
+            version = pose_snapshot.version
+            last_version = client.pose_version_dict.get(pose_snapshot.user_id)
+
+            if last_version is None:
+                last_version = 0
+                response.user_info_list.add(user_id=pose_snapshot.user_id, username=pose_snapshot.username)
+
+            if version <= last_version:
+                continue
+
+            # A local client reads the poses of the board from the shared memory
+            if use_board and pose_snapshot.on_board:
+                client.pose_version_dict[pose_snapshot.user_id] = version
+                continue
+
+            full_rate = True
+            if interest_filter is not None:
+                full_rate = interest_filter.full_rate(viewer_pose, pose_snapshot.hmd_pose)
+                if full_rate == False:
+                    if now - client.pose_sent_time_dict.get(pose_snapshot.user_id, 0.0) < interest_filter.far_interval:
+                        decimated_count += 1
+                        continue
+                    client.pose_sent_time_dict[pose_snapshot.user_id] = now
+
+            record_list = [record for record_version, record in list(pose_snapshot.record_dict.values()) if record_version > last_version]
+            response.pose_block_list.add(user_id=pose_snapshot.user_id, pose_data=b''.join(record_list), capture_time=pose_snapshot.capture_time)
+
+            client.pose_version_dict[pose_snapshot.user_id] = version
+
+            write_count = pose_snapshot.write_count
+            last_write_count = client.pose_write_count_dict.get(pose_snapshot.user_id)
+            if full_rate == True and last_write_count is not None and write_count - last_write_count > 1:
+                dropped_count += write_count - last_write_count - 1
+            client.pose_write_count_dict[pose_snapshot.user_id] = write_count
+
+        # Decimated peers keep the room version pending, so they are checked again on the next read
+        if decimated_count == 0:
+            client.pose_room_version = room_version
+
+        return dropped_count, decimated_count
+
+    def remove_poses(self, user_id):
+        self.pose_lock.acquire()
+        self.pose_snapshot_dict.pop(user_id, None)
+        self.pose_version += 1
+        if self.pose_board is not None:
+            self.pose_board.remove(user_id)
+        self.pose_lock.release()
+
+    def write_objects(self, sender, object_delta_list):
+        self.object_lock.acquire()
+
+        for object_delta in object_delta_list:
+            # As in write_poses, the version of the room is advanced after the fields are written
+            version = self.object_version + 1
+
+            if object_delta.object_name not in self.object_state_dict:
+                self.object_state_dict[object_delta.object_name] = ObjectState(object_delta.object_name)
+            object_state = self.object_state_dict[object_delta.object_name]
+
+            for field, value in objectsync.delta_fields(object_delta).items():
+                object_state.field_dict[field] = (version, sender.user_id, value)
+            object_state.version = version
+            self.object_version = version
+
+        self.object_lock.release()
+
+    def read_objects(self, client, response):
+        """Add the object fields changed by the other users since the client last received them to the response."""
+        room_version = self.object_version
+        if room_version == client.object_room_version:
+            return
+
+        for object_state in list(self.object_state_dict.values()):
+            if object_state.version <= client.object_room_version:
+                continue
+
+            object_delta = None
+            for field, (version, user_id, value) in list(object_state.field_dict.items()):
+                if version <= client.object_room_version or user_id == client.user_id:
+                    continue
+
+                if object_delta is None:
+                    object_delta = response.object_delta_list.add(object_name=object_state.object_name, user_id=user_id)
+                objectsync.set_delta_field(object_delta, field, value)
+
+        client.object_room_version = room_version
+
+    def read_snapshot(self, client, response):
+        """Add the state of the room to the response and mark it as sent to the client."""
+        for pose_snapshot in list(self.pose_snapshot_dict.values()):
+            if pose_snapshot.user_id == client.user_id:
+                continue
+
+            version = pose_snapshot.version
+            record_list = [record for _, record in list(pose_snapshot.record_dict.values())]
+
+            response.user_info_list.add(user_id=pose_snapshot.user_id, username=pose_snapshot.username)
+            response.pose_block_list.add(user_id=pose_snapshot.user_id, pose_data=b''.join(record_list), capture_time=pose_snapshot.capture_time)
+
+            client.pose_version_dict[pose_snapshot.user_id] = max(version, client.pose_version_dict.get(pose_snapshot.user_id, 0))
+            client.pose_write_count_dict[pose_snapshot.user_id] = pose_snapshot.write_count
+
+        object_version = self.object_version
+        for object_state in list(self.object_state_dict.values()):
+            object_delta = response.object_delta_list.add(object_name=object_state.object_name)
+            for field, (_, user_id, value) in list(object_state.field_dict.items()):
+                object_delta.user_id = user_id
+                objectsync.set_delta_field(object_delta, field, value)
+        client.object_room_version = max(object_version, client.object_room_version)
+
+        # The scripts recorded after the client joined are in its queue, the history is not numbered (seq 0)
+        self.netclient_list_lock.acquire()
+        for history_seq, user_id, python_script, capture_time in self.script_history.values():
+            if history_seq <= client.script_history_seq:
+                operations.set_script_event_payload(response.script_event_list.add(user_id=user_id, capture_time=capture_time), python_script)
+        self.netclient_list_lock.release()
+
+    def notify_changes(self, username, lane=netsystem_pb2.LANE_POSES):
+        for client in list(self.netclient_list):
+            if client.username != username:
+                client.notify_changes(lane)
+
+    def queue_python_script(self, sender, python_script, state_key='', capture_time=0):
+        self.netclient_list_lock.acquire()
+
+        if self.script_history_limit > 0:
+            self.script_history_seq += 1
+
+            history_key = state_key if len(state_key) > 0 else self.script_history_seq
+            self.script_history.pop(history_key, None)
+            self.script_history[history_key] = (self.script_history_seq, sender.user_id, python_script, capture_time)
+
+            while len(self.script_history) > self.script_history_limit:
+                self.script_history.popitem(last=False)
+
+        netclient_list = list(self.netclient_list)
+        self.netclient_list_lock.release()
+
+        for client in netclient_list:
+            if client.username != sender.username:
+                client.changes_lock.acquire()
+                client.script_seq += 1
+                client.python_script_list.append((client.script_seq, sender.user_id, python_script, capture_time))
+                client.changes_lock.release()
+
+                client.notify_changes(netsystem_pb2.LANE_SCRIPTS)
+
+    def queue_audio(self, sender, audio_data, capture_time=0):
+        """Queue the audio for the other members, returns the number of chunks dropped because the queue was full."""
+        dropped_count = 0
+        username = sender.username
+
+        for client in list(self.netclient_list):
+            if client.username != username:
+                # A local client takes the audio from its ring, a full ring drops the chunk
+                if client.shm_attached():
+                    if client.shm_ring.write(shmtransport.pack_audio(sender.user_id, capture_time, audio_data)) == False:
+                        dropped_count += 1
+                    continue
+
+                client.changes_lock.acquire()
+
+                if username not in client.other_netclient_dict:
+                    client.other_netclient_dict[username] = NetClient()
+                    client.other_netclient_dict[username].audio_data_list = collections.deque(maxlen=AUDIO_QUEUE_LENGTH)
+
+                other_netclient = client.other_netclient_dict[username]
+                other_netclient.user_id = sender.user_id
+
+                if len(other_netclient.audio_data_list) == AUDIO_QUEUE_LENGTH:
+                    dropped_count += 1
+                other_netclient.audio_data_list.append((audio_data, capture_time))
+
+                client.changes_lock.release()
+
+                client.notify_changes(netsystem_pb2.LANE_AUDIO)
+
+        return dropped_count
+
+    def is_empty(self):
+        return len(self.netclient_list) == 0 and len(self.remote_netclient_list) == 0
+
+class LaneStream:
+    """Server side state of the StreamExData stream of one lane of a client."""
+    def __init__(self):
+        self.changes_event = threading.Event()
+        # Wakes an asyncio stream waiting for changes, set by AsyncVRManagement
+        self.changes_waker = None
+        self.closed = True
+        # Incremented by every stream of the lane, a reconnected stream replaces the old one
+        self.stream_id = 0
+
+    def notify(self):
+        self.changes_event.set()
+
+        changes_waker = self.changes_waker
+        if changes_waker is not None:
+            changes_waker()
+
+class NetClient:
+    def __init__(self):
+        self.username = ''
+        self.user_id = 0
+
+        # user_id -> last pose version sent to this client, room version of the last read
+        self.pose_version_dict = {}
+        self.pose_room_version = 0
+        # user_id -> pose write count of the last read, to count the superseded poses
+        self.pose_write_count_dict = {}
+        # user_id -> time of the last decimated send of a peer outside of the interest area
+        self.pose_sent_time_dict = {}
+        # room object version of the last read
+        self.object_room_version = 0
+        # room script history seq when the client joined
+        self.script_history_seq = 0
+        # client side: object name -> (location, quaternion) of the remote trackers waiting to be applied
+        self.position_dict = {}
+        #self.positions_lock = threading.Lock()
+        self.audio_data_list = []
+        #self.audio_data_lock = threading.Lock()
+        # server side: (seq, sender user_id, python_script or Operation, capture time) queued for the client, kept until acked
+        # client side: batches of received scripts and Operations waiting to be executed
+        self.python_script_list = []
+        #self.python_script_lock = threading.Lock()
+
+        # The client sends and receives ScriptEvents, otherwise the scripts are sent once without acks
+        self.script_events = False
+        # seq of the last script queued for, sent to and acked by the client
+        self.script_seq = 0
+        self.script_sent_seq = 0
+        self.script_ack = 0
+        # seq of the last script of the client accepted by the server and the last one acked to it
+        self.script_recv_seq = 0
+        self.script_recv_acked_seq = 0
+
+        self.landmark_location = [0,0,0]
+        self.landmark_angle = 0
+        self.landmark_slot = 0
+
+        self.room = None
+        # Worker of a remote client, its users are dropped when the worker leaves the bus
+        self.worker_id = ''
+
+        self.other_netclient_dict = {}
+        self.changes_lock = threading.Lock()
+        # Lane -> LaneStream
+        self.lane_stream_dict = {lane: LaneStream() for lane in LANES}
+
+        # Secret of the session, RegisterUser with it reattaches to this NetClient
+        self.resume_token = ''
+        self.last_seen = time.monotonic()
+
+        # SlotRing of the audio of a client on the host of the relay
+        self.shm_ring = None
+
+    def shm_attached(self):
+        """True when the client uses the shared memory transport (it marks its ring once attached)."""
+        shm_ring = self.shm_ring
+        return shm_ring is not None and shm_ring.consumer_attached()
+
+    def notify_changes(self, lane):
+        """Wake the stream of the lane and the stream of all lanes."""
+        self.lane_stream_dict[lane].notify()
+        if lane != netsystem_pb2.LANE_ALL:
+            self.lane_stream_dict[netsystem_pb2.LANE_ALL].notify()
+
+    def resend_scripts(self):
+        """The scripts and the ack sent since the last ack of the client are sent again, e.g. on a new stream."""
+        self.changes_lock.acquire()
+        self.script_sent_seq = self.script_ack
+        self.script_recv_acked_seq = 0
+        self.changes_lock.release()
+
+    def has_open_stream(self):
+        return any(lane_stream.closed == False for lane_stream in self.lane_stream_dict.values())
+
+
+class Relay:
+    """Rooms and clients of one relay worker.
+
+    With a bus, the worker is one of worker_count workers of a federation. The user ids
+    are interleaved by worker_index so that they are unique in the whole federation.
+    """
+    def __init__(self, login='', password='', bus=None, worker_index=0, worker_count=1):
+        self.login = login
+        self.password = password
+
+        self.netroom_dict = {}
+        self.netroom_dict_lock = threading.Lock()
+
+        self.netclient_dict = {}
+        self.next_user_id = 0
+
+        self.worker_id = uuid.uuid4().hex
+        self.worker_index = worker_index
+        self.worker_count = max(worker_count, 1)
+
+        # username -> NetClient of the users connected to the other workers
+        self.remote_netclient_dict = {}
+
+        # resume token -> NetClient
+        self.resume_token_dict = {}
+
+        self.metrics = metrics.RelayMetrics(self)
+
+        # InterestFilter of the pose fan-out, None sends all poses at full rate
+        self.interest_filter = None
+
+        # Scripts kept per room for the session snapshots, 0 disables the history
+        self.script_history_limit = DEFAULT_SCRIPT_HISTORY_LIMIT
+
+        # AssetStore of the assets offered to the clients, None serves no assets
+        self.asset_store = None
+
+        # SessionRecorder of the received requests, None records nothing
+        self.recorder = None
+
+        # PoseBoard of the shared memory transport, None when the clients on the host of the relay use gRPC as well
+        self.pose_board = None
+        self.host_id = shmtransport.host_id()
+        self.next_room_id = 0
+
+        # Called with the NetClient after it joined/left a room (e.g. to update Blender's user list)
+        self.on_register = None
+        self.on_unregister = None
+
+        # Subscribed last, the other workers announce their users when this one joins the bus
+        self.bus = bus
+        if self.bus is not None:
+            self.bus.subscribe(self.on_bus_message)
+            self.bus.subscribe_peers(self.on_bus_peer_joined, self.on_bus_peer_gone)
+            self.bus.set_peer_id(self.worker_id)
+
+    def find_client(self, username):
+        return self.netclient_dict.get(username)
+
+    def record(self, kind, message):
+        if self.recorder is not None:
+            self.recorder.record(kind, message)
+
+    def _get_room(self, room_name):
+        # netroom_dict_lock must be held
+        if room_name not in self.netroom_dict:
+            self.next_room_id += 1
+            self.netroom_dict[room_name] = NetRoom(room_name, self.next_room_id, self.pose_board)
+            self.netroom_dict[room_name].script_history_limit = self.script_history_limit
+
+        return self.netroom_dict[room_name]
+
+    def add_client(self, netclient, room_name):
+        if len(room_name) == 0:
+            room_name = DEFAULT_ROOM
+
+        self.netroom_dict_lock.acquire()
+        try:
+            if netclient.username in self.netclient_dict or netclient.username in self.remote_netclient_dict:
+                return False
+
+            netroom = self._get_room(room_name)
+
+            netroom.netclient_list_lock.acquire()
+
+            used_slots = set(client.landmark_slot for client in netroom.netclient_list + netroom.remote_netclient_list)
+            netclient.landmark_slot = 0
+            while netclient.landmark_slot in used_slots:
+                netclient.landmark_slot += 1
+
+            netclient.landmark_location, netclient.landmark_angle = landmark_slot(netclient.landmark_slot)
+            netclient.room = netroom
+
+            netclient.user_id = self.next_user_id * self.worker_count + self.worker_index + 1
+            self.next_user_id += 1
+
+            netroom.netclient_list.append(netclient)
+            netclient.script_history_seq = netroom.script_history_seq
+            netroom.netclient_list_lock.release()
+
+            netclient.resume_token = secrets.token_urlsafe(16)
+            netclient.last_seen = time.monotonic()
+
+            self.netclient_dict[netclient.username] = netclient
+            self.resume_token_dict[netclient.resume_token] = netclient
+        finally:
+            self.netroom_dict_lock.release()
+
+        self._publish(netsystem_pb2.BusMessage.JOIN, netclient)
+
+        if self.on_register is not None:
+            self.on_register(netclient)
+
+        return True
+
+    def remove_client(self, username):
+        self.netroom_dict_lock.acquire()
+        try:
+            netclient = self.netclient_dict.pop(username, None)
+            if netclient is None:
+                return None
+
+            self.resume_token_dict.pop(netclient.resume_token, None)
+
+            netroom = netclient.room
+
+            netroom.netclient_list_lock.acquire()
+            netroom.netclient_list.remove(netclient)
+            netroom.netclient_list_lock.release()
+
+            netroom.remove_poses(netclient.user_id)
+
+            if netroom.is_empty():
+                del self.netroom_dict[netroom.name]
+        finally:
+            self.netroom_dict_lock.release()
+
+        self.detach_shared_memory(netclient)
+
+        self._publish(netsystem_pb2.BusMessage.LEAVE, netclient)
+
+        self.metrics.remove_client(netclient.username)
+
+        if self.on_unregister is not None:
+            self.on_unregister(netclient)
+
+        return netclient
+
+    def attach_shared_memory(self, netclient, host_id):
+        """Create the audio ring of a client on the host of the relay, the client then reads the pose board."""
+        if self.pose_board is None or host_id != self.host_id or netclient.shm_ring is not None:
+            return
+
+        try:
+            netclient.shm_ring = shmtransport.SlotRing.create(shmtransport.segment_name(self.worker_id[:8], netclient.user_id))
+        except OSError as e:
+            print_exception(e)
+
+    def detach_shared_memory(self, netclient):
+        shm_ring = netclient.shm_ring
+        if shm_ring is not None:
+            netclient.shm_ring = None
+            shm_ring.close()
+
+    def resume_client(self, username, resume_token):
+        """NetClient of a session that is still alive, its queued scripts and audio are kept."""
+        self.netroom_dict_lock.acquire()
+        try:
+            netclient = self.resume_token_dict.get(resume_token)
+            if netclient is None or netclient.username != username:
+                return None
+
+            netclient.last_seen = time.monotonic()
+
+            # Responses lost with the old connection are not known, resend all poses
+            netclient.pose_version_dict = {}
+            netclient.pose_room_version = 0
+            netclient.pose_write_count_dict = {}
+            netclient.pose_sent_time_dict = {}
+            netclient.object_room_version = 0
+        finally:
+            self.netroom_dict_lock.release()
+
+        netclient.resend_scripts()
+
+        return netclient
+
+    def expire_sessions(self, session_timeout, now=None):
+        """Unregister the clients without an open stream that were not seen for session_timeout seconds."""
+        if now is None:
+            now = time.monotonic()
+
+        expired_list = [netclient.username for netclient in list(self.netclient_dict.values())
+            if netclient.has_open_stream() == False and now - netclient.last_seen > session_timeout]
+
+        for username in expired_list:
+            print('Session of %s expired' % username)
+            self.remove_client(username)
+
+        return expired_list
+
+    def send_poses(self, sender, pose_data, capture_time=0):
+        sender.room.write_poses(sender, pose_data, capture_time)
+        sender.room.notify_changes(sender.username)
+
+        self._observe_uplink('pose', capture_time)
+        self._publish(netsystem_pb2.BusMessage.POSES, sender, pose_data=pose_data, capture_time=capture_time)
+
+    def send_python_script(self, sender, python_script, state_key='', capture_time=0):
+        sender.room.queue_python_script(sender, python_script, state_key, capture_time)
+
+        self._observe_uplink('script', capture_time)
+        if isinstance(python_script, str):
+            self._publish(netsystem_pb2.BusMessage.SCRIPT, sender, python_script=python_script, state_key=state_key, capture_time=capture_time)
+        else:
+            self._publish(netsystem_pb2.BusMessage.SCRIPT, sender, operation=python_script, state_key=state_key, capture_time=capture_time)
+
+    def send_object_deltas(self, sender, object_delta_list):
+        sender.room.write_objects(sender, object_delta_list)
+        sender.room.notify_changes(sender.username, netsystem_pb2.LANE_SCRIPTS)
+
+        self._publish(netsystem_pb2.BusMessage.OBJECTS, sender, object_delta_list=object_delta_list)
+
+    def send_audio(self, sender, audio_data, capture_time=0):
+        dropped_count = sender.room.queue_audio(sender, audio_data, capture_time)
+        if dropped_count > 0:
+            self.metrics.dropped_frames.inc(dropped_count, ('audio',))
+
+        self._observe_uplink('audio', capture_time)
+        self._publish(netsystem_pb2.BusMessage.AUDIO, sender, audio_data=audio_data, capture_time=capture_time)
+
+    def _observe_uplink(self, kind, capture_time):
+        if capture_time > 0:
+            # Residual clock error can make a latency slightly negative
+            self.metrics.uplink_latency.observe(max(clocksync.clock_us() - capture_time, 0) / 1e6, (kind,))
+
+    def _publish(self, kind, netclient, **kwargs):
+        if self.bus is None:
+            return
+
+        message = netsystem_pb2.BusMessage(worker_id=self.worker_id, kind=kind, room=netclient.room.name,
+            username=netclient.username, user_id=netclient.user_id, landmark_slot=netclient.landmark_slot, **kwargs)
+
+        self.bus.publish(message.SerializeToString())
+
+    def _find_remote_client(self, message):
+        """Remote member of a bus message, created on the first message of a user that joined before this worker started."""
+        self.netroom_dict_lock.acquire()
+        try:
+            netclient = self.remote_netclient_dict.get(message.username)
+            if netclient is None:
+                netclient = NetClient()
+                netclient.username = message.username
+                netclient.user_id = message.user_id
+                netclient.landmark_slot = message.landmark_slot
+                netclient.room = self._get_room(message.room)
+                netclient.room.remote_netclient_list.append(netclient)
+
+                self.remote_netclient_dict[netclient.username] = netclient
+
+            netclient.worker_id = message.worker_id
+        finally:
+            self.netroom_dict_lock.release()
+
+        return netclient
+
+    def _remove_remote_client(self, username):
+        # netroom_dict_lock must be held
+        netclient = self.remote_netclient_dict.pop(username, None)
+        if netclient is None:
+            return
+
+        netroom = netclient.room
+        netroom.remote_netclient_list.remove(netclient)
+        netroom.remove_poses(netclient.user_id)
+
+        if netroom.is_empty():
+            del self.netroom_dict[netroom.name]
+
+    def on_bus_peer_gone(self, worker_id):
+        """Drop the users of a worker that left the bus, of all other workers when worker_id is None (the bus is lost)."""
+        self.netroom_dict_lock.acquire()
+        try:
+            username_list = [netclient.username for netclient in self.remote_netclient_dict.values()
+                if worker_id is None or netclient.worker_id == worker_id]
+
+            for username in username_list:
+                self._remove_remote_client(username)
+        finally:
+            self.netroom_dict_lock.release()
+
+        if len(username_list) > 0:
+            print('Relay: dropped %d users of %s' % (len(username_list), 'the lost bus' if worker_id is None else 'worker ' + worker_id))
+
+    def on_bus_peer_joined(self, worker_id):
+        """Announce the local users to a worker that joined the bus, to all workers when worker_id is None (the bus is back)."""
+        self.netroom_dict_lock.acquire()
+        netclient_list = list(self.netclient_dict.values())
+        self.netroom_dict_lock.release()
+
+        for netclient in netclient_list:
+            self._publish(netsystem_pb2.BusMessage.JOIN, netclient)
+
+    def on_bus_message(self, data):
+        """Apply a message of another worker to the local rooms."""
+        message = netsystem_pb2.BusMessage()
+        message.ParseFromString(data)
+
+        if message.worker_id == self.worker_id:
+            return
+
+        if message.kind == netsystem_pb2.BusMessage.LEAVE:
+            self.netroom_dict_lock.acquire()
+            try:
+                self._remove_remote_client(message.username)
+            finally:
+                self.netroom_dict_lock.release()
+            return
+
+        netclient = self._find_remote_client(message)
+
+        if message.kind == netsystem_pb2.BusMessage.POSES:
+            netclient.room.write_poses(netclient, message.pose_data, message.capture_time)
+            netclient.room.notify_changes(netclient.username)
+
+        elif message.kind == netsystem_pb2.BusMessage.SCRIPT:
+            netclient.room.queue_python_script(netclient, operations.script_event_payload(message), message.state_key, message.capture_time)
+
+        elif message.kind == netsystem_pb2.BusMessage.OBJECTS:
+            netclient.room.write_objects(netclient, message.object_delta_list)
+            netclient.room.notify_changes(netclient.username, netsystem_pb2.LANE_SCRIPTS)
+
+        elif message.kind == netsystem_pb2.BusMessage.AUDIO:
+            dropped_count = netclient.room.queue_audio(netclient, message.audio_data, message.capture_time)
+            if dropped_count > 0:
+                self.metrics.dropped_frames.inc(dropped_count, ('audio',))
+
+class VRManagement(netsystem_pb2_grpc.VRManagementServicer):
+    def __init__(self, relay, compression_policy=None, max_streams=0):
+        self.relay = relay
+        self.compression_policy = compression_policy
+
+        # An open StreamExData holds a thread of the pool, the streams over max_streams (0 is
+        # unlimited) are refused so that the unary calls keep their threads
+        self.max_streams = max_streams
+        self.stream_count = 0
+        self.stream_lock = threading.Lock()
+
+    def RegisterUser(self, request, context):
+
+        if self.relay.login != request.login or self.relay.password != request.password:
+            raise Exception('wrong credentials') 
+
+        if len(request.username) < 3:
+            raise Exception('username is too short')
+
+        if len(request.resume_token) > 0:
+            netclient = self.relay.resume_client(request.username, request.resume_token)
+            if netclient is not None:
+                netclient.script_events = request.script_events
+                self.relay.attach_shared_memory(netclient, request.host_id)
+                return self.register_response(netclient, True)
+
+        netclient = NetClient()
+        netclient.username = request.username
+        netclient.script_events = request.script_events
+
+        if not self.relay.add_client(netclient, request.room):
+            raise Exception('username %s exist - unregister first' % request.username)        
+
+        self.relay.record(recorder.RECORD_REGISTER, request)
+        self.relay.attach_shared_memory(netclient, request.host_id)
+
+        return self.register_response(netclient, False)
+
+    def register_response(self, netclient, resumed):
+        response = netsystem_pb2.RegisterUserResponse()
+        response.username = netclient.username
+        response.room = netclient.room.name
+
+        response.landmark_location.extend(netclient.landmark_location)
+        response.landmark_angle = 0 #netclient.landmark_angle * 3.14 / 180.0
+        response.user_id = netclient.user_id
+
+        response.resume_token = netclient.resume_token
+        response.resumed = resumed
+        response.lanes = True
+        response.script_events = True
+
+        if self.relay.asset_store is not None:
+            response.asset_list.extend(self.relay.asset_store.asset_info_list())
+
+        shm_ring = netclient.shm_ring
+        if shm_ring is not None:
+            response.shm_pose_board = self.relay.pose_board.name
+            response.shm_room_id = netclient.room.room_id
+            response.shm_audio_ring = shm_ring.name
+
+        return response
+
+    def UnregisterUser(self, request, context):
+
+        self.relay.record(recorder.RECORD_UNREGISTER, request)
+        self.relay.remove_client(request.username)
+
+        return netsystem_pb2.Empty()
+
+    def SyncClock(self, request, context):
+        server_receive_time = clocksync.clock_us()
+
+        return netsystem_pb2.SyncClockResponse(client_send_time=request.client_send_time, server_receive_time=server_receive_time,
+            server_send_time=clocksync.clock_us())
+
+    def GetSessionSnapshot(self, request, context):
+        status, details, response = self.session_snapshot(request, context)
+        if status != grpc.StatusCode.OK:
+            context.abort(status, details)
+
+        return response
+
+    def session_snapshot(self, request, context):
+        """(status, details, response) of GetSessionSnapshot, the call is aborted by the caller unless the status is OK."""
+        client = self.find_client(request.username)
+        if client is None:
+            return grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username, None
+
+        response = netsystem_pb2.ExDataResponse()
+        client.room.read_snapshot(client, response)
+
+        self.relay.metrics.client_sent(client.username, response.ByteSize())
+        self.set_message_compression(context, response)
+
+        return grpc.StatusCode.OK, '', response
+
+    def SendPythonScript(self, request, context):
+        try: 
+            sender = self.find_client(request.username)
+            if sender is None:
+                return netsystem_pb2.Empty()
+
+            if len(request.python_script) > 0:
+                self.relay.record(recorder.RECORD_SCRIPT, request)
+                self.relay.send_python_script(sender, request.python_script, request.state_key, request.capture_time)
+        except Exception as e:
+            print_exception(e)
+
+        return netsystem_pb2.Empty()
+
+    def SendAudio(self, request, context):
+        try: 
+            sender = self.find_client(request.username)
+            if sender is None:
+                return netsystem_pb2.Empty()
+
+            if len(request.audio_data) > 0:
+                self.relay.record(recorder.RECORD_AUDIO, request)
+                self.relay.send_audio(sender, request.audio_data, request.capture_time)
+
+        except Exception as e:
+            print_exception(e)
+
+        return netsystem_pb2.Empty()
+
+    def find_client(self, username):
+        return self.relay.find_client(username)
+
+    def find_asset(self, sha256):
+        if self.relay.asset_store is None:
+            return None
+
+        return self.relay.asset_store.find(sha256)
+
+    def ListAssets(self, request, context):
+        response = netsystem_pb2.ListAssetsResponse()
+
+        if self.relay.asset_store is not None:
+            response.asset_list.extend(self.relay.asset_store.asset_info_list())
+
+        return response
+
+    def FetchAsset(self, request, context):
+        client = self.find_client(request.username)
+        if client is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username)
+
+        asset = self.find_asset(request.sha256)
+        if asset is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'unknown asset %s' % request.sha256)
+
+        for chunk in self.relay.asset_store.read_chunks(asset, request.offset):
+            self.relay.metrics.client_sent(client.username, chunk.ByteSize())
+
+            # Most asset formats are compressed already, the chunks are sent at link speed
+            context.disable_next_message_compression()
+            yield chunk
+
+    def push_data(self, request):
+        sender = self.find_client(request.username)
+        if sender is None:
+            return
+
+        sender.last_seen = time.monotonic()
+        self.relay.metrics.client_received(sender.username, request.ByteSize())
+        self.relay.record(recorder.RECORD_EXDATA, request)
+
+        if len(request.pose_data) > 0:
+            self.relay.send_poses(sender, request.pose_data, request.pose_capture_time)
+
+        if len(request.audio_data) > 0:
+            self.relay.send_audio(sender, request.audio_data, request.audio_capture_time)
+
+        if len(request.object_delta_list) > 0:
+            self.relay.send_object_deltas(sender, request.object_delta_list)
+
+        if request.script_ack > 0:
+            sender.changes_lock.acquire()
+            if request.script_ack > sender.script_ack:
+                sender.script_ack = request.script_ack
+                sender.python_script_list = [script_event for script_event in sender.python_script_list if script_event[0] > sender.script_ack]
+            sender.changes_lock.release()
+
+        if len(request.script_event_list) > 0:
+            for script_event in request.script_event_list:
+                # Events resent after a lost ack were already relayed
+                if script_event.seq <= sender.script_recv_seq:
+                    continue
+
+                sender.script_recv_seq = script_event.seq
+                self.relay.send_python_script(sender, operations.script_event_payload(script_event), script_event.state_key, script_event.capture_time)
+
+            # Acked even when all were duplicates, the previous ack may be lost
+            sender.changes_lock.acquire()
+            sender.script_recv_acked_seq = 0
+            sender.changes_lock.release()
+            sender.notify_changes(netsystem_pb2.LANE_SCRIPTS)
+
+    def pull_data(self, client, lane=netsystem_pb2.LANE_ALL):
+        """Response with the changes of the lane, LANE_ALL pulls all of them."""
+        response = netsystem_pb2.ExDataResponse()
+
+        client.last_seen = time.monotonic()
+
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_POSES):
+            dropped_count, decimated_count = client.room.read_poses(client, response, self.relay.interest_filter)
+            if dropped_count > 0:
+                self.relay.metrics.dropped_frames.inc(dropped_count, ('pose',))
+            if decimated_count > 0:
+                self.relay.metrics.decimated_poses.inc(decimated_count)
+
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_SCRIPTS):
+            client.room.read_objects(client, response)
+
+        python_script_list = []
+        audio_data_list = []
+        pending = False
+
+        client.changes_lock.acquire()
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_SCRIPTS):
+            # All pending scripts are sent at once
+            if client.script_events == True:
+                for seq, user_id, python_script, capture_time in client.python_script_list:
+                    if seq > client.script_sent_seq:
+                        operations.set_script_event_payload(response.script_event_list.add(seq=seq, user_id=user_id, capture_time=capture_time), python_script)
+                client.script_sent_seq = client.script_seq
+
+                if client.script_recv_seq != client.script_recv_acked_seq:
+                    response.script_ack = client.script_recv_seq
+                    client.script_recv_acked_seq = client.script_recv_seq
+            else:
+                # The operations are sent as scripts to the clients that do not know them
+                python_script_list = [operations.payload_script(python_script) for _, _, python_script, _ in client.python_script_list]
+                client.python_script_list = []
+
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_AUDIO):
+            for other_netclient in client.other_netclient_dict.values():
+                if len(other_netclient.audio_data_list) > 0:
+                    audio_data, capture_time = other_netclient.audio_data_list.popleft()
+                    audio_data_list.append(audio_data)
+                    response.audio_user_id_list.append(other_netclient.user_id)
+                    response.audio_capture_time_list.append(capture_time)
+                    pending = pending or len(other_netclient.audio_data_list) > 0
+
+        client.changes_lock.release()
+
+        # One chunk per sender is sent at a time, the stream pulls the rest right away
+        if pending:
+            client.lane_stream_dict[lane].notify()
+
+        if len(python_script_list) > 0:
+            response.python_script_list.extend(python_script_list)
+
+        if len(audio_data_list) > 0:
+            response.audio_data_list.extend(audio_data_list)
+
+        self.relay.metrics.client_sent(client.username, response.ByteSize())
+
+        return response
+
+    def set_message_compression(self, context, response):
+        """The server compresses all messages by default, responses without scripts or audio worth it are sent uncompressed.
+
+        (grpc.aio ignores set_compression on unary calls, disabling works for both backends.)
+        """
+        if self.compression_policy is None or context is None or self.compression_policy.enabled() == False:
+            return
+
+        if self.compression_policy.compress_response(response) == False:
+            context.disable_next_message_compression()
+
+    def ExData(self, request, context):
+        status, details, response = self.exchange_data(request, context)
+        if status != grpc.StatusCode.OK and context is not None:
+            context.abort(status, details)
+
+        return response
+
+    def exchange_data(self, request, context):
+        """(status, details, response) of ExData, the call is aborted by the caller unless the status is OK."""
+        # An unknown user is reported, the client registers again (or resumes its session)
+        if self.find_client(request.username) is None:
+            return grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username, netsystem_pb2.ExDataResponse()
+
+        try:
+            self.push_data(request)
+
+            client = self.find_client(request.username)
+            if client is not None:
+                # Nothing is in flight between two calls, the scripts not acked by the request were lost
+                client.resend_scripts()
+
+                response = self.pull_data(client)
+                self.set_message_compression(context, response)
+                return grpc.StatusCode.OK, '', response
+
+        except Exception as e:
+            print_exception(e)
+
+        return grpc.StatusCode.OK, '', netsystem_pb2.ExDataResponse()
+
+    def _stream_recv(self, request_iterator, client, lane_stream, stream_id):
+        try:
+            for request in request_iterator:
+                self.push_data(request)
+        except grpc.RpcError:
+            # The client cancelled the stream or the connection was lost
+            pass
+        except Exception as e:
+            print_exception(e)
+
+        if lane_stream.stream_id == stream_id:
+            lane_stream.closed = True
+            client.last_seen = time.monotonic()
+        lane_stream.notify()
+
+    def _acquire_stream(self):
+        self.stream_lock.acquire()
+        try:
+            if self.max_streams > 0 and self.stream_count >= self.max_streams:
+                return False
+
+            self.stream_count += 1
+            return True
+        finally:
+            self.stream_lock.release()
+
+    def _release_stream(self):
+        self.stream_lock.acquire()
+        self.stream_count -= 1
+        self.stream_lock.release()
+
+    def StreamExData(self, request_iterator, context):
+        # The client falls back to the unary ExData
+        if self._acquire_stream() == False:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, 'too many streams, use ExData')
+
+        try:
+            yield from self._stream_ex_data(request_iterator, context)
+        finally:
+            self._release_stream()
+
+    def _stream_ex_data(self, request_iterator, context):
+        # The first frame identifies the user and the lane, the rest of the requests are consumed
+        # by a separate thread so that updates can be pushed to the client as soon as they exist.
+        request = next(request_iterator, None)
+        if request is None:
+            return
+
+        client = self.find_client(request.username)
+        if client is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username)
+
+        self.push_data(request)
+
+        lane = request.lane
+        if lane not in LANES:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'unknown lane %d' % lane)
+        lane_stream = client.lane_stream_dict[lane]
+
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_SCRIPTS):
+            client.resend_scripts()
+
+        lane_stream.stream_id += 1
+        stream_id = lane_stream.stream_id
+
+        lane_stream.closed = False
+        recv_thread = threading.Thread(target=self._stream_recv, args=(request_iterator, client, lane_stream, stream_id))
+        recv_thread.start()
+
+        try:
+            while lane_stream.closed == False and lane_stream.stream_id == stream_id and context.is_active():
+                lane_stream.changes_event.wait(STREAM_WAIT_TIMEOUT)
+                lane_stream.changes_event.clear()
+
+                response = self.pull_data(client, lane)
+                if response.ByteSize() > 0:
+                    self.set_message_compression(context, response)
+                    yield response
+
+        except Exception as e:
+            print_exception(e)
+            
+class AsyncVRManagement(netsystem_pb2_grpc.VRManagementServicer):
+    """VRManagement for the grpc.aio server, all calls are served by one event loop.
+
+    The shared state is only locked for short, non-blocking sections and the recorder and
+    the bus write from threads of their own, so the synchronous servicer methods are called
+    directly from the coroutines. The methods that abort return the status instead, the
+    coroutines await the abort.
+    """
+    def __init__(self, relay, compression_policy=None):
+        self.servicer = VRManagement(relay, compression_policy)
+
+    async def RegisterUser(self, request, context):
+        return self.servicer.RegisterUser(request, context)
+
+    async def UnregisterUser(self, request, context):
+        return self.servicer.UnregisterUser(request, context)
+
+    async def SyncClock(self, request, context):
+        return self.servicer.SyncClock(request, context)
+
+    async def GetSessionSnapshot(self, request, context):
+        status, details, response = self.servicer.session_snapshot(request, context)
+        if status != grpc.StatusCode.OK:
+            await context.abort(status, details)
+
+        return response
+
+    async def SendPythonScript(self, request, context):
+        return self.servicer.SendPythonScript(request, context)
+
+    async def ListAssets(self, request, context):
+        return self.servicer.ListAssets(request, context)
+
+    async def FetchAsset(self, request, context):
+        client = self.servicer.find_client(request.username)
+        if client is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username)
+
+        asset = self.servicer.find_asset(request.sha256)
+        if asset is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, 'unknown asset %s' % request.sha256)
+
+        loop = asyncio.get_running_loop()
+        chunk_iterator = self.servicer.relay.asset_store.read_chunks(asset, request.offset)
+
+        try:
+            while True:
+                # The file is read off the event loop
+                chunk = await loop.run_in_executor(None, next, chunk_iterator, None)
+                if chunk is None:
+                    break
+
+                self.servicer.relay.metrics.client_sent(client.username, chunk.ByteSize())
+
+                context.disable_next_message_compression()
+                await context.write(chunk)
+        finally:
+            chunk_iterator.close()
+
+    async def SendAudio(self, request, context):
+        return self.servicer.SendAudio(request, context)
+
+    async def ExData(self, request, context):
+        status, details, response = self.servicer.exchange_data(request, context)
+        if status != grpc.StatusCode.OK:
+            await context.abort(status, details)
+
+        return response
+
+    async def _stream_recv(self, context, client, lane_stream, stream_id):
+        try:
+            while True:
+                request = await context.read()
+                if request is grpc.aio.EOF:
+                    break
+
+                self.servicer.push_data(request)
+        except Exception as e:
+            print_exception(e)
+
+        if lane_stream.stream_id == stream_id:
+            lane_stream.closed = True
+            client.last_seen = time.monotonic()
+        lane_stream.notify()
+
+    async def StreamExData(self, request_iterator, context):
+        request = await context.read()
+        if request is grpc.aio.EOF:
+            return
+
+        client = self.servicer.find_client(request.username)
+        if client is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, 'user %s is not registered' % request.username)
+
+        self.servicer.push_data(request)
+
+        lane = request.lane
+        if lane not in LANES:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, 'unknown lane %d' % lane)
+        lane_stream = client.lane_stream_dict[lane]
+
+        loop = asyncio.get_running_loop()
+        changes_event = asyncio.Event()
+        # Changes queued before the stream started are sent right away
+        changes_event.set()
+
+        if lane in (netsystem_pb2.LANE_ALL, netsystem_pb2.LANE_SCRIPTS):
+            client.resend_scripts()
+
+        lane_stream.stream_id += 1
+        stream_id = lane_stream.stream_id
+
+        lane_stream.closed = False
+        lane_stream.changes_waker = lambda: loop.call_soon_threadsafe(changes_event.set)
+        recv_task = asyncio.create_task(self._stream_recv(context, client, lane_stream, stream_id))
+
+        try:
+            while lane_stream.closed == False and lane_stream.stream_id == stream_id:
+                try:
+                    await asyncio.wait_for(changes_event.wait(), STREAM_WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                changes_event.clear()
+
+                response = self.servicer.pull_data(client, lane)
+                if response.ByteSize() > 0:
+                    self.servicer.set_message_compression(context, response)
+                    await context.write(response)
+
+        except Exception as e:
+            print_exception(e)
+
+        finally:
+            if lane_stream.stream_id == stream_id:
+                lane_stream.changes_waker = None
+            recv_task.cancel()
+
+class RelayConfig:
+    def __init__(self):
+        self.port = DEFAULT_PORT
+        self.login = 'test'
+        self.password = 'test'
+        # THREAD (grpc.server with a thread pool) or ASYNCIO (grpc.aio.server)
+        self.backend = 'ASYNCIO'
+        self.max_workers = 16
+        # THREAD: open StreamExData calls, each holds a thread of the pool in addition to the
+        # max_workers threads of the unary calls. Further streams are refused and the clients poll,
+        # 0 does not limit them.
+        self.max_streams = 48
+
+        # Relay worker processes started on this node
+        self.workers = 1
+        # Index of the first local worker and the number of workers of the whole federation
+        # (0 means workers), only needed when the workers of several nodes share a bus
+        self.worker_index = 0
+        self.worker_count = 0
+        # NONE or SOCKET, several workers always use SOCKET
+        self.bus = 'NONE'
+        self.bus_address = DEFAULT_BUS_ADDRESS
+        # Run the SocketBusHub in this process, disable on the nodes connecting to a remote hub
+        self.bus_hub = True
+        # All workers listen on port with SO_REUSEPORT, otherwise worker i listens on port + i
+        self.reuse_port = True
+        # NONE, GZIP or DEFLATE for the scripts and audio larger than compression_threshold
+        # bytes that compress by at least compression_min_saving
+        self.compression = 'GZIP'
+        self.compression_threshold = 1024
+        self.compression_min_saving = 0.1
+        # Seconds after which a silent client is unregistered and its resume token expires, 0 disables it
+        self.session_timeout = DEFAULT_SESSION_TIMEOUT
+        # Port of the local Prometheus endpoint (worker i uses metrics_port + i), 0 disables it
+        self.metrics_port = 0
+        # Scripts kept per room for the clients joining later (scripts with the same state key
+        # count once), 0 disables the history
+        self.script_history_limit = DEFAULT_SCRIPT_HISTORY_LIMIT
+        # Peers within interest_radius meters or within the interest_view_angle degrees half angle
+        # of the view cone (up to interest_view_distance meters) get the poses at full rate,
+        # the others at interest_far_rate Hz. interest_radius 0 disables the interest management.
+        self.interest_radius = 10.0
+        self.interest_view_angle = 60.0
+        self.interest_view_distance = 50.0
+        self.interest_far_rate = 5.0
+        # Directory of the assets (avatar libraries, textures, scenes) the clients fetch on
+        # connect, empty serves no assets
+        self.asset_dir = ''
+        # File the received requests are appended to (python -m bholodeck.replay plays it back),
+        # the workers of a federation write <name>.<worker_index><extension>. Empty records nothing.
+        self.record_path = ''
+        # The clients on the host of the relay get the poses and the audio over shared memory
+        self.shared_memory = True
+
+    def update(self, config_dict):
+        for key, value in config_dict.items():
+            if not hasattr(self, key):
+                raise Exception('unknown relay config option %s' % key)
+            setattr(self, key, value)
+
+    def federation_size(self):
+        if self.worker_count > 0:
+            return self.worker_count
+
+        return self.worker_index + self.workers
+
+def load_config(filepath):
+    config = RelayConfig()
+
+    with open(filepath, 'r') as f:
+        config.update(json.load(f))
+
+    return config
+
+class RelayServer:
+    """Serves a Relay on the configured port with the thread pool or the asyncio backend."""
+    def __init__(self, config, relay=None):
+        self.config = config
+
+        if relay is None:
+            bus = None
+            if config.bus == 'SOCKET':
+                bus = relaybus.SocketBus(config.bus_address)
+
+            relay = Relay(config.login, config.password, bus, config.worker_index, config.federation_size())
+        self.relay = relay
+
+        self.relay.script_history_limit = config.script_history_limit
+
+        if len(config.asset_dir) > 0:
+            self.relay.asset_store = assets.AssetStore(config.asset_dir)
+            self.relay.asset_store.scan()
+
+        if len(config.record_path) > 0:
+            record_path = config.record_path
+            if config.federation_size() > 1:
+                root, extension = os.path.splitext(record_path)
+                record_path = '%s.%d%s' % (root, config.worker_index, extension)
+
+            self.relay.recorder = recorder.SessionRecorder(record_path)
+
+        if config.shared_memory == True and self.relay.pose_board is None:
+            try:
+                self.relay.pose_board = shmtransport.PoseBoard.create(shmtransport.segment_name(self.relay.worker_id[:8]))
+            except OSError as e:
+                print_exception(e)
+
+        if config.interest_radius > 0:
+            self.relay.interest_filter = interest.InterestFilter(config.interest_radius, config.interest_view_angle,
+                config.interest_view_distance, config.interest_far_rate)
+
+        self.server = None
+        self.aio_loop = None
+        self.aio_server_thread = None
+
+        self.metrics_server = None
+
+        self.expire_thread = None
+        self.expire_thread_exit = threading.Event()
+
+        # Rescans the asset directory, hashing a large file never delays a call
+        self.asset_scan_thread = None
+        self.asset_scan_thread_exit = threading.Event()
+
+        self.compression_policy = compression.CompressionPolicy(config.compression, config.compression_threshold, config.compression_min_saving)
+
+    def start(self):
+        if self.config.metrics_port > 0:
+            self.metrics_server = metrics.MetricsServer(self.relay.metrics, self.config.metrics_port)
+            self.metrics_server.start()
+
+        if self.config.backend == 'ASYNCIO':
+            self.aio_server_started = threading.Event()
+            self.aio_server_thread = threading.Thread(target=self._aio_server_thread)
+            self.aio_server_thread.start()
+            self.aio_server_started.wait()
+        else:
+            self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.config.max_workers + self.config.max_streams),
+                interceptors=[metrics.MetricsInterceptor(self.relay.metrics)], options=self.server_options(), compression=self.compression_policy.algorithm)
+
+            netsystem_pb2_grpc.add_VRManagementServicer_to_server(VRManagement(self.relay, self.compression_policy, self.config.max_streams), self.server)
+
+            self.server.add_insecure_port('[::]:%d' % (self.config.port))
+            self.server.start()
+
+        if self.config.session_timeout > 0:
+            self.expire_thread_exit.clear()
+            self.expire_thread = threading.Thread(target=self._expire_thread, daemon=True)
+            self.expire_thread.start()
+
+        if self.relay.asset_store is not None:
+            self.asset_scan_thread_exit.clear()
+            self.asset_scan_thread = threading.Thread(target=self._asset_scan_thread, daemon=True)
+            self.asset_scan_thread.start()
+
+    def _asset_scan_thread(self):
+        while self.asset_scan_thread_exit.wait(assets.ASSET_SCAN_INTERVAL) == False:
+            try:
+                self.relay.asset_store.scan()
+            except Exception as e:
+                print_exception(e)
+
+    def _expire_thread(self):
+        while self.expire_thread_exit.wait(EXPIRE_INTERVAL) == False:
+            try:
+                self.relay.expire_sessions(self.config.session_timeout)
+            except Exception as e:
+                print_exception(e)
+
+    def stop(self):
+        if self.expire_thread is not None:
+            self.expire_thread_exit.set()
+            self.expire_thread.join()
+            self.expire_thread = None
+
+        if self.asset_scan_thread is not None:
+            self.asset_scan_thread_exit.set()
+            self.asset_scan_thread.join()
+            self.asset_scan_thread = None
+
+        if self.aio_server_thread is not None:
+            # The server is stopped by its own coroutine, the loop ends with it
+            self.aio_loop.call_soon_threadsafe(self.aio_stop_event.set)
+            self.aio_server_thread.join()
+            self.aio_server_thread = None
+        elif self.server is not None:
+            self.server.stop(0)
+
+        self.server = None
+
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+
+        if self.relay.bus is not None:
+            self.relay.bus.close()
+
+        if self.relay.recorder is not None:
+            self.relay.recorder.close()
+
+        if self.relay.pose_board is not None:
+            for netclient in list(self.relay.netclient_dict.values()):
+                self.relay.detach_shared_memory(netclient)
+
+            pose_board = self.relay.pose_board
+            self.relay.pose_board = None
+            for netroom in list(self.relay.netroom_dict.values()):
+                netroom.pose_board = None
+            pose_board.close()
+
+    def server_options(self):
+        return [
+            ('grpc.so_reuseport', 1 if self.config.reuse_port == True else 0),
+            # Allow the keepalive pings the clients use to detect dropped connections
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.min_recv_ping_interval_without_data_ms', 5000),
+            ('grpc.http2.max_ping_strikes', 0),
+            ('grpc.max_receive_message_length', MAX_MESSAGE_LENGTH),
+            ('grpc.max_send_message_length', MAX_MESSAGE_LENGTH),
+        ]
+
+    def wait_for_termination(self):
+        if self.aio_server_thread is not None:
+            self.aio_server_thread.join()
+        elif self.server is not None:
+            self.server.wait_for_termination()
+
+    async def _aio_server_serve(self):
+        self.aio_stop_event = asyncio.Event()
+
+        try:
+            self.server = grpc.aio.server(interceptors=[metrics.AsyncMetricsInterceptor(self.relay.metrics)], options=self.server_options(),
+                compression=self.compression_policy.algorithm)
+
+            netsystem_pb2_grpc.add_VRManagementServicer_to_server(AsyncVRManagement(self.relay, self.compression_policy), self.server)
+
+            self.server.add_insecure_port('[::]:%d' % (self.config.port))
+            await self.server.start()
+        finally:
+            self.aio_server_started.set()
+
+        await self.aio_stop_event.wait()
+        await self.server.stop(0)
+
+    def _aio_server_thread(self):
+        print('Start aio_server_thread')
+
+        try:
+            self.aio_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.aio_loop)
+            self.aio_loop.run_until_complete(self._aio_server_serve())
+            self.aio_loop.close()
+        except Exception as e:
+            print_exception(e)
+
+        print('Finish aio_server_thread')
+
+def serve(config):
+    relay_server = RelayServer(config)
+    relay_server.relay.on_register = lambda netclient: print('Register %s (room %s, user %d)' % (netclient.username, netclient.room.name, netclient.user_id))
+    relay_server.relay.on_unregister = lambda netclient: print('Unregister %s' % netclient.username)
+    relay_server.start()
+
+    print('Relay worker %d listening on port %d (%s)' % (config.worker_index, config.port, config.backend))
+
+    try:
+        relay_server.wait_for_termination()
+    except KeyboardInterrupt:
+        relay_server.stop()
+
+def run_worker(config_dict):
+    config = RelayConfig()
+    config.update(config_dict)
+
+    serve(config)
+
+def run_workers(config):
+    """Start config.workers relay processes connected by a SocketBus."""
+    if config.bus == 'NONE':
+        config.bus = 'SOCKET'
+
+    hub = None
+    if config.bus_hub == True:
+        host, port = relaybus.parse_address(config.bus_address)
+        hub = relaybus.SocketBusHub(host, port)
+        hub.start()
+        print('Relay bus hub listening on %s' % hub.address())
+
+    mp_context = multiprocessing.get_context('spawn')
+    process_list = []
+
+    for i in range(config.workers):
+        worker_dict = dict(vars(config))
+        worker_dict.update(workers=1, worker_index=config.worker_index + i, worker_count=config.federation_size(), bus_hub=False)
+        if config.reuse_port == False:
+            worker_dict['port'] = config.port + i
+        if config.metrics_port > 0:
+            worker_dict['metrics_port'] = config.metrics_port + i
+
+        process = mp_context.Process(target=run_worker, args=(worker_dict,))
+        process.start()
+        process_list.append(process)
+
+    try:
+        for process in process_list:
+            process.join()
+    except KeyboardInterrupt:
+        for process in process_list:
+            process.join(5.0)
+            if process.is_alive():
+                process.terminate()
+    finally:
+        if hub is not None:
+            hub.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bholodeck.relay', description='Headless BHolodeck relay server')
+    parser.add_argument('--config', help='JSON file with the RelayConfig options')
+    parser.add_argument('--port', type=int, help='port to listen on')
+    parser.add_argument('--backend', choices=['THREAD', 'ASYNCIO'], help='gRPC server backend')
+    parser.add_argument('--workers', type=int, help='number of relay worker processes')
+    parser.add_argument('--bus', choices=['NONE', 'SOCKET'], help='message bus between the relay workers')
+    parser.add_argument('--bus-address', help='host:port of the SocketBusHub')
+    parser.add_argument('--metrics-port', type=int, help='port of the local Prometheus metrics endpoint')
+    parser.add_argument('--asset-dir', help='directory of the assets the clients fetch on connect')
+    parser.add_argument('--record', help='file the received requests are recorded to, for python -m bholodeck.replay')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config) if args.config else RelayConfig()
+    if args.port is not None:
+        config.port = args.port
+    if args.backend is not None:
+        config.backend = args.backend
+    if args.workers is not None:
+        config.workers = args.workers
+    if args.bus is not None:
+        config.bus = args.bus
+    if args.bus_address is not None:
+        config.bus_address = args.bus_address
+    if args.metrics_port is not None:
+        config.metrics_port = args.metrics_port
+    if args.asset_dir is not None:
+        config.asset_dir = args.asset_dir
+    if args.record is not None:
+        config.record_path = args.record
+
+    if config.workers > 1:
+        run_workers(config)
+    else:
+        serve(config)
+
+if __name__ == '__main__':
+    main()
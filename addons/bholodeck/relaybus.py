@@ -0,0 +1,458 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Message bus between the relay workers of a federation. Every worker publishes the joins,
+# leaves, poses, scripts and audio of its local clients and applies the messages of the
+# other workers to its rooms (see Relay.on_bus_message).
+#
+# InMemoryBus connects relays of one process (tests, benchmarks), SocketBus connects
+# processes, possibly on different nodes, through a SocketBusHub. The hub forwards every
+# frame to all other connections; a frame is a little endian uint32 length and the payload.
+#
+# The endpoints also learn when another worker joins the bus or leaves it (a closed hub
+# connection, also of a crashed worker), so that its users are dropped and announced again.
+# Control frames have CONTROL_FLAG set in the length: a kind byte and the peer id of the worker.
+#
+# This module must not import bpy.
+
+import queue
+import socket
+import struct
+import threading
+import time
+import traceback
+
+FRAME_HEADER = struct.Struct('<I')
+
+CONTROL_FLAG = 0x80000000
+CONTROL_HEADER = struct.Struct('<B')
+
+# Sent by a SocketBus to the hub with the peer id of its worker
+CONTROL_HELLO = 1
+# Sent by the hub to the other connections when a worker said hello or its connection closed
+CONTROL_PEER_JOINED = 2
+CONTROL_PEER_GONE = 3
+
+# How long a SocketBus keeps trying to reach the hub on start
+CONNECT_TIMEOUT = 10.0
+
+# How long closing a SocketBus waits for the queued frames to be sent
+CLOSE_TIMEOUT = 1.0
+
+# Seconds between two attempts of a SocketBus to reconnect to a lost hub
+RECONNECT_MIN_DELAY = 0.1
+RECONNECT_MAX_DELAY = 2.0
+
+def print_exception(ex):
+    print(traceback.format_exc())
+
+def parse_address(address):
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+def recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if len(chunk) == 0:
+            return None
+        data += chunk
+
+    return data
+
+def recv_frame(sock):
+    """(is control frame, payload), the payload is None when the connection closed."""
+    header = recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return False, None
+
+    length = FRAME_HEADER.unpack(header)[0]
+
+    return (length & CONTROL_FLAG) != 0, recv_exactly(sock, length & ~CONTROL_FLAG)
+
+def send_frame(sock, data, control=False):
+    sock.sendall(FRAME_HEADER.pack(len(data) | (CONTROL_FLAG if control else 0)) + data)
+
+def control_frame(kind, peer_id):
+    return CONTROL_HEADER.pack(kind) + peer_id.encode('utf-8')
+
+def parse_control_frame(data):
+    return CONTROL_HEADER.unpack_from(data, 0)[0], data[CONTROL_HEADER.size:].decode('utf-8')
+
+class MessageBus:
+    """Endpoint of one relay worker on the bus.
+
+    Messages published by an endpoint are delivered to the callbacks of all the other
+    endpoints, never back to the publisher. The peer callbacks get the peer id of a worker
+    that joined or left the bus; None when this endpoint itself reconnected (joined) or lost
+    the bus (gone), all the other workers are then affected.
+    """
+    def __init__(self):
+        self.callback_list = []
+        self.peer_joined_callback_list = []
+        self.peer_gone_callback_list = []
+
+        self.peer_id = None
+
+    def subscribe(self, callback):
+        self.callback_list.append(callback)
+
+    def subscribe_peers(self, joined_callback, gone_callback):
+        self.peer_joined_callback_list.append(joined_callback)
+        self.peer_gone_callback_list.append(gone_callback)
+
+    def set_peer_id(self, peer_id):
+        """Identity of the worker of the endpoint, announced to the other workers."""
+        self.peer_id = peer_id
+
+    def deliver(self, data):
+        for callback in self.callback_list:
+            try:
+                callback(data)
+            except Exception as e:
+                print_exception(e)
+
+    def deliver_peer(self, joined, peer_id):
+        for callback in (self.peer_joined_callback_list if joined else self.peer_gone_callback_list):
+            try:
+                callback(peer_id)
+            except Exception as e:
+                print_exception(e)
+
+    def publish(self, data):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class InMemoryBusHub:
+    def __init__(self):
+        self.bus_list = []
+        self.lock = threading.Lock()
+
+    def attach(self, bus):
+        self.lock.acquire()
+        self.bus_list.append(bus)
+        self.lock.release()
+
+    def detach(self, bus):
+        self.lock.acquire()
+        if bus in self.bus_list:
+            self.bus_list.remove(bus)
+        self.lock.release()
+
+        if bus.peer_id is not None:
+            self.forward_peer(bus, False)
+
+    def forward(self, sender, data):
+        self.lock.acquire()
+        bus_list = list(self.bus_list)
+        self.lock.release()
+
+        for bus in bus_list:
+            if bus is not sender:
+                bus.deliver(data)
+
+    def forward_peer(self, sender, joined):
+        self.lock.acquire()
+        bus_list = list(self.bus_list)
+        self.lock.release()
+
+        for bus in bus_list:
+            if bus is not sender:
+                bus.deliver_peer(joined, sender.peer_id)
+
+class InMemoryBus(MessageBus):
+    """Delivers synchronously to the relays attached to the same InMemoryBusHub."""
+    def __init__(self, hub):
+        super().__init__()
+
+        self.hub = hub
+        self.hub.attach(self)
+
+    def set_peer_id(self, peer_id):
+        super().set_peer_id(peer_id)
+        self.hub.forward_peer(self, True)
+
+    def publish(self, data):
+        self.hub.forward(self, data)
+
+    def close(self):
+        self.hub.detach(self)
+
+class HubConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.send_lock = threading.Lock()
+        # Peer id of the worker, known after its hello
+        self.peer_id = None
+
+class SocketBusHub:
+    """TCP hub of a SocketBus federation, run by the launcher of the workers or standalone."""
+    def __init__(self, host='127.0.0.1', port=0):
+        self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listen_socket.bind((host, port))
+        self.listen_socket.listen()
+
+        self.host = host
+        self.port = self.listen_socket.getsockname()[1]
+
+        self.connection_list = []
+        self.connection_lock = threading.Lock()
+
+        self.closed = False
+        self.accept_thread = None
+
+    def address(self):
+        return '%s:%d' % (self.host, self.port)
+
+    def start(self):
+        self.accept_thread = threading.Thread(target=self._accept_thread, daemon=True)
+        self.accept_thread.start()
+
+    def close(self):
+        self.closed = True
+
+        # The shutdown wakes the accept thread, a closed socket would keep accepting
+        try:
+            self.listen_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        try:
+            self.listen_socket.close()
+        except Exception:
+            pass
+
+        self.connection_lock.acquire()
+        connection_list = list(self.connection_list)
+        self.connection_list = []
+        self.connection_lock.release()
+
+        for hub_connection in connection_list:
+            try:
+                hub_connection.connection.shutdown(socket.SHUT_RDWR)
+                hub_connection.connection.close()
+            except Exception:
+                pass
+
+    def _accept_thread(self):
+        while self.closed == False:
+            try:
+                connection, _ = self.listen_socket.accept()
+            except OSError:
+                break
+
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            hub_connection = HubConnection(connection)
+
+            self.connection_lock.acquire()
+            self.connection_list.append(hub_connection)
+            self.connection_lock.release()
+
+            threading.Thread(target=self._connection_thread, args=(hub_connection,), daemon=True).start()
+
+    def _forward(self, sender, data, control=False):
+        self.connection_lock.acquire()
+        connection_list = [other for other in self.connection_list if other is not sender]
+        self.connection_lock.release()
+
+        for other in connection_list:
+            other.send_lock.acquire()
+            try:
+                send_frame(other.connection, data, control)
+            except OSError:
+                pass
+            finally:
+                other.send_lock.release()
+
+    def _connection_thread(self, hub_connection):
+        connection = hub_connection.connection
+
+        try:
+            while True:
+                control, data = recv_frame(connection)
+                if data is None:
+                    break
+
+                if control:
+                    kind, peer_id = parse_control_frame(data)
+                    if kind == CONTROL_HELLO:
+                        hub_connection.peer_id = peer_id
+                        self._forward(hub_connection, control_frame(CONTROL_PEER_JOINED, peer_id), True)
+                    continue
+
+                self._forward(hub_connection, data)
+        except OSError:
+            pass
+
+        self.connection_lock.acquire()
+        if hub_connection in self.connection_list:
+            self.connection_list.remove(hub_connection)
+        self.connection_lock.release()
+
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+        # A crashed worker never sends its leaves, the others drop its users
+        if hub_connection.peer_id is not None and self.closed == False:
+            self._forward(hub_connection, control_frame(CONTROL_PEER_GONE, hub_connection.peer_id), True)
+
+class SocketBus(MessageBus):
+    """Connection of a relay worker to a SocketBusHub given as host:port, reconnected when the hub is lost.
+
+    The frames are queued and sent by a thread of the bus, publish never waits for the hub.
+    """
+    def __init__(self, address):
+        super().__init__()
+
+        self.host, self.port = parse_address(address)
+
+        # The workers may start before the hub is listening
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                self.sock = self._connect()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+        self.send_lock = threading.Lock()
+        self.send_queue = queue.Queue()
+        self.connected = True
+        self.closed = False
+
+        self.send_thread = threading.Thread(target=self._send_thread, daemon=True)
+        self.send_thread.start()
+
+        self.recv_thread = threading.Thread(target=self._recv_thread, daemon=True)
+        self.recv_thread.start()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        return sock
+
+    def _send(self, data, control=False):
+        # The frames published while the hub is lost are dropped, the users are announced again
+        if self.closed == True or self.connected == False:
+            return
+
+        self.send_queue.put((data, control))
+
+    def _send_thread(self):
+        while True:
+            frame = self.send_queue.get()
+            # None is queued by close
+            if frame is None:
+                break
+
+            self.send_lock.acquire()
+            try:
+                send_frame(self.sock, frame[0], frame[1])
+            except OSError:
+                # The receive thread notices the lost hub and reconnects
+                pass
+            finally:
+                self.send_lock.release()
+
+    def set_peer_id(self, peer_id):
+        super().set_peer_id(peer_id)
+        self._send(control_frame(CONTROL_HELLO, peer_id), True)
+
+    def publish(self, data):
+        self._send(data)
+
+    def close(self):
+        self.closed = True
+
+        # The queued frames (e.g. the leaves of the last users) are sent unless the hub is stuck
+        self.send_queue.put(None)
+        self.send_thread.join(CLOSE_TIMEOUT)
+
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+            self.sock.close()
+        except Exception:
+            pass
+
+    def _receive(self):
+        try:
+            while True:
+                control, data = recv_frame(self.sock)
+                if data is None:
+                    break
+
+                if control:
+                    kind, peer_id = parse_control_frame(data)
+                    if kind in (CONTROL_PEER_JOINED, CONTROL_PEER_GONE):
+                        self.deliver_peer(kind == CONTROL_PEER_JOINED, peer_id)
+                    continue
+
+                self.deliver(data)
+        except OSError:
+            pass
+
+    def _reconnect(self):
+        delay = RECONNECT_MIN_DELAY
+        while self.closed == False:
+            try:
+                sock = self._connect()
+            except OSError:
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+
+            self.send_lock.acquire()
+            self.sock = sock
+            self.connected = True
+            self.send_lock.release()
+
+            return True
+
+        return False
+
+    def _recv_thread(self):
+        while self.closed == False:
+            self._receive()
+            if self.closed == True:
+                break
+
+            print('SocketBus: connection to the hub lost, reconnecting')
+            self.connected = False
+            try:
+                self.sock.close()
+            except Exception:
+                pass
+
+            # Nothing of the other workers is heard until the bus is back, their users are dropped
+            self.deliver_peer(False, None)
+
+            if self._reconnect() == False:
+                break
+
+            print('SocketBus: reconnected to the hub')
+            if self.peer_id is not None:
+                self._send(control_frame(CONTROL_HELLO, self.peer_id), True)
+            self.deliver_peer(True, None)
@@ -0,0 +1,302 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Replays a session recording (see recorder.py) against a relay, at the recorded pace or as
+# fast as the relay takes the requests, and reports the latency of the calls:
+#
+#   python -m bholodeck.replay session.bhrec --server localhost:7007 --speed 0 --json replay.json
+#
+# Every recorded user is a client with its own connection, its requests are sent in the
+# recorded order. This module must not import bpy, it only needs grpcio and the generated stubs.
+
+import argparse
+import asyncio
+import json
+import time
+
+import grpc
+
+from . import clocksync
+from . import loadgen
+from . import netsystem_pb2
+from . import netsystem_pb2_grpc
+from . import recorder
+from . import relay
+
+CHANNEL_OPTIONS = [
+    ('grpc.max_receive_message_length', relay.MAX_MESSAGE_LENGTH),
+    ('grpc.max_send_message_length', relay.MAX_MESSAGE_LENGTH),
+]
+
+# Requests queued per user, the reader of the recording waits when a user falls behind
+USER_QUEUE_LENGTH = 256
+
+def shift_capture_times(kind, message, shift):
+    """Move the capture times of a request by shift microseconds, the relay then sees them as recent."""
+    if kind == recorder.RECORD_EXDATA:
+        if message.pose_capture_time > 0:
+            message.pose_capture_time += shift
+        if message.audio_capture_time > 0:
+            message.audio_capture_time += shift
+        for script_event in message.script_event_list:
+            if script_event.capture_time > 0:
+                script_event.capture_time += shift
+
+    elif kind in (recorder.RECORD_SCRIPT, recorder.RECORD_AUDIO):
+        if message.capture_time > 0:
+            message.capture_time += shift
+
+class ReplayStats:
+    """Counters of all replayed users, updated from the event loop only."""
+    def __init__(self):
+        self.latency_dict = {name: [] for name in recorder.RECORD_NAMES.values()}
+        self.error_dict = {name: 0 for name in recorder.RECORD_NAMES.values()}
+
+        # Seconds the requests were sent after their recorded time (1x and slower speeds)
+        self.lag_list = []
+
+        self.record_count = 0
+        self.user_count = 0
+
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def add_latency(self, name, latency):
+        self.latency_dict[name].append(latency)
+
+    def add_error(self, name):
+        self.error_dict[name] += 1
+
+    def report(self, duration, recorded_duration, options):
+        latency_report = {}
+        for name in recorder.RECORD_NAMES.values():
+            latency_list = sorted(self.latency_dict[name])
+            latency_report[name] = {
+                'count': len(latency_list),
+                'errors': self.error_dict[name],
+                'mean_ms': 1000.0 * sum(latency_list) / len(latency_list) if len(latency_list) > 0 else 0.0,
+                'p50_ms': 1000.0 * loadgen.percentile(latency_list, 50),
+                'p95_ms': 1000.0 * loadgen.percentile(latency_list, 95),
+                'p99_ms': 1000.0 * loadgen.percentile(latency_list, 99),
+            }
+
+        lag_list = sorted(self.lag_list)
+        duration = max(duration, 0.001)
+
+        return {
+            'server': options.server,
+            'recording': options.recording,
+            'speed': options.speed,
+            'users': self.user_count,
+            'records': self.record_count,
+            'recorded_duration_s': recorded_duration,
+            'duration_s': duration,
+            'throughput': {
+                'records_per_s': self.record_count / duration,
+                'ExData_per_s': len(self.latency_dict['ExData']) / duration,
+            },
+            'latency': latency_report,
+            'lag_ms': {
+                'p50': 1000.0 * loadgen.percentile(lag_list, 50),
+                'p95': 1000.0 * loadgen.percentile(lag_list, 95),
+                'max': 1000.0 * lag_list[-1] if len(lag_list) > 0 else 0.0,
+            },
+            'bytes': {
+                'sent': self.bytes_sent,
+                'received': self.bytes_received,
+            },
+        }
+
+class ReplayUser:
+    """A recorded user, registered again with the credentials of the replay."""
+    def __init__(self, username, options, stats):
+        self.options = options
+        self.stats = stats
+
+        self.username = options.prefix + username
+        self.stub = None
+        self.registered = False
+
+        # (kind, request, send time) in the recorded order, None ends the replay of the user
+        self.queue = asyncio.Queue(USER_QUEUE_LENGTH)
+
+        # The recorded acks belong to the recorded session, the scripts of the replayed one are acked instead
+        self.script_seq = 0
+        self.script_acked_seq = 0
+
+    async def call(self, name, method, request):
+        start = time.perf_counter()
+        try:
+            response = await method(request, timeout=self.options.timeout)
+        except grpc.aio.AioRpcError:
+            self.stats.add_error(name)
+            return None
+
+        self.stats.add_latency(name, time.perf_counter() - start)
+        self.stats.bytes_sent += request.ByteSize()
+        self.stats.bytes_received += response.ByteSize()
+
+        return response
+
+    async def register(self, room, script_events):
+        request = netsystem_pb2.RegisterUserRequest()
+        request.username = self.username
+        request.login = self.options.login
+        request.password = self.options.password
+        request.room = self.options.room if self.options.room is not None else room
+        request.script_events = script_events
+
+        self.registered = await self.call('RegisterUser', self.stub.RegisterUser, request) is not None
+        self.script_seq = 0
+        self.script_acked_seq = 0
+
+    async def unregister(self):
+        request = netsystem_pb2.UnregisterUserRequest()
+        request.username = self.username
+
+        await self.call('UnregisterUser', self.stub.UnregisterUser, request)
+        self.registered = False
+
+    async def replay(self, kind, request):
+        if kind == recorder.RECORD_REGISTER:
+            # A resumed session is recorded as another RegisterUser
+            if self.registered == False:
+                await self.register(request.room, request.script_events)
+            return
+
+        if kind == recorder.RECORD_UNREGISTER:
+            if self.registered == True:
+                await self.unregister()
+            return
+
+        if self.registered == False:
+            # The recording started after the user registered
+            await self.register('', True)
+
+        request.username = self.username
+
+        if kind == recorder.RECORD_EXDATA:
+            request.script_ack = self.script_seq if self.script_seq != self.script_acked_seq else 0
+            self.script_acked_seq = self.script_seq
+
+            response = await self.call('ExData', self.stub.ExData, request)
+            if response is not None:
+                for script_event in response.script_event_list:
+                    self.script_seq = max(self.script_seq, script_event.seq)
+
+        elif kind == recorder.RECORD_SCRIPT:
+            await self.call('SendPythonScript', self.stub.SendPythonScript, request)
+
+        elif kind == recorder.RECORD_AUDIO:
+            await self.call('SendAudio', self.stub.SendAudio, request)
+
+    async def run(self):
+        async with grpc.aio.insecure_channel(self.options.server, options=CHANNEL_OPTIONS) as channel:
+            self.stub = netsystem_pb2_grpc.VRManagementStub(channel)
+
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    break
+
+                kind, request, send_time = item
+                if self.options.speed > 0:
+                    self.stats.lag_list.append(max(time.monotonic() - send_time, 0.0))
+
+                await self.replay(kind, request)
+
+            if self.registered == True:
+                await self.unregister()
+
+async def run_replay(options):
+    stats = ReplayStats()
+
+    user_dict = {}
+    task_list = []
+
+    start = time.monotonic()
+    timeline = 0.0
+    last_time_us = None
+
+    for time_us, kind, request in recorder.read_records(options.recording):
+        # Idle gaps (e.g. between two sessions appended to the recording) are shortened
+        if last_time_us is not None:
+            timeline += min(max(time_us - last_time_us, 0) / 1e6, options.max_gap)
+        last_time_us = time_us
+
+        send_time = time.monotonic()
+        if options.speed > 0:
+            send_time = start + timeline / options.speed
+            if send_time > time.monotonic():
+                await asyncio.sleep(send_time - time.monotonic())
+
+        shift_capture_times(kind, request, clocksync.clock_us() - time_us)
+
+        user = user_dict.get(request.username)
+        if user is None:
+            user = ReplayUser(request.username, options, stats)
+            user_dict[request.username] = user
+            task_list.append(asyncio.create_task(user.run()))
+
+        await user.queue.put((kind, request, send_time))
+        stats.record_count += 1
+
+    for user in user_dict.values():
+        await user.queue.put(None)
+    await asyncio.gather(*task_list)
+
+    stats.user_count = len(user_dict)
+
+    return stats.report(time.monotonic() - start, timeline, options)
+
+def print_report(report):
+    print('Replayed %d records of %d users, %.1f s recorded in %.1f s (speed %s)' % (report['records'], report['users'],
+        report['recorded_duration_s'], report['duration_s'], report['speed'] if report['speed'] > 0 else 'max'))
+    print('Throughput: %.1f records/s, %.1f ExData/s' % (report['throughput']['records_per_s'], report['throughput']['ExData_per_s']))
+
+    print('%-18s %8s %7s %9s %9s %9s' % ('Latency', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, latency in report['latency'].items():
+        print('%-18s %8d %7d %9.2f %9.2f %9.2f' % (name, latency['count'], latency['errors'], latency['p50_ms'], latency['p95_ms'], latency['p99_ms']))
+
+    if report['speed'] > 0:
+        print('Lag behind the recording: p50 %.2f ms, p95 %.2f ms, max %.2f ms' % (report['lag_ms']['p50'], report['lag_ms']['p95'], report['lag_ms']['max']))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bholodeck.replay', description='Replay a BHolodeck session recording against a relay')
+    parser.add_argument('recording', help='file written by the relay (--record) or by a client (Session Recording preference)')
+    parser.add_argument('--server', default='localhost:7007', help='host:port of the relay')
+    parser.add_argument('--login', default='test')
+    parser.add_argument('--password', default='test')
+    parser.add_argument('--room', help='room of all replayed users instead of the recorded rooms')
+    parser.add_argument('--prefix', default='', help='username prefix of the replayed users, keeps them apart from real users')
+    parser.add_argument('--speed', type=float, default=1.0, help='multiple of the recorded pace, 0 sends the requests as fast as the relay takes them')
+    parser.add_argument('--max-gap', type=float, default=5.0, help='longest pause in seconds, longer idle gaps of the recording are shortened')
+    parser.add_argument('--timeout', type=float, default=5.0, help='deadline of one call in seconds')
+    parser.add_argument('--json', help='write the report to this file')
+    options = parser.parse_args(argv)
+
+    report = asyncio.run(run_replay(options))
+
+    print_report(report)
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == '__main__':
+    main()
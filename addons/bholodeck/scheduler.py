@@ -0,0 +1,97 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Fixed rate tick scheduler of the network loops. This module must not import bpy.
+
+import random
+import time
+
+# Tick period multiplier when the work of a tick does not fit into the period
+BACKOFF_FACTOR = 1.5
+
+# Tick period multiplier when the work fits comfortably again
+RECOVER_FACTOR = 0.9
+
+class TickScheduler:
+    """Runs ticks at a target rate.
+
+    Deadlines advance by a whole period from the previous deadline, so the rate does not
+    drift with the time spent working. When a tick takes longer than the period (slow RPC,
+    congested stream) the period backs off up to 1 / min_rate and recovers towards the
+    target once the work is fast again. Ticks that can not be caught up are skipped and
+    counted in missed_tick_count.
+    """
+    def __init__(self, rate, min_rate=1.0):
+        self.target_period = 1.0 / max(rate, 0.001)
+        self.max_period = max(self.target_period, 1.0 / max(min_rate, 0.001))
+
+        self.period = self.target_period
+        self.next_tick = None
+
+        self.tick_count = 0
+        self.missed_tick_count = 0
+
+    def rate(self):
+        return 1.0 / self.period
+
+    def wait(self):
+        """Sleep until the next tick."""
+        now = time.perf_counter()
+
+        if self.next_tick is None:
+            self.next_tick = now
+        else:
+            self.next_tick += self.period
+
+            if now > self.next_tick + self.period:
+                # Too late, do not burst to catch up with the missed ticks
+                self.missed_tick_count += int((now - self.next_tick) / self.period)
+                self.next_tick = now
+            elif now < self.next_tick:
+                time.sleep(self.next_tick - now)
+
+        self.tick_count += 1
+
+    def done(self, work_time):
+        """Report how long the work of the tick took (e.g. the RPC latency)."""
+        if work_time > self.period:
+            self.period = min(self.max_period, max(self.period * BACKOFF_FACTOR, work_time))
+        elif work_time < self.period * 0.5 and self.period > self.target_period:
+            self.period = max(self.target_period, self.period * RECOVER_FACTOR)
+
+class Backoff:
+    """Exponentially growing delays with jitter between reconnection attempts."""
+    def __init__(self, initial=0.1, maximum=5.0, factor=2.0, jitter=0.2):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+
+        self.reset()
+
+    def reset(self):
+        self.delay = self.initial
+        self.attempt_count = 0
+
+    def next_delay(self):
+        delay = self.delay * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+        self.delay = min(self.maximum, self.delay * self.factor)
+        self.attempt_count += 1
+
+        return delay
@@ -0,0 +1,357 @@
+#####################################################################################################################
+# Copyright(C) 2023-2026 IT4Innovations National Supercomputing Center, VSB - Technical University of Ostrava
+#
+# This program is free software : you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#####################################################################################################################
+
+# Shared memory transport of the clients running on the host of the relay (CAVE walls,
+# observer screens). The relay writes the latest poses of all users once into a PoseBoard
+# of fixed size slots that every local client reads, and the audio for a local client into
+# its SlotRing of variable size slots, instead of serializing them for every client.
+#
+# The PoseBoard slots are seqlocks: the writer makes the sequence odd, writes the slot and
+# makes it even again, a reader retries when the sequence was odd or changed while reading.
+# A SlotRing has one producer (the relay, its threads take the ring lock) and one consumer.
+#
+# This module must not import bpy.
+
+import os
+import socket
+import struct
+import threading
+import uuid
+
+from multiprocessing import shared_memory
+
+from . import posecodec
+
+# magic, layout version, slot count, slot size, generation (incremented by every write)
+BOARD_HEADER = struct.Struct('<IIIIQ')
+BOARD_MAGIC = 0x42485042
+BOARD_VERSION = 1
+
+# Users whose poses fit on a board, the poses of the others are sent over gRPC
+BOARD_SLOT_COUNT = 256
+
+# Pose records of a slot (one per tracker)
+BOARD_SLOT_RECORDS = 16
+
+# sequence, user_id (0 for a free slot), room id, length of the pose data, capture time
+SLOT_HEADER = struct.Struct('<IIIIQ')
+SLOT_SIZE = SLOT_HEADER.size + BOARD_SLOT_RECORDS * posecodec.POSE_RECORD.size
+
+# Reads of a slot before a reader gives up on a writer (it is read again on the next poll)
+SEQLOCK_RETRIES = 16
+
+# magic, capacity, head (bytes written), tail (bytes read), consumer attached
+RING_HEADER = struct.Struct('<IIQQI4x')
+RING_MAGIC = 0x42485252
+
+# Bytes of the audio ring of a client, about a second of audio
+RING_CAPACITY = 1024 * 1024
+
+# Length of a SlotRing slot that skips the rest of the ring
+RING_WRAP = 0xFFFFFFFF
+
+# user_id, capture time, then the audio chunk
+AUDIO_SLOT_HEADER = struct.Struct('<IQ')
+
+# Seconds between two polls of the shared memory by a client
+SHM_POLL_INTERVAL = 0.002
+
+def host_id():
+    """Identity of the host (of the running kernel), equal for the relay and its local clients."""
+    try:
+        with open('/proc/sys/kernel/random/boot_id', 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return '%s-%012x' % (socket.gethostname(), uuid.getnode())
+
+def segment_name(prefix, *parts):
+    # Short enough for the 31 characters of macOS
+    return '_'.join(['bhd', prefix] + [str(part) for part in parts])
+
+def _attach(name):
+    """SharedMemory created by the relay, not unlinked by the resource tracker of this process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+def _align(size):
+    return (size + 3) & ~3
+
+class PoseBoard:
+    """Latest pose records of the users, written by the relay and read by the local clients."""
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+
+        magic, version, self.slot_count, slot_size, _ = BOARD_HEADER.unpack_from(self.buf, 0)
+        if magic != BOARD_MAGIC or version != BOARD_VERSION or slot_size != SLOT_SIZE:
+            raise ValueError('%s is not a pose board' % shm.name)
+
+        # Relay: user_id -> slot, guarded by lock
+        self.slot_dict = {}
+        self.lock = threading.Lock()
+
+        # Client: slot -> sequence of the last read
+        self.read_seq_dict = {}
+        self.read_generation = None
+
+    @classmethod
+    def create(cls, name, slot_count=BOARD_SLOT_COUNT):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=BOARD_HEADER.size + slot_count * SLOT_SIZE)
+        shm.buf[:] = bytes(shm.size)
+        BOARD_HEADER.pack_into(shm.buf, 0, BOARD_MAGIC, BOARD_VERSION, slot_count, SLOT_SIZE, 0)
+
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name), False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _slot_offset(self, slot):
+        return BOARD_HEADER.size + slot * SLOT_SIZE
+
+    def _write_slot(self, slot, user_id, room_id, pose_data, capture_time):
+        offset = self._slot_offset(slot)
+
+        seq = SLOT_HEADER.unpack_from(self.buf, offset)[0]
+        struct.pack_into('<I', self.buf, offset, (seq + 1) & 0xFFFFFFFF)
+
+        SLOT_HEADER.pack_into(self.buf, offset, (seq + 1) & 0xFFFFFFFF, user_id, room_id, len(pose_data), capture_time)
+        self.buf[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(pose_data)] = pose_data
+
+        struct.pack_into('<I', self.buf, offset, (seq + 2) & 0xFFFFFFFF)
+
+        generation = BOARD_HEADER.unpack_from(self.buf, 0)[4]
+        struct.pack_into('<Q', self.buf, BOARD_HEADER.size - 8, generation + 1)
+
+    def write(self, user_id, room_id, pose_data, capture_time):
+        """Write the pose records of a user, returns False when the board is full or the records do not fit."""
+        if len(pose_data) > SLOT_SIZE - SLOT_HEADER.size:
+            return False
+
+        self.lock.acquire()
+        try:
+            slot = self.slot_dict.get(user_id)
+            if slot is None:
+                used_slots = set(self.slot_dict.values())
+                slot = next((i for i in range(self.slot_count) if i not in used_slots), None)
+                if slot is None:
+                    return False
+                self.slot_dict[user_id] = slot
+
+            self._write_slot(slot, user_id, room_id, pose_data, capture_time)
+        finally:
+            self.lock.release()
+
+        return True
+
+    def has(self, user_id):
+        return user_id in self.slot_dict
+
+    def remove(self, user_id):
+        self.lock.acquire()
+        try:
+            slot = self.slot_dict.pop(user_id, None)
+            if slot is not None:
+                self._write_slot(slot, 0, 0, b'', 0)
+        finally:
+            self.lock.release()
+
+    def _read_slot(self, slot):
+        offset = self._slot_offset(slot)
+
+        for i in range(SEQLOCK_RETRIES):
+            seq, user_id, room_id, length, capture_time = SLOT_HEADER.unpack_from(self.buf, offset)
+            if seq & 1:
+                continue
+
+            length = min(length, SLOT_SIZE - SLOT_HEADER.size)
+            pose_data = bytes(self.buf[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + length])
+
+            if SLOT_HEADER.unpack_from(self.buf, offset)[0] == seq:
+                return seq, user_id, room_id, pose_data, capture_time
+
+        return None
+
+    def read_changes(self, room_id, own_user_id):
+        """(user_id, pose_data, capture_time) of the users of the room whose poses changed since the last read."""
+        generation = BOARD_HEADER.unpack_from(self.buf, 0)[4]
+        if generation == self.read_generation:
+            return []
+
+        pose_block_list = []
+        complete = True
+
+        for slot in range(self.slot_count):
+            seq = SLOT_HEADER.unpack_from(self.buf, self._slot_offset(slot))[0]
+            if seq == self.read_seq_dict.get(slot, 0):
+                continue
+
+            slot_data = self._read_slot(slot)
+            if slot_data is None:
+                complete = False
+                continue
+
+            seq, user_id, slot_room_id, pose_data, capture_time = slot_data
+            self.read_seq_dict[slot] = seq
+
+            if user_id != 0 and user_id != own_user_id and slot_room_id == room_id and len(pose_data) > 0:
+                pose_block_list.append((user_id, pose_data, capture_time))
+
+        # A slot in the middle of a write is read again on the next poll
+        if complete:
+            self.read_generation = generation
+
+        return pose_block_list
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+class SlotRing:
+    """Ring of variable size slots (a length and the payload), one producer and one consumer."""
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+
+        magic, self.capacity, _, _, _ = RING_HEADER.unpack_from(self.buf, 0)
+        if magic != RING_MAGIC:
+            raise ValueError('%s is not a slot ring' % shm.name)
+
+        # Serializes the producers of the relay threads
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create(cls, name, capacity=RING_CAPACITY):
+        capacity = _align(capacity)
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=RING_HEADER.size + capacity)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, capacity, 0, 0, 0)
+
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name), False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _positions(self):
+        _, _, head, tail, _ = RING_HEADER.unpack_from(self.buf, 0)
+        return head, tail
+
+    def consumer_attached(self):
+        self.lock.acquire()
+        try:
+            return self.buf is not None and RING_HEADER.unpack_from(self.buf, 0)[4] == 1
+        finally:
+            self.lock.release()
+
+    def set_consumer_attached(self, attached):
+        struct.pack_into('<I', self.buf, 24, 1 if attached else 0)
+
+    def write(self, payload):
+        """Append a slot, returns False when the ring is full (the consumer is behind) or closed."""
+        size = _align(4 + len(payload))
+        if size > self.capacity // 2:
+            return False
+
+        self.lock.acquire()
+        try:
+            if self.buf is None:
+                return False
+
+            head, tail = self._positions()
+            position = head % self.capacity
+
+            if position + size > self.capacity:
+                padding = self.capacity - position
+                if head + padding + size - tail > self.capacity:
+                    return False
+
+                struct.pack_into('<I', self.buf, RING_HEADER.size + position, RING_WRAP)
+                head += padding
+                position = 0
+            elif head + size - tail > self.capacity:
+                return False
+
+            offset = RING_HEADER.size + position
+            struct.pack_into('<I', self.buf, offset, len(payload))
+            self.buf[offset + 4:offset + 4 + len(payload)] = payload
+
+            # The head is published after the slot
+            struct.pack_into('<Q', self.buf, 8, head + size)
+        finally:
+            self.lock.release()
+
+        return True
+
+    def read(self):
+        """Payloads of the slots written since the last read."""
+        head, tail = self._positions()
+
+        payload_list = []
+        while tail < head:
+            position = tail % self.capacity
+            offset = RING_HEADER.size + position
+
+            length = struct.unpack_from('<I', self.buf, offset)[0]
+            if length == RING_WRAP:
+                tail += self.capacity - position
+                continue
+
+            payload_list.append(bytes(self.buf[offset + 4:offset + 4 + length]))
+            tail += _align(4 + length)
+
+        struct.pack_into('<Q', self.buf, 16, tail)
+
+        return payload_list
+
+    def close(self):
+        self.lock.acquire()
+        try:
+            self.buf = None
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        finally:
+            self.lock.release()
+
+def pack_audio(user_id, capture_time, audio_data):
+    return AUDIO_SLOT_HEADER.pack(user_id, capture_time) + audio_data
+
+def unpack_audio(payload):
+    """(user_id, capture time, audio chunk) of an audio slot."""
+    user_id, capture_time = AUDIO_SLOT_HEADER.unpack_from(payload, 0)
+
+    return user_id, capture_time, payload[AUDIO_SLOT_HEADER.size:]
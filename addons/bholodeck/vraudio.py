@@ -19,6 +19,8 @@
 import bpy
 import threading
 
+from . import clocksync
+
 def check_pyaudio():
     import importlib
     pyaudio_spec = importlib.util.find_spec("pyaudio")
@@ -82,6 +84,10 @@ class VRAudio:
             
         self.changes_lock = threading.Lock()
         self.audio_data = None
+        # clocksync.clock_us() of the recording of audio_data
+        self.audio_time = 0
+        # Set when a new chunk was recorded, the audio lane of the netsystem waits for it
+        self.audio_event = threading.Event()
         self.enabled = False
 
     def volume(self, audio_data, volume_factor):
@@ -111,8 +117,12 @@ class VRAudio:
         #self.stream_sound.write(in_data)
 
         #bpy.context.scene.netsystem.send_audio(in_data)
+        audio_time = clocksync.clock_us()
+
         self.changes_lock.acquire()
         self.audio_data = in_data
+        self.audio_time = audio_time
+        self.audio_event.set()
         self.changes_lock.release()
 
         return (None, self.paContinue)
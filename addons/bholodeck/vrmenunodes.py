@@ -30,6 +30,8 @@ import os
 #from bpy import context
 from mathutils import Vector
 
+from . import operations
+
 vrmenu_type_items = [
     ("FLOAT", "Float", ""),
     ("SCRIPT", "Script", ""),
@@ -410,7 +412,7 @@ class VRMenuNodes:
         img = Image.new('RGBA', (self.item_image_w, self.item_image_h), color = self.item_image_color)
 
         scripts_dir = bpy.utils.user_resource('SCRIPTS')
-        font_file = os.path.join(scripts_dir, 'addons/bholodeck/bmonofont-i18n.ttf')
+        font_file = context.scene.netsystem.asset_path('bmonofont-i18n.ttf', os.path.join(scripts_dir, 'addons/bholodeck/bmonofont-i18n.ttf'))
 
         #font_file = Path(sys.path[0]) / '..' / '..' / 'datafiles' / 'fonts' / 'bmonofont-i18n.ttf'
         font = ImageFont.truetype(str(font_file), self.item_font_size)
@@ -475,7 +477,7 @@ class VRMenuNodes:
         img = Image.new('RGB', (self.item_image_w, self.item_image_h), color = (81, 119, 179))
 
         scripts_dir = bpy.utils.user_resource('SCRIPTS')
-        font_file = os.path.join(scripts_dir, 'addons/bholodeck/bmonofont-i18n.ttf')
+        font_file = context.scene.netsystem.asset_path('bmonofont-i18n.ttf', os.path.join(scripts_dir, 'addons/bholodeck/bmonofont-i18n.ttf'))
         font = ImageFont.truetype(str(font_file), self.item_font_size)
         bbox = font.getbbox(name)
         w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
@@ -783,7 +785,15 @@ class VRMenuNodes:
             v_max = float_node.command_float_max
 
             v = float(value * (v_max - v_min) + v_min)
-            exec('%s = %f' % (float_node.command, v))
+
+            # Only set locally, a property path is set without compiling a script
+            try:
+                operation = operations.set_property_operation(float_node.command, v)
+            except ValueError:
+                # Not a property path of the operations (e.g. rooted at context)
+                exec('%s = %f' % (float_node.command, v))
+            else:
+                context.scene.netsystem.apply_operation(operation)
 
             self.planes[1].data.materials[0].node_tree.nodes['ColorRamp'].color_ramp.elements[1].position = value
 
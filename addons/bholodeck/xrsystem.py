@@ -429,7 +429,7 @@ class XRSystem:
     def create_model_from_file(self, context, name):
         scene = context.scene
         scripts_dir = bpy.utils.user_resource('SCRIPTS')
-        library_blend_file = os.path.join(scripts_dir, 'addons/bholodeck/library.blend')
+        library_blend_file = context.scene.netsystem.asset_path('library.blend', os.path.join(scripts_dir, 'addons/bholodeck/library.blend'))
         section = 'Object'
 
         if self.HMD in name: